@@ -0,0 +1,5 @@
+""" Benchmarks
+"""
+
+
+# EOF
@@ -0,0 +1,96 @@
+""" Benchmark MPD round-trips
+    Compare a status refresh issued as sequential commands with the same
+    refresh batched in a command list, against a fake server with injected
+    latency. With and without Nagle's algorithm: 'python-mpd2' writes each
+    command line on its own, so the lines of a command list are held back
+    unless the client disables it, as 'mpd_client.MpdClient' does.
+"""
+
+
+import time
+
+from tests import fake_mpd
+
+
+LATENCY = 0.020  # seconds per response
+PLAYLIST_LENGTH = 100
+REPEAT = 20
+
+
+def refresh_sequential(client, version):
+    """ Refresh as three sequential commands.
+    """
+    client.status()
+    client.currentsong()
+    client.plchanges(version)
+    return None
+
+
+def refresh_command_list(client, version):
+    """ Refresh in a single command list.
+    """
+    client.command_list_ok_begin()
+    client.status()
+    client.currentsong()
+    client.plchanges(version)
+    client.command_list_end()
+    return None
+
+
+def run(server, refresh, no_delay):
+    """ Run the benchmark for one way of refreshing.
+    """
+    # pylint: disable=import-outside-toplevel
+    import mpd
+    from pmpc import mpd_client
+    host, port = server.address
+    client = mpd.MPDClient(use_unicode=True)
+    client.connect(host, port)
+    if no_delay:
+        mpd_client._set_no_delay(client)  # pylint: disable=protected-access
+    version = int(client.status()['playlist'])
+    server.reset_statistics()
+    start = time.perf_counter()
+    for dummy_index in range(REPEAT):
+        refresh(client, version)
+    duration = time.perf_counter() - start
+    round_trips = server.statistics['round_trips']
+    client.close()
+    client.disconnect()
+    print('{:<22} {:<9} {:8.1f} ms per refresh  {:4.1f} round-trips'.format(
+        refresh.__name__,
+        'no delay' if no_delay else 'nagle',
+        duration / REPEAT * 1e3,
+        round_trips / REPEAT,
+    ))
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    server = fake_mpd.FakeMpdServer(latency=LATENCY)
+    server.start()
+    server.set_playlist([
+        {
+            'file': 'track_{}.ogg'.format(index),
+            'Artist': 'Artist {}'.format(index),
+            'Title': 'Title {}'.format(index),
+        }
+        for index in range(PLAYLIST_LENGTH)
+    ])
+    try:
+        for no_delay in (False, True):
+            for refresh in (refresh_sequential, refresh_command_list):
+                run(server, refresh, no_delay)
+    except ImportError as error:  # 'python-mpd2' is not available
+        print('skipped, {}'.format(error))
+    server.stop()
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
@@ -0,0 +1,377 @@
+""" Benchmark the MPD clients and the application end to end
+    Drive each engine alone, then the whole application through its stream,
+    against the fake server: loading a large playlist, rapid track skips and
+    bursts of control posts. Report the round-trips, the bytes transferred,
+    the latency from a change on the server to its handler, and the peak of
+    the memory allocated meanwhile (measured in a second pass, the fake
+    server runs in the same process and is accounted for too).
+"""
+
+
+import json
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import pmpc.pmpc
+import pmpc.task
+import pmpc.track
+
+from tests import fake_mpd
+
+
+PLAYLIST_LENGTH = 100000
+SKIPS = 100  # one at a time, waiting for each
+BURST = 1000  # skips in a row
+# commands in a row, within the bound of the application queue: beyond it
+# the commands are coalesced, by design
+CONTROL_BURST = 200
+TIMEOUT = 60.0  # seconds
+
+
+class State(object):
+    """ Current track and playlist as seen by a client of the server
+        Updated by the handlers, with the time of arrival of the last event.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.track = None
+        self.playlist = []
+        self.arrival = None
+        return None
+
+    def wait(self, predicate):
+        """ Wait until the predicate holds for this state.
+            Return the time of arrival of the event that made it hold.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: predicate(self),
+                    TIMEOUT,
+            ):
+                raise RuntimeError("Timeout")
+            arrival = self.arrival
+        return arrival
+
+    def update_track(self, track):
+        """ Handle a new current track.
+        """
+        with self._condition:
+            self.track = track
+            self.arrival = time.perf_counter()
+            self._condition.notify_all()
+        return None
+
+    def update_playlist(self, changes, length):
+        """ Handle changes to the playlist.
+        """
+        with self._condition:
+            self.playlist = pmpc.track.apply_playlist_delta(
+                self.playlist,
+                changes,
+                length,
+            )
+            self.arrival = time.perf_counter()
+            self._condition.notify_all()
+        return None
+
+
+class Observer(pmpc.task.Task):
+    """ Task following the events of an MPD client
+    """
+
+    def __init__(self, state):
+        self._state = state
+        event_handlers = {
+            'mpd.track': self._event_handler_track,
+            'mpd.playlist_chunk': self._event_handler_playlist_chunk,
+            'mpd.playlist_delta': self._event_handler_playlist_delta,
+        }
+        super(Observer, self).__init__('observer', event_handlers)
+        return None
+
+    def _event_handler_track(self, event):
+        self._state.update_track(event['value'])
+        return None
+
+    def _event_handler_playlist_chunk(self, event):
+        self._state.update_playlist(
+            event['value']['tracks'],
+            event['value']['length'],
+        )
+        return None
+
+    def _event_handler_playlist_delta(self, event):
+        self._state.update_playlist(
+            event['value']['changes'],
+            event['value']['length'],
+        )
+        return None
+
+
+class ClientDriver(object):
+    """ Drive the MPD client task of an engine, alone
+    """
+
+    def __init__(self, engine):
+        self.name = engine
+        self._engine = engine
+        self._mpc = None
+        self._server_name = None
+        self._observer = None
+        return None
+
+    def start(self, server, state):
+        """ Start following the server.
+        """
+        self._server_name = '{}:{}'.format(*server.address)
+        mpcs = pmpc.pmpc.create_mpd_clients(
+            [server.address],
+            self._engine,
+            {self._server_name: None},
+        )
+        self._mpc = mpcs[self._server_name]
+        self._observer = Observer(state)
+        self._observer.start()
+        self._mpc.start()
+        return None
+
+    def next(self):
+        """ Skip to the next track.
+        """
+        self._mpc.post({
+            'type': 'next',
+            'server': self._server_name,
+            'value': None,
+        })
+        return None
+
+    def stop(self):
+        """ Stop following the server.
+        """
+        self._mpc.post({
+            'type': 'quit',
+            'value': None,
+        })
+        self._mpc.join()
+        self._observer.stop()
+        self._observer.join()
+        return None
+
+
+class ApplicationDriver(object):
+    """ Drive the whole application, through the stream on a UNIX socket
+    """
+
+    def __init__(self, engine):
+        self.name = 'pmpc {}'.format(engine)
+        self._engine = engine
+        self._directory = None
+        self._pmpc = None
+        self._connection = None
+        self._reader = None
+        return None
+
+    def start(self, server, state):
+        """ Start following the server.
+        """
+        self._directory = tempfile.mkdtemp()
+        path = os.path.join(self._directory, 'pmpc.socket')
+        self._pmpc = pmpc.pmpc.Pmpc(
+            'pmpc',
+            [server.address],
+            engine=self._engine,
+            frontends=('stream',),
+            stream_path=path,
+        )
+        self._pmpc.start()
+        self._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        while True:
+            try:
+                self._connection.connect(path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                time.sleep(0.01)  # the stream is starting
+            else:
+                break
+        self._reader = threading.Thread(
+            target=_read_stream,
+            args=(self._connection.makefile('rb'), state),
+        )
+        self._reader.start()
+        return None
+
+    def next(self):
+        """ Skip to the next track.
+        """
+        self._connection.sendall(b'{"type":"next"}\n')
+        return None
+
+    def stop(self):
+        """ Stop following the server.
+        """
+        self._connection.sendall(b'{"type":"quit"}\n')
+        self._pmpc.join()
+        self._reader.join()
+        self._connection.close()
+        shutil.rmtree(self._directory)
+        return None
+
+
+def _read_stream(lines, state):
+    """ Handle the events written by the stream, until it is closed.
+    """
+    for line in lines:
+        event = json.loads(line.decode('utf-8'))
+        if event['type'] == 'track':
+            state.update_track(pmpc.track.Track(*event['value']))
+        elif event['type'] == 'playlist':
+            state.update_playlist(
+                [pmpc.track.Track(*each) for each in event['value']],
+                len(event['value']),
+            )
+        elif event['type'] == 'playlist_delta':
+            value = event['value']
+            state.update_playlist(
+                [pmpc.track.Track(*each) for each in value['changes']],
+                value['length'],
+            )
+    lines.close()
+    return None
+
+
+def scenario_load(server, driver, state):
+    """ Start and load the whole playlist.
+    """
+    start = time.perf_counter()
+    driver.start(server, state)
+    arrival = state.wait(
+        lambda s: len(s.playlist) == PLAYLIST_LENGTH and s.track is not None,
+    )
+    return [arrival - start]
+
+
+def scenario_skips(server, dummy_driver, state):
+    """ Skip tracks on the server one at a time.
+    """
+    latencies = []
+    for dummy_index in range(SKIPS):
+        pos = state.track.pos + 1
+        start = time.perf_counter()
+        server.skip(1)
+        arrival = state.wait(lambda s, pos=pos: s.track.pos == pos)
+        latencies.append(arrival - start)
+    return latencies
+
+
+def scenario_skip_burst(server, dummy_driver, state):
+    """ Skip tracks on the server in a row, as fast as possible.
+    """
+    pos = state.track.pos + BURST
+    start = time.perf_counter()
+    for dummy_index in range(BURST):
+        server.skip(1)
+    arrival = state.wait(lambda s: s.track.pos == pos)
+    return [arrival - start]
+
+
+def scenario_control_burst(dummy_server, driver, state):
+    """ Post 'next' commands to the client in a row.
+    """
+    pos = state.track.pos + CONTROL_BURST
+    start = time.perf_counter()
+    for dummy_index in range(CONTROL_BURST):
+        driver.next()
+    arrival = state.wait(lambda s: s.track.pos == pos)
+    return [arrival - start]
+
+
+SCENARIOS = (
+    scenario_load,
+    scenario_skips,
+    scenario_skip_burst,
+    scenario_control_burst,
+)
+
+
+def run(server, driver, trace_memory):
+    """ Run all the scenarios in a row for one driver.
+        Return the results by scenario name.
+    """
+    results = {}
+    state = State()
+    server.set_playlist(fake_mpd.make_songs(PLAYLIST_LENGTH))
+    for scenario in SCENARIOS:
+        server.reset_statistics()
+        if trace_memory:
+            tracemalloc.start()
+        durations = scenario(server, driver, state)
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[scenario.__name__] = {
+            'durations': durations,
+            'round_trips': server.statistics['round_trips'],
+            'bytes': (
+                server.statistics['bytes_sent'] +
+                server.statistics['bytes_received']
+            ),
+            'peak': peak,
+        }
+    driver.stop()
+    return results
+
+
+def report(driver, results, peaks):
+    """ Print the results of a driver, with the peaks from another pass.
+    """
+    print(driver.name)
+    for scenario in SCENARIOS:
+        name = scenario.__name__
+        durations = results[name]['durations']
+        print(
+            '    {:<24} {:9.2f} ms median {:9.2f} ms max'
+            ' {:6d} round-trips {:10.1f} kB {:10.1f} kB peak'.format(
+                name[len('scenario_'):],
+                statistics.median(durations) * 1e3,
+                max(durations) * 1e3,
+                results[name]['round_trips'],
+                results[name]['bytes'] / 1e3,
+                peaks[name]['peak'] / 1e3,
+            )
+        )
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    server = fake_mpd.FakeMpdServer()
+    server.start()
+    drivers = []
+    for engine in pmpc.pmpc.ENGINES:
+        drivers.append(ClientDriver(engine))
+        drivers.append(ApplicationDriver(engine))
+    for driver in drivers:
+        try:
+            results = run(server, driver, False)
+        except ImportError as error:  # the engine is not available
+            print('{}\n    skipped, {}'.format(driver.name, error))
+            continue
+        peaks = run(server, driver, True)
+        report(driver, results, peaks)
+    server.stop()
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
@@ -0,0 +1,113 @@
+""" Benchmark the finite state machine
+    Events per second handled by the test machine and by the states of the
+    MPD client.
+"""
+
+
+import time
+
+import pmpc.fsm
+
+from tests import test_fsm
+
+
+EVENTS = 1000000
+
+
+def run(name, fsm, events):
+    """ Feed the events to the machine, report the rate.
+    """
+    count = 0
+    start = time.perf_counter()
+    while count < EVENTS:
+        for event in events:
+            fsm.handle_event(event)
+        count += len(events)
+    duration = time.perf_counter() - start
+    print('{:<12} {:12,.0f} events/s'.format(name, count / duration))
+    return None
+
+
+def run_test_machine():
+    """ Handle events and no-ops on the test machine.
+    """
+    machine = test_fsm.Machine()
+    events = [
+        {'type': 'toggle', 'value': None},
+        {'type': 'set', 'value': 1},
+        {'type': 'unknown', 'value': None},
+    ]
+    run('test', machine.fsm, events)
+    return None
+
+
+class ClientMachine(object):  # pylint: disable=too-few-public-methods
+    """ Machine with the states of the MPD client, without the I/O
+        The client's own states need a server to leave 'initializing', so
+        this copy adds a transition back to 'connecting' to loop over them.
+    """
+
+    def __init__(self):
+        states = {
+            'connecting': {
+                'enter': self._do_nothing,
+                'transitions': {
+                    'connected': {
+                        'next_state': 'idling',
+                    },
+                },
+                'handlers': {
+                    'quit': self._do_nothing,
+                },
+            },
+            'idling': {
+                'leave': self._do_nothing,
+                'transitions': {
+                    'disconnected': {
+                        'next_state': 'connecting',
+                    },
+                },
+                'handlers': {
+                    'previous': self._do_nothing,
+                    'next': self._do_nothing,
+                    'pause': self._do_nothing,
+                    'quit': self._do_nothing,
+                },
+            },
+        }
+        self.fsm = pmpc.fsm.Fsm(states, 'connecting')
+        return None
+
+    def _do_nothing(self, dummy_event):
+        return None
+
+
+def run_client_machine():
+    """ Handle transitions, commands and no-ops in the states of the MPD
+        client.
+    """
+    machine = ClientMachine()
+    events = [
+        {'type': 'connected', 'value': None},
+        {'type': 'next', 'value': None},
+        {'type': 'mpd.track', 'value': None},
+        {'type': 'pause', 'value': None},
+        {'type': 'disconnected', 'value': None},
+    ]
+    run('mpd_client', machine.fsm, events)
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    run_test_machine()
+    run_client_machine()
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
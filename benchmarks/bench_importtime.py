@@ -0,0 +1,110 @@
+""" Benchmark the start-up
+    Measure the cold start of the console script with 'python -X importtime',
+    for '--help' and for a headless construction of the application, and
+    check which of the slow or optional modules get imported.
+"""
+
+
+import subprocess
+import sys
+import time
+
+
+REPEAT = 5
+TOP = 8  # modules listed by cumulative import time
+
+# modules only needed by some engines or frontends
+WATCHED_MODULES = (
+    'asyncio',
+    'mpd',
+    'tkinter',
+    'win32api',
+)
+
+SCENARIOS = (
+    (
+        'help',
+        ['-m', 'pmpc.script', '--help'],
+    ),
+    (
+        'headless',
+        [
+            '-c',
+            'import pmpc.pmpc; pmpc.pmpc.Pmpc('
+            '"pmpc", [("localhost", 6600)], engine="asyncio", frontends=())',
+        ],
+    ),
+)
+
+
+def parse_importtime(output):
+    """ Return the import times in microseconds, self and cumulative, by
+        module, from the output of 'python -X importtime'.
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header
+        module = fields[2].strip()
+        times[module] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def measure(arguments):
+    """ Run the interpreter once, return the wall time in seconds and the
+        import times.
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + arguments,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    duration = time.perf_counter() - start
+    return (duration, parse_importtime(completed.stderr))
+
+
+def run(name, arguments):
+    """ Run the benchmark for one scenario, keep the fastest run.
+    """
+    duration, times = min(
+        (measure(arguments) for dummy_index in range(REPEAT)),
+        key=lambda result: result[0],
+    )
+    total = sum(self_time for self_time, dummy_cumulative in times.values())
+    print('{:<10} {:8.1f} ms wall  {:8.1f} ms imports  {:4d} modules'.format(
+        name,
+        duration * 1e3,
+        total / 1e3,
+        len(times),
+    ))
+    imported = [module for module in WATCHED_MODULES if module in times]
+    print('    imported: {}'.format(', '.join(imported) or '-'))
+    slowest = sorted(
+        times.items(),
+        key=lambda item: item[1][1],
+        reverse=True,
+    )
+    for module, (dummy_self_time, cumulative) in slowest[:TOP]:
+        print('    {:8.1f} ms  {}'.format(cumulative / 1e3, module))
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    for name, arguments in SCENARIOS:
+        run(name, arguments)
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
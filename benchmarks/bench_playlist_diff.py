@@ -0,0 +1,136 @@
+""" Benchmark playlist updates in the window
+    Compare rebuilding the whole tree with applying the difference, for
+    typical edits of playlists of several sizes.
+    Count the Tk calls and measure the wall time.
+    Needs a display.
+"""
+
+
+import time
+import tkinter
+
+import pmpc.track
+import pmpc.window
+
+
+SIZES = (1000, 10000, 100000)
+
+
+class CountingTk(object):  # pylint: disable=too-few-public-methods
+    """ Proxy to the Tcl interpreter counting the calls
+    """
+
+    def __init__(self, tcl):
+        self._tk = tcl
+        self.calls = 0
+        return None
+
+    def call(self, *args):
+        """ Count and forward the call.
+        """
+        self.calls += 1
+        return self._tk.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+
+class RebuildingPlaylist(  # pylint: disable=too-many-ancestors
+        pmpc.window.Playlist,
+):
+    """ Playlist deleting and reinserting every row on change
+    """
+
+    def set_playlist(self, playlist):
+        """ Override 'pmpc.window.Playlist'
+        """
+        self.tree.delete(*self.tree.get_children())
+        for track_index, track in enumerate(playlist):
+            # pylint: disable=protected-access
+            pmpc.window._insert_row(self.tree, track_index, track)
+        self._playlist = list(playlist)
+        self._rendered = self._playlist
+        return None
+
+
+def make_track(song_id, pos):
+    """ Build a track record.
+    """
+    return pmpc.track.Track(
+        song_id,
+        pos,
+        'Artist {}'.format(song_id),
+        'Title {}'.format(song_id),
+    )
+
+
+def renumber(playlist):
+    """ Return the playlist with positions matching the indexes.
+    """
+    return [
+        track._replace(pos=pos) for pos, track in enumerate(playlist)
+    ]
+
+
+def edits(size):
+    """ Return the typical edits as functions from playlist to playlist.
+    """
+    return [
+        ('append one', lambda tracks: tracks + [make_track(size, size)]),
+        ('remove last', lambda tracks: tracks[:-1]),
+        ('remove first', lambda tracks: renumber(tracks[1:])),
+        ('move last to first', lambda tracks: renumber(
+            tracks[-1:] + tracks[:-1]
+        )),
+        ('retag one', lambda tracks: tracks[:size // 2] + [
+            tracks[size // 2]._replace(title='Retagged')
+        ] + tracks[size // 2 + 1:]),
+    ]
+
+
+def run(root, playlist_class, size):
+    """ Run the edits on one kind of playlist of the given size.
+    """
+    playlist = playlist_class(root, slice_budget=None)
+    counter = CountingTk(playlist.tree.tk)
+    playlist.tree.tk = counter
+    tracks = [make_track(index, index) for index in range(size)]
+    for name, edit in edits(size):
+        playlist.set_playlist(tracks)
+        root.update()
+        counter.calls = 0
+        start = time.perf_counter()
+        playlist.set_playlist(edit(tracks))
+        root.update()
+        duration = time.perf_counter() - start
+        print('{:<20} {:>7} {:<20} {:>8} calls {:10.1f} ms'.format(
+            playlist_class.__name__,
+            size,
+            name,
+            counter.calls,
+            duration * 1e3,
+        ))
+    playlist.destroy()
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as error:  # no display
+        print('skipped, {}'.format(error))
+    else:
+        for size in SIZES:
+            for playlist_class in (RebuildingPlaylist, pmpc.window.Playlist):
+                run(root, playlist_class, size)
+        root.destroy()
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
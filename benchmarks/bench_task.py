@@ -0,0 +1,109 @@
+""" Benchmark the task loop
+    Compare the legacy busy-spin loop with the blocking loop:
+    CPU usage while idle, and latency from 'post' to handler.
+"""
+
+
+import statistics
+import threading
+import time
+
+import pmpc.task
+
+
+IDLE_DURATION = 2.0  # seconds
+LATENCY_SAMPLES = 2000
+
+
+class BlockingTask(pmpc.task.Task):
+    """ Task using the default blocking loop
+    """
+
+    def __init__(self, name):
+        self.received = threading.Event()
+        self.latencies = []
+        event_handlers = {
+            'ping': self._event_handler_ping,
+        }
+        super(BlockingTask, self).__init__(name, event_handlers)
+        return None
+
+    def _event_handler_ping(self, event):
+        self.latencies.append(time.perf_counter() - event['value'])
+        self.received.set()
+        return None
+
+
+class SpinningTask(BlockingTask):
+    """ Task using the legacy busy-spin loop
+    """
+
+    def _routine(self):
+        """ Override 'task.Task'
+        """
+        stop = pmpc.task._STOP  # pylint: disable=protected-access
+        while not self._event_queue.empty():
+            event = self._event_queue.get()
+            if event is not stop:
+                self._process_event(event)
+        return None
+
+
+def measure_idle_cpu(task):
+    """ Return the CPU time used per second of wall time while idle.
+    """
+    task.start()
+    time.sleep(0.1)  # let the thread settle
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    time.sleep(IDLE_DURATION)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return cpu / wall
+
+
+def measure_latency(task):
+    """ Return the post-to-handler latencies in seconds.
+    """
+    for dummy_index in range(LATENCY_SAMPLES):
+        task.received.clear()
+        task.post({
+            'type': 'ping',
+            'value': time.perf_counter(),
+        })
+        task.received.wait()
+        time.sleep(0.0005)  # let the task go back to idle
+    return task.latencies
+
+
+def run(task_class):
+    """ Run the benchmark for one kind of task.
+    """
+    task = task_class(task_class.__name__)
+    idle_cpu = measure_idle_cpu(task)
+    latencies = sorted(measure_latency(task))
+    task.stop()
+    task.join()
+    print('{:<14} idle cpu {:6.1%}  latency median {:8.1f} us'
+          '  p99 {:8.1f} us'.format(
+              task_class.__name__,
+              idle_cpu,
+              statistics.median(latencies) * 1e6,
+              latencies[int(len(latencies) * 0.99)] * 1e6,
+          ))
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    for task_class in (SpinningTask, BlockingTask):
+        run(task_class)
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
@@ -0,0 +1,128 @@
+""" Benchmark track records
+    Compare the memory and time needed to convert a large playlist from
+    'python-mpd2' dicts to per-track dicts and to compact track records, with
+    the positions parsed or known from the page as the clients load it. The
+    records are tracked by the cyclic garbage collector and the dicts of
+    strings are not, so the time is also given without the collector.
+"""
+
+
+import gc
+import time
+import tracemalloc
+
+import pmpc.track
+
+
+PLAYLIST_LENGTH = 100000
+ARTISTS = 500
+REPEAT = 5
+
+
+def make_raw_playlist():
+    """ Build a playlist as returned by 'python-mpd2'.
+    """
+    return [
+        {
+            'file': 'music/{}/track_{}.ogg'.format(index % ARTISTS, index),
+            'last-modified': '2015-01-01T00:00:00Z',
+            'time': '240',
+            'artist': 'Artist {}'.format(index % ARTISTS),
+            'album': 'Album {}'.format(index % ARTISTS),
+            'title': 'Title {}'.format(index),
+            'track': '1',
+            'pos': str(index),
+            'id': str(index),
+        }
+        for index in range(PLAYLIST_LENGTH)
+    ]
+
+
+def read_track_dict(raw_track):
+    """ Build a per-track dict, as the window used to receive.
+    """
+    return {
+        'artist': raw_track.get('artist', ""),
+        'title': raw_track.get('title', ""),
+        'pos': raw_track.get('pos', ""),
+        'id': raw_track.get('id', ""),
+    }
+
+
+def read_records(raw_playlist):
+    """ Build the track records, parsing the positions.
+    """
+    return [pmpc.track.read_track(raw_track) for raw_track in raw_playlist]
+
+
+def read_records_by_page(raw_playlist):
+    """ Build the track records, with the positions known from the page.
+    """
+    return [
+        pmpc.track.read_track(raw_track, pos)
+        for pos, raw_track in enumerate(raw_playlist)
+    ]
+
+
+def read_dicts(raw_playlist):
+    """ Build the per-track dicts.
+    """
+    return [read_track_dict(raw_track) for raw_track in raw_playlist]
+
+
+def measure(convert, raw_playlist):
+    """ Return the best duration of the conversion over a few runs.
+    """
+    durations = []
+    for dummy_index in range(REPEAT):
+        start = time.perf_counter()
+        playlist = convert(raw_playlist)
+        durations.append(time.perf_counter() - start)
+        del playlist
+    return min(durations)
+
+
+def run(convert):
+    """ Convert the playlist, report the best time and the memory.
+        The memory held is measured once the raw playlist is released,
+        the peak includes the raw playlist.
+    """
+    raw_playlist = make_raw_playlist()
+    duration = measure(convert, raw_playlist)
+    gc.disable()
+    duration_without_gc = measure(convert, raw_playlist)
+    gc.enable()
+    del raw_playlist
+    tracemalloc.start()
+    raw_playlist = make_raw_playlist()
+    playlist = convert(raw_playlist)
+    del raw_playlist
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        '{:<20} {:7.1f} ms {:7.1f} ms without gc'
+        ' {:6.1f} MiB held {:6.1f} MiB peak'.format(
+            convert.__name__,
+            duration * 1e3,
+            duration_without_gc * 1e3,
+            size / 2 ** 20,
+            peak / 2 ** 20,
+        )
+    )
+    del playlist
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    for convert in (read_dicts, read_records, read_records_by_page):
+        run(convert)
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
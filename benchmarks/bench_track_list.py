@@ -0,0 +1,186 @@
+""" Benchmark the parsing of large list responses
+    Compare the track records built from the pairs of a 'playlistinfo'
+    response, one dict per song as 'python-mpd2' does, to the ones parsed
+    directly from the raw bytes of the response. First offline on the same
+    bytes, then end to end against the fake server, one page at a time as the
+    clients load the playlist. The python-mpd2 path is skipped if it is not
+    installed.
+"""
+
+
+import asyncio
+import socket
+import time
+import tracemalloc
+
+import pmpc.mpd_async
+import pmpc.track
+
+from tests import fake_mpd
+
+
+PLAYLIST_LENGTHS = (10000, 100000)
+PAGE_SIZE = 1000  # tracks per 'playlistinfo' request, as the clients
+REPEAT = 3
+TRACK_CACHE_SIZE = 100000
+
+
+def fetch_response(address, length):
+    """ Return the raw response to 'playlistinfo' for the whole playlist.
+    """
+    connection = socket.create_connection(address)
+    lines = connection.makefile('rb')
+    lines.readline()  # greeting
+    connection.sendall('playlistinfo "0:{}"\n'.format(length).encode('utf-8'))
+    chunks = []
+    while True:
+        line = lines.readline()
+        if line in (b'OK\n', b''):
+            break
+        chunks.append(line)
+    lines.close()
+    connection.close()
+    return b''.join(chunks)
+
+
+def parse_pairs(data, track_cache):
+    """ Parse a response into pairs, then dicts, then track records.
+    """
+    # pylint: disable=protected-access
+    pairs = [
+        pmpc.mpd_async._split_pair(line)
+        for line in data.decode('utf-8').splitlines()
+    ]
+    return [
+        track_cache.read_track(raw_track)
+        for raw_track in pmpc.mpd_async._read_objects(pairs, 'file')
+    ]
+
+
+def parse_bytes(data, track_cache):
+    """ Parse a response directly into track records.
+    """
+    return pmpc.track.read_track_list(data, track_cache)
+
+
+def measure(function, *args):
+    """ Return the best duration of the function over a few runs, with a
+        new track cache each time, and the peak of the memory allocated.
+    """
+    durations = []
+    for dummy_index in range(REPEAT):
+        track_cache = pmpc.track.TrackCache(TRACK_CACHE_SIZE)
+        start = time.perf_counter()
+        function(*args, track_cache)
+        durations.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function(*args, pmpc.track.TrackCache(TRACK_CACHE_SIZE))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(durations), peak
+
+
+def load_asyncio_pairs(address, length, track_cache):
+    """ Load the playlist with the line by line responses, on asyncio.
+    """
+    async def load():
+        connection = pmpc.mpd_async.MpdConnection(*address)
+        await connection.connect()
+        for start in range(0, length, PAGE_SIZE):
+            pairs = await connection.command(
+                'playlistinfo',
+                '{}:{}'.format(start, start + PAGE_SIZE),
+            )
+            # pylint: disable=protected-access
+            for raw_track in pmpc.mpd_async._read_objects(pairs, 'file'):
+                track_cache.read_track(raw_track)
+        connection.close()
+        return None
+    asyncio.run(load())
+    return None
+
+
+def load_asyncio_bytes(address, length, track_cache):
+    """ Load the playlist with the raw responses, on asyncio.
+    """
+    async def load():
+        connection = pmpc.mpd_async.MpdConnection(*address)
+        await connection.connect()
+        for start in range(0, length, PAGE_SIZE):
+            data = await connection.command_raw(
+                'playlistinfo',
+                '{}:{}'.format(start, start + PAGE_SIZE),
+            )
+            pmpc.track.read_track_list(data, track_cache)
+        connection.close()
+        return None
+    asyncio.run(load())
+    return None
+
+
+def load_mpd2_dicts(address, length, track_cache):
+    """ Load the playlist with the dicts of 'python-mpd2'.
+    """
+    import mpd  # pylint: disable=import-outside-toplevel
+    mpd_client = mpd.MPDClient(use_unicode=True)
+    mpd_client.connect(*address)
+    for start in range(0, length, PAGE_SIZE):
+        for raw_track in mpd_client.playlistinfo(
+                '{}:{}'.format(start, start + PAGE_SIZE),
+        ):
+            track_cache.read_track(raw_track)
+    mpd_client.close()
+    mpd_client.disconnect()
+    return None
+
+
+LOADERS = (
+    load_asyncio_pairs,
+    load_asyncio_bytes,
+    load_mpd2_dicts,
+)
+
+
+def report(name, duration, peak, length):
+    """ Print the results of a parser or loader.
+    """
+    print('    {:<20} {:9.1f} ms {:7.2f} us/track {:9.1f} MiB peak'.format(
+        name,
+        duration * 1e3,
+        duration / length * 1e6,
+        peak / 2 ** 20,
+    ))
+    return None
+
+
+def main():
+    """ Run the benchmark.
+    """
+    server = fake_mpd.FakeMpdServer()
+    server.start()
+    for length in PLAYLIST_LENGTHS:
+        server.set_playlist(fake_mpd.make_songs(length))
+        data = fetch_response(server.address, length)
+        print('{} tracks, {:.1f} MiB response, parsed offline'.format(
+            length,
+            len(data) / 2 ** 20,
+        ))
+        for parse in (parse_pairs, parse_bytes):
+            report(parse.__name__, *measure(parse, data), length)
+        print('{} tracks, loaded by pages of {}'.format(length, PAGE_SIZE))
+        for load in LOADERS:
+            try:
+                duration, peak = measure(load, server.address, length)
+            except ImportError as error:  # 'python-mpd2' is not available
+                print('    {:<20} skipped, {}'.format(load.__name__, error))
+                continue
+            report(load.__name__, duration, peak, length)
+    server.stop()
+    return None
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
@@ -0,0 +1,263 @@
+""" Event queue
+"""
+
+
+import collections
+import queue
+import threading
+import time
+
+
+# coalescing policies, per event type
+KEEP_ALL = 'keep_all'
+KEEP_LATEST = 'keep_latest'
+# any other policy is a function merging the queued event with the new one:
+# merge(queued_event, new_event) -> event
+
+# overflow policies, when a bounded queue is full
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+COALESCE = 'coalesce'
+REJECT = 'reject'
+
+_DEAD = object()  # placeholder for an event superseded in the queue
+
+
+class EventQueue(object):  # pylint: disable=too-many-instance-attributes
+    """ Event queue with per event type coalescing policies
+        'KEEP_ALL' queues every event, 'KEEP_LATEST' replaces a queued
+        event of the same type, a merge function combines the queued event
+        with the new one. A replaced or merged event moves to the back of
+        the queue, as it carries the newest information. Events from
+        different servers (their 'server' key) never coalesce.
+        An event can also supersede the pending events of other types from
+        its server, when it carries all their information: the superseding
+        functions, per event type, return the types superseded by an event.
+        Only the types with a coalescing policy are pending.
+        The queue can be bounded, the overflow policy decides what happens
+        to a new event when it is full:
+        'BLOCK' waits for room, 'DROP_OLDEST' drops the oldest queued event,
+        'COALESCE' coalesces the new event with the most recent queued event
+        of the same type (merged if its type has a merge policy, replaced
+        otherwise) or else drops the oldest queued event, and 'REJECT' drops
+        the new event.
+        Only the events kept all are dropped: the others carry state, and
+        coalescing already bounds their number to one per type and server.
+        When none can be dropped, a new event kept all is rejected.
+        Same interface as 'queue.Queue' for the parts used by tasks.
+        The time an event is queued is kept, a coalesced event keeps the time
+        of the oldest event it replaces.
+    """
+
+    def __init__(
+            self,
+            policies=None,
+            maxsize=0,
+            overflow=BLOCK,
+            superseding=None,
+    ):
+        self._policies = policies or {}
+        self._superseding = superseding or {}
+        self._maxsize = maxsize  # 0 for unbounded
+        self._overflow = overflow
+        self._entries = collections.deque()  # [key, event, forced, time]
+        self._pending = {}  # event key -> cell of the coalescable event
+        self._size = 0
+        self._statistics = {
+            'put': 0,
+            'get': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'rejected': 0,
+            'blocked': 0,
+            'high_water': 0,
+        }
+        self._condition = threading.Condition()
+        return None
+
+    def put(self, event, force=False):
+        """ Queue an event, applying the policy of its type.
+            A forced event ignores the bound and is never dropped.
+            Return whether the event was accepted.
+        """
+        event_key = _event_key(event)
+        policy = self._policies.get(event_key[0], KEEP_ALL)
+        queued = time.perf_counter()
+        accepted = True
+        with self._condition:
+            self._statistics['put'] += 1
+            queued = self._supersede(event_key, event, queued)
+            cell = self._pending.get(event_key, None)
+            if cell is None and not force and self._is_full():
+                if self._overflow == BLOCK:
+                    self._statistics['blocked'] += 1
+                    self._condition.wait_for(self._has_room)
+                    cell = self._pending.get(event_key, None)
+                elif self._overflow == DROP_OLDEST:
+                    accepted = self._drop_oldest() or policy != KEEP_ALL
+                elif self._overflow == COALESCE:
+                    cell = self._find_latest(event_key)
+                    if cell is None:
+                        accepted = self._drop_oldest() or policy != KEEP_ALL
+                else:
+                    accepted = False
+                if not accepted:
+                    self._statistics['rejected'] += 1
+            if accepted:
+                if cell is not None:
+                    queued_event = cell[1]
+                    queued = cell[3]
+                    self._kill(cell)
+                    self._statistics['coalesced'] += 1
+                    if callable(policy):
+                        event = policy(queued_event, event)
+                self._append(event_key, event, force, queued)
+                if policy != KEEP_ALL:
+                    self._pending[event_key] = self._entries[-1]
+                self._condition.notify_all()
+        return accepted
+
+    def get(self, block=True, timeout=None):
+        """ Remove and return the oldest event.
+            Raise 'queue.Empty' if none is available in time.
+        """
+        return self.get_timed(block, timeout)[0]
+
+    def get_timed(self, block=True, timeout=None):
+        """ Remove and return the oldest event, and the time it was queued,
+            see 'time.perf_counter'.
+            Raise 'queue.Empty' if none is available in time.
+        """
+        with self._condition:
+            if block:
+                if not self._condition.wait_for(self._has_events, timeout):
+                    raise queue.Empty
+            elif not self._size:
+                raise queue.Empty
+            cell = self._entries.popleft()
+            while cell[1] is _DEAD:
+                cell = self._entries.popleft()
+            if self._pending.get(cell[0], None) is cell:
+                del self._pending[cell[0]]
+            self._size -= 1
+            self._statistics['get'] += 1
+            self._condition.notify_all()
+        return (cell[1], cell[3])
+
+    def get_nowait(self):
+        """ Remove and return the oldest event without blocking.
+        """
+        return self.get(block=False)
+
+    def get_timed_nowait(self):
+        """ Remove and return the oldest event and the time it was queued,
+            without blocking.
+        """
+        return self.get_timed(block=False)
+
+    def qsize(self):
+        """ Return the number of queued events.
+        """
+        with self._condition:
+            size = self._size
+        return size
+
+    def empty(self):
+        """ Return whether no event is queued.
+        """
+        return self.qsize() == 0
+
+    def statistics(self):
+        """ Return the queue metrics.
+            Current depth and high-water mark, and the number of events put,
+            got, coalesced, dropped, rejected, and of puts that blocked.
+        """
+        with self._condition:
+            statistics = dict(self._statistics)
+            statistics['depth'] = self._size
+        return statistics
+
+    def _has_events(self):
+        return self._size > 0
+
+    def _has_room(self):
+        return not self._is_full()
+
+    def _is_full(self):
+        return 0 < self._maxsize <= self._size
+
+    def _append(self, event_key, event, forced, queued):
+        self._entries.append([event_key, event, forced, queued])
+        self._size += 1
+        if self._size > self._statistics['high_water']:
+            self._statistics['high_water'] = self._size
+        return None
+
+    def _kill(self, cell):
+        """ Mark a queued event as superseded.
+            Compact the queue once superseded events dominate.
+        """
+        cell[1] = _DEAD
+        self._size -= 1
+        if self._pending.get(cell[0], None) is cell:
+            del self._pending[cell[0]]
+        if len(self._entries) > 2 * self._size + 16:
+            self._entries = collections.deque(
+                entry for entry in self._entries if entry[1] is not _DEAD
+            )
+        return None
+
+    def _drop_oldest(self):
+        """ Drop the oldest event that can be dropped.
+            Return whether there was one.
+        """
+        dropped = False
+        for cell in self._entries:
+            if self._is_droppable(cell):
+                self._kill(cell)
+                self._statistics['dropped'] += 1
+                dropped = True
+                break
+        return dropped
+
+    def _is_droppable(self, cell):
+        return (
+            cell[1] is not _DEAD and
+            not cell[2] and
+            self._policies.get(cell[0][0], KEEP_ALL) == KEEP_ALL
+        )
+
+    def _supersede(self, event_key, event, queued):
+        """ Remove the pending events superseded by a new event.
+            Return the time the new event counts as queued, the oldest.
+        """
+        superseding = self._superseding.get(event_key[0], None)
+        if superseding is not None:
+            for event_type in superseding(event):
+                cell = self._pending.get((event_type, event_key[1]), None)
+                if cell is not None:
+                    queued = min(queued, cell[3])
+                    self._kill(cell)
+                    self._statistics['coalesced'] += 1
+        return queued
+
+    def _find_latest(self, event_key):
+        result = None
+        for cell in reversed(self._entries):
+            if cell[0] == event_key and cell[1] is not _DEAD and not cell[2]:
+                result = cell
+                break
+        return result
+
+
+def _event_key(event):
+    """ Return the key under which an event coalesces.
+        Its type, and the server it comes from.
+    """
+    event_key = (None, None)
+    if isinstance(event, dict):
+        event_key = (event.get('type', None), event.get('server', None))
+    return event_key
+
+
+# EOF
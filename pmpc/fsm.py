@@ -2,91 +2,95 @@
 """
 
 
-class Fsm(object):  # pylint: disable=too-few-public-methods
+import collections
+import types
+
+
+_State = collections.namedtuple(
+    '_State',
+    ('name', 'enter', 'leave', 'dispatch'),
+)
+_State.__doc__ = """ Compiled state
+    Dispatch table maps event type to a pair of next state and handler, it is
+    read-only.
+"""
+
+
+class Fsm(object):
     """ Finite state machine
+        The states specification is compiled once at construction.
     """
 
     def __init__(self, states, initial_state_name):
-        self._states = states
+        self._states = _compile_states(states)
         self._current_state_name = initial_state_name
+        self._current_state = self._states.get(initial_state_name, None)
         return None
 
+    def event_types(self):
+        """ Return the types of the events handled in any state.
+        """
+        event_types = set()
+        for state in self._states.values():
+            event_types.update(state.dispatch)
+        return list(event_types)
+
     def handle_event(self, event):
         """ Handle event.
         """
-        state = self._find_current_state()
-        if state:
-            transition = _find_transition(state, event)
-            if transition:
-                self._do_transition(state, transition, event)
-            else:
-                handler = _find_handler(state, event)
-                if handler:
+        state = self._current_state
+        if state is not None:
+            action = state.dispatch.get(event.get('type', None), None)
+            if action is not None:
+                next_state, handler = action
+                if next_state is not None:
+                    self._do_transition(state, next_state, event)
+                elif handler is not None:
                     handler(event)
         return None
 
-    def _find_current_state(self):
-        """ Find the current state.
-        """
-        return self._find_state(self._current_state_name)
-
-    def _find_state(self, state_name):
-        """ Find state by its name.
-        """
-        state = None
-        if state_name in self._states:
-            state = self._states[state_name]
-            state['name'] = state_name
-        return state
-
-    def _do_transition(self, state, transition, event):
+    def _do_transition(self, state, next_state, event):
         """ Execute the transition.
         """
-        next_state_name = transition['next_state']
-        next_state = self._find_state(next_state_name)
-        if next_state:
-            _leave_state(state, event)
-            self._set_current_state(next_state_name)
-            _enter_state(next_state, event)
+        if state.leave is not None:
+            state.leave(event)
+        self._set_current_state(next_state)
+        if next_state.enter is not None:
+            next_state.enter(event)
         return None
 
-    def _set_current_state(self, state_name):
+    def _set_current_state(self, state):
         """ Set the new current state.
         """
-        self._current_state_name = state_name
+        self._current_state = state
+        self._current_state_name = state.name
         return None
 
 
-def _find_handler(state, event):
-    handler = None
-    event_type = event.get('type', None)
-    handlers = state.get('handlers', {})
-    if event_type in handlers:
-        handler = handlers[event_type]
-    return handler
-
-
-def _find_transition(state, event):
-    transition = None
-    event_type = event.get('type', None)
-    transitions = state.get('transitions', {})
-    if event_type in transitions:
-        transition = transitions[event_type]
-    return transition
-
-
-def _enter_state(state, event):
-    handler = state.get('enter', None)
-    if handler:
-        handler(event)
-    return None
-
-
-def _leave_state(state, event):
-    handler = state.get('leave', None)
-    if handler:
-        handler(event)
-    return None
+def _compile_states(states):
+    """ Compile the states specification into dispatch tables.
+        Transitions take precedence over handlers for the same event type.
+        A transition to an unknown state does nothing. The states and their
+        dispatch tables are read-only views.
+    """
+    dispatches = {state_name: {} for state_name in states}
+    compiled_states = {
+        state_name: _State(
+            state_name,
+            state.get('enter', None),
+            state.get('leave', None),
+            types.MappingProxyType(dispatches[state_name]),
+        )
+        for state_name, state in states.items()
+    }
+    for state_name, state in states.items():
+        dispatch = dispatches[state_name]
+        for event_type, handler in state.get('handlers', {}).items():
+            dispatch[event_type] = (None, handler)
+        for event_type, transition in state.get('transitions', {}).items():
+            next_state = compiled_states.get(transition['next_state'], None)
+            dispatch[event_type] = (next_state, None)
+    return types.MappingProxyType(compiled_states)
 
 
 # EOF
@@ -10,11 +10,23 @@ class FsmTask(task.Task):
     """ Task with a finite state machine
     """
 
-    def __init__(self, name, states, initial_state_name, threaded=True):
+    def __init__(
+            self,
+            name,
+            states,
+            initial_state_name,
+            threaded=True,
+            **queue_options
+    ):
         self._fsm = fsm.Fsm(states, initial_state_name)
-        super(FsmTask, self).__init__(name, None, threaded)
+        super(FsmTask, self).__init__(name, None, threaded, **queue_options)
         return None
 
+    def event_types(self):
+        """ Override 'task.Task'
+        """
+        return self._fsm.event_types()
+
     def _process_event(self, event):
         """ Process an event.
             Forward the event to the FSM's process method.
@@ -0,0 +1,150 @@
+""" Runtime metrics
+    Counts, latencies and durations of the events dispatched by the tasks.
+"""
+
+
+import bisect
+import threading
+import time
+
+
+# upper bounds of the histogram buckets, in seconds: from 1 microsecond to
+# about 24 seconds, every power of the square root of 2
+BUCKETS = tuple(1e-6 * 2 ** (index / 2) for index in range(50))
+
+
+class Histogram(object):
+    """ Histogram of durations, on fixed logarithmic buckets
+        Percentiles are the upper bound of their bucket, at most the maximum.
+    """
+
+    def __init__(self):
+        self._counts = [0] * (len(BUCKETS) + 1)  # the last one is unbounded
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        return None
+
+    def add(self, value):
+        """ Add a duration, in seconds.
+        """
+        self._counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+        return None
+
+    def percentile(self, fraction):
+        """ Return the duration under which this fraction of the values are.
+        """
+        result = 0.0
+        if self.count:
+            rank = fraction * self.count
+            seen = 0
+            bucket = len(BUCKETS)  # above the last bound
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank and count:
+                    bucket = index
+                    break
+            result = self.maximum
+            if bucket < len(BUCKETS):
+                result = min(BUCKETS[bucket], self.maximum)
+        return result
+
+    def summary(self):
+        """ Return the count, mean, median, 90th and 99th percentiles and
+            maximum.
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'max': self.maximum,
+        }
+
+
+class TaskMetrics(object):
+    """ Metrics of the events dispatched by a task, by event type
+        The latency goes from the time the event was queued to its dispatch,
+        the duration is the time spent in its handler.
+        Recorded by the task, read from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._event_types = {}  # event type -> [latency, duration]
+        return None
+
+    def record(self, event_type, latency, duration):
+        """ Record the dispatch of an event.
+        """
+        with self._lock:
+            histograms = self._event_types.get(event_type, None)
+            if histograms is None:
+                histograms = [Histogram(), Histogram()]
+                self._event_types[event_type] = histograms
+            histograms[0].add(latency)
+            histograms[1].add(duration)
+        return None
+
+    def snapshot(self):
+        """ Return the metrics by event type.
+            Count, rate per second, and summaries of latency and duration.
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            snapshot = {
+                event_type: {
+                    'count': latency.count,
+                    'rate': latency.count / elapsed if elapsed else 0.0,
+                    'latency': latency.summary(),
+                    'duration': duration.summary(),
+                }
+                for event_type, (latency, duration)
+                in self._event_types.items()
+            }
+        return snapshot
+
+
+def format_report(tasks):
+    """ Return a text report of the runtime metrics of the tasks.
+    """
+    lines = []
+    for each_task in tasks:
+        task_metrics = each_task.runtime_metrics()
+        queue = task_metrics['queue']
+        lines.append(
+            '{} queue: depth {depth} high-water {high_water} put {put}'
+            ' get {get} coalesced {coalesced} dropped {dropped}'
+            ' rejected {rejected} blocked {blocked}'.format(
+                task_metrics['name'],
+                **queue
+            )
+        )
+        events = task_metrics['events']
+        for event_type in sorted(events, key=str):
+            event_metrics = events[event_type]
+            lines.append(
+                '    {:<24} {:8d} {:9.1f}/s'
+                '  latency p50 {:8.3f} p99 {:8.3f} max {:8.3f} ms'
+                '  duration p50 {:8.3f} p99 {:8.3f} max {:8.3f} ms'.format(
+                    str(event_type),
+                    event_metrics['count'],
+                    event_metrics['rate'],
+                    event_metrics['latency']['p50'] * 1e3,
+                    event_metrics['latency']['p99'] * 1e3,
+                    event_metrics['latency']['max'] * 1e3,
+                    event_metrics['duration']['p50'] * 1e3,
+                    event_metrics['duration']['p99'] * 1e3,
+                    event_metrics['duration']['max'] * 1e3,
+                )
+            )
+    return '\n'.join(lines) + '\n'
+
+
+# EOF
@@ -0,0 +1,452 @@
+""" MPD observer on asyncio
+"""
+
+
+import asyncio
+import collections
+import logging
+
+from . import i18n
+from . import mpd_state
+from . import task
+from . import track
+
+
+LOG = logging.getLogger(__name__)
+
+_ = i18n.translate
+
+
+class CommandError(mpd_state.CommandError):
+    """ Command failed, the server answered with an 'ACK' line.
+    """
+
+
+class ProtocolError(Exception):
+    """ The server does not speak the expected protocol.
+    """
+
+
+class MpdConnection(object):
+    """ Connection to a 'music player daemon' server on asyncio streams.
+        Commands are coroutines. Idling is a coroutine that can be
+        interrupted with 'noidle' on the same connection.
+    """
+
+    _RAW_READ_SIZE = 65536  # bytes, for the long list responses
+
+    def __init__(self, host, port):
+        self._host = host
+        self._port = port
+        self._reader = None
+        self._writer = None
+        self.protocol_version = None
+        return None
+
+    async def connect(self):
+        """ Connect and read the greeting of the server.
+        """
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host,
+            self._port,
+        )
+        greeting = await self._read_line()
+        if not greeting.startswith('OK MPD '):
+            raise ProtocolError(greeting)
+        self.protocol_version = greeting[len('OK MPD '):]
+        return None
+
+    def close(self):
+        """ Close the connection.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+        return None
+
+    async def command(self, name, *args):
+        """ Send a command, return its response as a list of pairs.
+        """
+        self._writer.write(_command_line(name, *args))
+        lines = await self._read_response()
+        return [_split_pair(line) for line in lines]
+
+    async def command_raw(self, name, *args):
+        """ Send a command, return its response as bytes, without the final
+            'OK'. The response is read in large buffers and not split into
+            lines, for the long lists, see 'track.read_track_list'.
+        """
+        self._writer.write(_command_line(name, *args))
+        chunks = []
+        head = b''  # first bytes read
+        tail = b'\n'  # last bytes read, the response starts on a new line
+        while True:
+            chunk = await self._reader.read(self._RAW_READ_SIZE)
+            if not chunk:
+                raise ConnectionError(_("Connection closed by the server."))
+            chunks.append(chunk)
+            if len(head) < 4:
+                head = (head + chunk)[:4]
+            tail = (tail + chunk[-4:])[-4:]
+            if tail == b'\nOK\n':
+                break
+            if head == b'ACK ' and chunk.endswith(b'\n'):
+                line = b''.join(chunks)[:-1].decode('utf-8')
+                raise CommandError(line[len('ACK '):])
+        return b''.join(chunks)[:-len(b'OK\n')]
+
+    async def command_list(self, commands):
+        """ Send commands in a single round-trip.
+            Commands are tuples of name and arguments.
+            Return one list of pairs per command.
+        """
+        data = [b'command_list_ok_begin\n']
+        data.extend(_command_line(*command) for command in commands)
+        data.append(b'command_list_end\n')
+        self._writer.write(b''.join(data))
+        lines = await self._read_response()
+        results = []
+        pairs = []
+        for line in lines:
+            if line == 'list_OK':
+                results.append(pairs)
+                pairs = []
+            else:
+                pairs.append(_split_pair(line))
+        return results
+
+    async def idle(self, subsystems, wake):
+        """ Wait for changes in the given subsystems.
+            Interrupt with 'noidle' as soon as the 'asyncio.Event' 'wake' is
+            set. Return the changed subsystems, possibly none.
+        """
+        self._writer.write(_command_line('idle', *subsystems))
+        reading = asyncio.ensure_future(self._read_response())
+        waking = asyncio.ensure_future(wake.wait())
+        try:
+            done, dummy_pending = await asyncio.wait(
+                (reading, waking),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if reading not in done:
+                self._writer.write(b'noidle\n')
+            lines = await reading
+        finally:
+            waking.cancel()
+            reading.cancel()
+        return [
+            value for key, value in map(_split_pair, lines)
+            if key == 'changed'
+        ]
+
+    async def _read_response(self):
+        """ Read the lines of a response up to the final 'OK'.
+        """
+        lines = []
+        while True:
+            line = await self._read_line()
+            if line == 'OK':
+                break
+            if line.startswith('ACK '):
+                raise CommandError(line[len('ACK '):])
+            lines.append(line)
+        return lines
+
+    async def _read_line(self):
+        line = await self._reader.readline()
+        if not line.endswith(b'\n'):
+            raise ConnectionError(_("Connection closed by the server."))
+        return line[:-1].decode('utf-8')
+
+
+class _Session(object):
+    """ Observer of one server
+        Refresh what changed on every wake-up of 'idle', send the queued
+        commands on every wake-up of the engine.
+    """
+
+    # subsystems consumed by the session, others do not wake it up
+    _IDLE_SUBSYSTEMS = (
+        'database',
+        'player',
+        'playlist',
+    )
+
+    _RECONNECT_DELAY = 5.0  # seconds
+
+    def __init__(self, host, port, emit, playlist_version=None):
+        self._server = '{}:{}'.format(host, port)  # tags the emitted events
+        self._connection = MpdConnection(host, port)
+        self._commands = []
+        self._wake = None
+        self._state = mpd_state.ServerState(
+            self._server,
+            emit,
+            _Commands(self._connection),
+            playlist_version,
+        )
+        return None
+
+    @property
+    def server(self):
+        """ Name of the server, as found in the emitted events.
+        """
+        return self._server
+
+    def queue_command(self, name, *args):
+        """ Queue a command and interrupt the idling connection.
+            Commands queued during one wake-up are sent in one round-trip.
+        """
+        self._commands.append((name,) + args)
+        if self._wake is not None:
+            self._wake.set()
+        return None
+
+    async def run(self):
+        """ Observe the server until cancelled, reconnecting on failure.
+        """
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await self._connection.connect()
+                await self._observe()
+            except (OSError, ProtocolError) as error:
+                LOG.error(
+                    _("Lost connection to %s, %s"),
+                    self._server,
+                    error,
+                )
+            except CommandError as error:  # unexpected, start over
+                LOG.error(
+                    _("Command failed on %s, %s"),
+                    self._server,
+                    error,
+                )
+            finally:
+                self._connection.close()
+            self._state.reset()
+            await asyncio.sleep(self._RECONNECT_DELAY)
+
+    async def _observe(self):
+        await self._state.check_status()
+        while True:
+            self._wake.clear()
+            if self._commands:
+                await self._send_commands()
+            subsystems = await self._connection.idle(
+                self._IDLE_SUBSYSTEMS,
+                self._wake,
+            )
+            await self._state.refresh(subsystems)
+
+    async def _send_commands(self):
+        commands = self._commands
+        self._commands = []
+        try:
+            await self._connection.command_list(commands)
+        except CommandError as error:
+            LOG.error(_("Command failed, %s"), error)
+        return None
+
+
+class _Commands(object):
+    """ Commands of the server state, see 'mpd_state.ServerState'
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        return None
+
+    async def fetch_status(self, fetch_track, changes_version):
+        """ Return the status, the current song and the playlist changes.
+        """
+        commands = [('status',)]
+        if fetch_track:
+            commands.append(('currentsong',))
+        if changes_version is not None:
+            commands.append(('plchangesposid', changes_version))
+        results = iter(await self._connection.command_list(commands))
+        status = _read_object(next(results))
+        raw_track = _read_object(next(results)) if fetch_track else None
+        changes = None
+        if changes_version is not None:
+            changes = _read_objects(next(results), 'cpos')
+        return (status, raw_track, changes)
+
+    async def fetch_songs(self, song_ids):
+        """ Return the songs.
+        """
+        results = await self._connection.command_list([
+            ('playlistid', song_id) for song_id in song_ids
+        ])
+        return [_read_object(result) for result in results]
+
+    async def fetch_page(self, start, end, track_cache):
+        """ Return the track records of a range of the playlist.
+            The response is parsed in bulk, see 'track.read_track_list'.
+        """
+        data = await self._connection.command_raw(
+            'playlistinfo',
+            '{}:{}'.format(start, end),
+        )
+        return track.read_track_list(data, track_cache)
+
+
+class AsyncMpdClient(task.Task):
+    """ Interface to 'music player daemon' servers on asyncio
+        Same events as 'mpd_client.MpdClient'. The idling connections are
+        interrupted with 'noidle', no wake-up connection is needed, and all
+        the servers are watched from a single thread.
+        Commands go to the server named by their 'server' key, to all
+        servers if there is none.
+    """
+
+    def __init__(self, name, servers, playlist_versions=None):
+        playlist_versions = playlist_versions or {}  # server name -> version
+        self._sessions = collections.OrderedDict()  # server name -> session
+        for host, port in servers:
+            session = _Session(
+                host,
+                port,
+                self._emit,
+                playlist_versions.get('{}:{}'.format(host, port), None),
+            )
+            self._sessions[session.server] = session
+        self._loop = None
+        self._stopped = None
+        event_handlers = {
+            'previous': self._event_handler_previous,
+            'next': self._event_handler_next,
+            'pause': self._event_handler_pause,
+            'quit': self._event_handler_quit,
+        }
+        super(AsyncMpdClient, self).__init__(name, event_handlers)
+        return None
+
+    def stop(self):
+        """ Override 'task.Task'
+        """
+        super(AsyncMpdClient, self).stop()
+        self._notify()
+        return None
+
+    def _task(self):
+        """ Override 'task.Task'
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._main())
+        finally:
+            self._loop = None
+            loop.close()
+        return None
+
+    async def _main(self):
+        self._keep_running = True
+        self._stopped = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        sessions = [
+            asyncio.ensure_future(session.run())
+            for session in self._sessions.values()
+        ]
+        self._wake_up()  # events posted before the loop was running
+        await self._stopped.wait()
+        for session in sessions:
+            session.cancel()
+        await asyncio.gather(*sessions, return_exceptions=True)
+        return None
+
+    def _notify(self):
+        """ Override 'task.Task'
+            Process the queued events on the loop thread.
+        """
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake_up)
+            except RuntimeError:
+                pass  # loop already closed
+        return None
+
+    def _wake_up(self):
+        self._process_event_queue()
+        if not self._keep_running:
+            self._stopped.set()
+        return None
+
+    def _queue_command(self, event, name):
+        server = event.get('server', None)
+        for session_server, session in self._sessions.items():
+            if server is None or server == session_server:
+                session.queue_command(name)
+        return None
+
+    def _event_handler_previous(self, event):
+        self._queue_command(event, 'previous')
+        return None
+
+    def _event_handler_next(self, event):
+        self._queue_command(event, 'next')
+        return None
+
+    def _event_handler_pause(self, event):
+        self._queue_command(event, 'pause')
+        return None
+
+    def _event_handler_quit(self, dummy_event):
+        self.stop()
+        return None
+
+
+def _command_line(name, *args):
+    words = [name]
+    words.extend(_quote(arg) for arg in args)
+    return (' '.join(words) + '\n').encode('utf-8')
+
+
+def _quote(arg):
+    arg = str(arg).replace('\\', '\\\\').replace('"', '\\"')
+    return '"{}"'.format(arg)
+
+
+def _split_pair(line):
+    key, separator, value = line.partition(': ')
+    if not separator:
+        raise ProtocolError(line)
+    return key, value
+
+
+def _read_object(pairs):
+    """ Build a dict from response pairs, as 'python-mpd2' does.
+        Keys are lower case, repeated keys collect their values in a list.
+    """
+    result = {}
+    for key, value in pairs:
+        key = key.lower()
+        if key in result:
+            if not isinstance(result[key], list):
+                result[key] = [result[key]]
+            result[key].append(value)
+        else:
+            result[key] = value
+    return result
+
+
+def _read_objects(pairs, delimiter):
+    """ Split response pairs into one dict per object, songs for example.
+        Each object starts with the delimiter key.
+    """
+    objects = []
+    object_pairs = []
+    for pair in pairs:
+        if pair[0] == delimiter and object_pairs:
+            objects.append(_read_object(object_pairs))
+            object_pairs = []
+        object_pairs.append(pair)
+    if object_pairs:
+        objects.append(_read_object(object_pairs))
+    return objects
+
+
+# EOF
@@ -3,12 +3,16 @@
 
 
 import logging
-import uuid
+import os
+import select
+import socket
+import threading
 
 import mpd
 
 from . import fsm_task
 from . import i18n
+from . import mpd_state
 
 
 LOG = logging.getLogger(__name__)
@@ -20,14 +24,25 @@ class MpdClient(fsm_task.FsmTask):
     """ Interface to 'music player daemon' server.
     """
 
-    def __init__(self, name, host, port):
+    # subsystems consumed by this client, others do not wake it up
+    _IDLE_SUBSYSTEMS = (
+        'database',
+        'player',
+        'playlist',
+    )
+
+    def __init__(self, name, host, port, playlist_version=None):
         self._host = host
         self._port = port
         self._mpd_client = mpd.MPDClient(use_unicode=True)
-        self._status = None
+        self._state = mpd_state.ServerState(
+            '{}:{}'.format(host, port),
+            self._emit,
+            _Commands(self._mpd_client),
+            playlist_version,
+        )
         self._connected = False
-        self._notify_channel = str(uuid.uuid4())
-        self._notify_message = str(uuid.uuid4())
+        self._wakeup = _Wakeup()  # interrupts the idling client
         states = {
             'initializing': {
                 'transitions': {
@@ -62,6 +77,20 @@ class MpdClient(fsm_task.FsmTask):
         super(MpdClient, self).__init__(name, states, 'initializing')
         return None
 
+    def notify_statistics(self):
+        """ Return the counters of the notifications.
+            Wake-ups sent through the self-pipe, and posts coalesced into an
+            already pending wake-up.
+        """
+        return self._wakeup.statistics()
+
+    def stop(self):
+        """ Override 'task.Task'
+        """
+        super(MpdClient, self).stop()
+        self._notify()
+        return None
+
     def _run_pre(self):
         """ Override 'task.Task'
         """
@@ -74,60 +103,49 @@ class MpdClient(fsm_task.FsmTask):
     def _run_post(self):
         """ Override 'task.Task'
         """
-        self._mpd_client.unsubscribe(self._notify_channel)
         self._mpd_client.close()
+        self._mpd_client.disconnect()
+        self._wakeup.close()
         return None
 
     def _routine(self):
         """ Override 'task.Task'
+            Idle until the server reports changes or events are posted.
+            A post interrupts the idle with 'noidle' on the same connection.
         """
         if self._connected:
-            self._mpd_client.idle()
-            if self._woken_by_message():
-                self._process_event_queue()
+            self._mpd_client.send_idle(*self._IDLE_SUBSYSTEMS)
+            readable, dummy_w, dummy_x = select.select(
+                [self._mpd_client, self._wakeup],
+                [],
+                [],
+            )
+            if self._mpd_client in readable:
+                subsystems = self._mpd_client.fetch_idle()
             else:
-                self._check_status()
+                subsystems = self._mpd_client.noidle()
+            mpd_state.run_sync(self._state.refresh(subsystems))
+            if self._wakeup in readable:
+                self._wakeup.clear()
+                self._process_commands()
         else:
-            self._process_event_queue()
+            self._wait_event_queue()
         return None
 
     def _notify(self):
         """ Override 'task.Task'
+            Wake up the idling client through the self-pipe.
         """
-        if self._connected:
-            client = mpd.MPDClient()
-            client.connect(self._host, self._port)
-            try:
-                client.sendmessage(self._notify_channel, self._notify_message)
-            except mpd.CommandError:
-                LOG.error(_("Could not notify."))
-            client.close()
-        return None
-
-    def _woken_by_message(self):
-        result = False
-        for message in self._mpd_client.readmessages():
-            chn = message.get('channel', None)
-            msg = message.get('message', None)
-            if chn == self._notify_channel and msg == self._notify_message:
-                result = True
-                break
-        return result
-
-    def _check_status(self):
-        status = self._mpd_client.status()
-        if not self._status or status['songid'] != self._status['songid']:
-            track = self._mpd_client.currentsong()
-            self._emit({
-                'type': 'mpd.track',
-                'value': track,
-            })
-            playlist = self._mpd_client.playlistinfo()
-            self._emit({
-                'type': 'mpd.playlist',
-                'value': playlist,
-            })
-        self._status = status
+        self._wakeup.notify()
+        return None
+
+    def _process_commands(self):
+        """ Process the event queue, sending the resulting commands to the
+            server in a single round-trip.
+        """
+        self._mpd_client.command_list_ok_begin()
+        self._process_event_queue()
+        self._mpd_client.command_list_end()
         return None
 
     def _event_handler_previous(self, dummy_event_value):
@@ -148,9 +166,9 @@ class MpdClient(fsm_task.FsmTask):
 
     def _enter_connecting(self, dummy_event):
         self._mpd_client.connect(self._host, self._port)
-        self._mpd_client.subscribe(self._notify_channel)
+        _set_no_delay(self._mpd_client)
         self._connected = True
-        self._check_status()
+        mpd_state.run_sync(self._state.check_status())
         self.post({
             'type': 'connected',
             'value': None,
@@ -158,4 +176,126 @@ class MpdClient(fsm_task.FsmTask):
         return None
 
 
+class _Wakeup(object):
+    """ Self-pipe waking up a thread waiting in 'select'
+        Notifications arriving while a wake-up is pending are coalesced into
+        it. Selectable, it has a file descriptor.
+    """
+
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self._lock = threading.Lock()
+        self._pending = False
+        self._statistics = {
+            'wakeups': 0,
+            'coalesced': 0,
+        }
+        return None
+
+    def fileno(self):
+        """ Return the file descriptor to select for reading.
+        """
+        return self._reader.fileno()
+
+    def notify(self):
+        """ Wake up the waiting thread, unless a wake-up is pending.
+            Called from any thread.
+        """
+        with self._lock:
+            if self._pending:
+                self._statistics['coalesced'] += 1
+            else:
+                self._writer.send(b'\0')
+                self._pending = True
+                self._statistics['wakeups'] += 1
+        return None
+
+    def clear(self):
+        """ Consume the pending wake-up.
+        """
+        with self._lock:
+            self._reader.recv(4096)
+            self._pending = False
+        return None
+
+    def statistics(self):
+        """ Return the number of wake-ups and of coalesced notifications.
+        """
+        with self._lock:
+            statistics = dict(self._statistics)
+        return statistics
+
+    def close(self):
+        """ Close the self-pipe.
+        """
+        self._reader.close()
+        self._writer.close()
+        return None
+
+
+class _Commands(object):
+    """ Commands of the server state, see 'mpd_state.ServerState'
+        They block, the state is run with 'mpd_state.run_sync'.
+    """
+
+    def __init__(self, mpd_client):
+        self._mpd_client = mpd_client
+        return None
+
+    async def fetch_status(self, fetch_track, changes_version):
+        """ Return the status, the current song and the playlist changes.
+        """
+        self._mpd_client.command_list_ok_begin()
+        self._mpd_client.status()
+        if fetch_track:
+            self._mpd_client.currentsong()
+        if changes_version is not None:
+            self._mpd_client.plchangesposid(changes_version)
+        results = iter(self._mpd_client.command_list_end())
+        status = next(results)
+        raw_track = next(results) if fetch_track else None
+        changes = next(results) if changes_version is not None else None
+        return (status, raw_track, changes)
+
+    async def fetch_songs(self, song_ids):
+        """ Return the songs.
+        """
+        self._mpd_client.command_list_ok_begin()
+        for song_id in song_ids:
+            self._mpd_client.playlistid(song_id)
+        try:
+            results = self._mpd_client.command_list_end()
+        except mpd.CommandError as error:
+            raise mpd_state.CommandError(str(error)) from error
+        return [result[0] for result in results]
+
+    async def fetch_page(self, start, end, track_cache):
+        """ Return the track records of a range of the playlist.
+            The positions follow from the range, they are not parsed.
+        """
+        try:
+            raw_tracks = self._mpd_client.playlistinfo(
+                '{}:{}'.format(start, end),
+            )
+        except mpd.CommandError as error:
+            raise mpd_state.CommandError(str(error)) from error
+        return [
+            track_cache.read_track(raw_track, pos)
+            for pos, raw_track in enumerate(raw_tracks, start)
+        ]
+
+
+def _set_no_delay(mpd_client):
+    """ Disable Nagle's algorithm on the connection of the client.
+        'python-mpd2' writes and flushes each command line on its own, the
+        lines of a command list would otherwise wait for the delayed
+        acknowledgement of the previous ones.
+    """
+    connection = socket.socket(fileno=os.dup(mpd_client.fileno()))
+    if connection.family in (socket.AF_INET, socket.AF_INET6):
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    connection.close()
+    return None
+
+
 # EOF
@@ -0,0 +1,212 @@
+""" State of an MPD server, shared by the client engines
+"""
+
+
+from . import i18n
+from . import track
+
+
+_ = i18n.translate
+
+
+class CommandError(Exception):
+    """ Command failed, the server answered with an 'ACK' line.
+    """
+
+
+class ServerState(object):
+    """ What a client knows of one server
+        Current song, playlist version and track cache. Refreshed the same
+        way by every engine, only the commands differ: the refreshing
+        methods are coroutines awaiting the commands object of the engine,
+        which offers these coroutines:
+        'fetch_status(fetch_track, changes_version)' returns the status,
+        the current song if 'fetch_track', and the changes since
+        'changes_version' if it is not None, in a single round-trip,
+        'fetch_songs(song_ids)' returns the songs in a single round-trip,
+        'fetch_page(start, end, track_cache)' returns the track records of
+        a range of the playlist.
+        A command the server refuses raises 'CommandError'. The threaded
+        engine runs blocking commands, see 'run_sync'.
+        The track cache trusts the song ids of the changes, which are only
+        unique while the server runs: it is cleared when the connection is
+        lost, and before loading the whole playlist.
+    """
+
+    _PLAYLIST_PAGE_SIZE = 1000  # tracks per 'playlistinfo' request
+
+    _TRACK_CACHE_SIZE = 100000  # track records
+
+    def __init__(self, server, emit, commands, playlist_version=None):
+        self._server = server  # tags the emitted events
+        self._emit = emit
+        self._commands = commands
+        self._songid = None
+        self._track_known = False
+        self._playlist_version = playlist_version  # of the known playlist
+        self._track_cache = track.TrackCache(self._TRACK_CACHE_SIZE)
+        return None
+
+    def reset(self):
+        """ Forget what is known of the server, the connection was lost.
+        """
+        self._songid = None
+        self._track_known = False
+        self._playlist_version = None
+        self._track_cache.clear()
+        return None
+
+    async def refresh(self, subsystems):
+        """ Refresh only what the changed subsystems require.
+        """
+        if 'database' in subsystems:
+            self._track_cache.clear()
+        status_subsystems = [
+            subsystem for subsystem in subsystems
+            if subsystem in ('player', 'playlist')
+        ]
+        if status_subsystems:
+            await self.check_status(status_subsystems)
+        return None
+
+    async def check_status(self, subsystems=('player', 'playlist')):
+        """ Refresh what the changed subsystems require.
+            Status, current track and positions of the changed songs are
+            fetched in a single round-trip.
+        """
+        fetch_track = 'player' in subsystems
+        changes_version = None
+        if 'playlist' in subsystems:
+            changes_version = self._playlist_version
+        status, raw_track, changes = await self._commands.fetch_status(
+            fetch_track,
+            changes_version,
+        )
+        if fetch_track:
+            self._check_track(status, raw_track)
+        if 'playlist' in subsystems:
+            await self._check_playlist(status, changes)
+        return None
+
+    def _check_track(self, status, raw_track):
+        """ Emit the current track if it changed.
+        """
+        songid = status.get('songid', None)
+        if not self._track_known or songid != self._songid:
+            self._emit({
+                'type': 'mpd.track',
+                'server': self._server,
+                'value': self._track_cache.read_track(raw_track),
+            })
+            self._songid = songid
+            self._track_known = True
+        return None
+
+    async def _check_playlist(self, status, changes):
+        """ Emit the changes to the playlist since the last known version.
+            Load the whole playlist if no version is known yet, or on a gap
+            (the version went backwards, the server was probably restarted).
+        """
+        version = int(status['playlist'])
+        length = int(status['playlistlength'])
+        if self._playlist_version is None or version < self._playlist_version:
+            version = await self._load_playlist(length, version)
+        elif version != self._playlist_version:
+            try:
+                tracks = await self._read_changes(changes)
+            except CommandError:  # a changed song is already gone
+                version = await self._load_playlist(length, version)
+            else:
+                self._emit({
+                    'type': 'mpd.playlist_delta',
+                    'server': self._server,
+                    'value': {
+                        'changes': tracks,
+                        'length': length,
+                        'version': version,
+                    },
+                })
+        self._playlist_version = version
+        return None
+
+    async def _read_changes(self, changes):
+        """ Return the track records of the changed songs.
+            Songs only moved are found in the cache, the others are fetched
+            in a single round-trip.
+        """
+        tracks = [
+            self._track_cache.get(int(change['id']), int(change['cpos']))
+            for change in changes
+        ]
+        missing = [
+            change['id']
+            for change, cached_track in zip(changes, tracks)
+            if cached_track is None
+        ]
+        if missing:
+            fetched = iter(await self._commands.fetch_songs(missing))
+            tracks = [
+                cached_track or self._track_cache.read_track(next(fetched))
+                for cached_track in tracks
+            ]
+        return tracks
+
+    async def _load_playlist(self, length, version):
+        """ Stream the whole playlist as a sequence of chunks.
+            Only one page of the playlist is held at a time. Changes made
+            while loading are caught by the next 'plchangesposid'. Start over
+            with the new length and version if the playlist shrinks past the
+            page to load. Return the version loaded.
+        """
+        self._track_cache.clear()
+        start = 0
+        while True:
+            end = start + self._PLAYLIST_PAGE_SIZE
+            tracks = []
+            if start < length:
+                try:
+                    tracks = await self._commands.fetch_page(
+                        start,
+                        end,
+                        self._track_cache,
+                    )
+                except CommandError:  # 'Bad song index'
+                    status, dummy_track, dummy_changes = (
+                        await self._commands.fetch_status(False, None)
+                    )
+                    length = int(status['playlistlength'])
+                    version = int(status['playlist'])
+                    start = 0
+                    continue
+            self._emit({
+                'type': 'mpd.playlist_chunk',
+                'server': self._server,
+                'value': {
+                    'start': start,
+                    'tracks': tracks,
+                    'length': length,
+                    'version': version,
+                },
+            })
+            start = end
+            if start >= length:
+                break
+        return version
+
+
+def run_sync(coroutine):
+    """ Run a coroutine whose awaited commands block instead of suspending.
+        Return its result.
+    """
+    result = None
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        result = stop.value
+    else:
+        coroutine.close()
+        raise RuntimeError(_("The commands must not suspend."))
+    return result
+
+
+# EOF
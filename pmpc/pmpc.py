@@ -2,18 +2,52 @@
 """
 
 
+import collections
+import sys
+
+from . import event_queue
 from . import i18n
-from . import mpd_client
-from . import systray
+from . import snapshot
 from . import task
-from . import window
+from . import track
+
+# the engines and the frontends are imported only when they are used:
+# tkinter, asyncio, 'python-mpd2' and 'pywin32' are slow or not available
 
 
 _ = i18n.translate
 
+# implementations of the MPD client tasks:
+# 'asyncio' watches all the servers from a single thread,
+# 'thread' runs one task, and thread, per server
+ENGINES = (
+    'asyncio',
+    'thread',
+)
+DEFAULT_ENGINE = 'thread'
+
+# frontends showing the state of the servers
+FRONTENDS = (
+    'stream',  # JSON lines, headless
+    'systray',  # Windows only
+    'window',
+)
+DEFAULT_FRONTENDS = ('window',)
+if sys.platform == 'win32':
+    DEFAULT_FRONTENDS = ('systray', 'window')
 
-class Pmpc(task.Task):
-    """ GUI client for 'music player daemon'
+DEFAULT_SLICE_BUDGET = 0.008  # seconds, see 'window.Playlist'
+
+
+class Pmpc(task.Task):  # pylint: disable=too-many-instance-attributes
+    """ Client for 'music player daemon'
+        Watch one or more servers. The events of the MPD clients are tagged
+        with the name of their server, the playback actions go to the server
+        selected in the window.
+        The playlists are saved as snapshots on exit, and shown right away
+        on the next start, while the clients only fetch what changed since.
+        Without the window and the system tray icon, it runs headless, and
+        the stream is the way to follow and control the servers.
     """
 
     _MENU = [{
@@ -30,73 +64,257 @@ class Pmpc(task.Task):
         'action': 'quit',
     }]
 
-    def __init__(self, name, host, port):
-        self._mpc = mpd_client.MpdClient('mpc', host, port)
-        self._systray = systray.Systray('systray', self._MENU)
-        self._window = window.Window('window')
+    _MAX_QUEUE_SIZE = 256
+
+    def __init__(
+            self,
+            name,
+            servers,
+            *,
+            virtual_playlist=False,
+            slice_budget=DEFAULT_SLICE_BUDGET,
+            engine=DEFAULT_ENGINE,
+            snapshot_directory=None,
+            frontends=DEFAULT_FRONTENDS,
+            stream_path=None,
+    ):
+        self._snapshot_directory = snapshot_directory  # None to disable
+        # server -> [version, tracks], the version is None while loading
+        self._playlists = self._load_snapshots(servers)
+        self._mpcs = self._create_mpd_clients(  # server -> task
+            servers,
+            engine,
+            {
+                server: playlist[0]
+                for server, playlist in self._playlists.items()
+            },
+        )
+        self._server_names = list(self._mpcs)
+        self._selected_server = self._server_names[0]
+        self._systray = None
+        self._stream = None
+        self._window = None
+        self._create_frontends(
+            frontends,
+            virtual_playlist,
+            slice_budget,
+            stream_path,
+        )
+        for server, playlist in self._playlists.items():
+            if playlist[0] is not None:
+                self._post_views({
+                    'type': 'playlist',
+                    'server': server,
+                    'value': playlist[1],
+                })
         event_handlers = {
             'mpd.track': self._event_handler_mpd_track,
-            'mpd.playlist': self._event_handler_mpd_playlist,
+            'mpd.playlist_chunk': self._event_handler_mpd_playlist_chunk,
+            'mpd.playlist_delta': self._event_handler_mpd_playlist_delta,
             'icon.menu': self._event_handler_icon_menu,
             'icon.menu_item': self._event_handler_icon_menu_item,
             'window.pause': self._event_handler_pause,
             'window.next': self._event_handler_next,
             'window.previous': self._event_handler_previous,
             'window.quit': self._event_handler_quit,
+            'window.server': self._event_handler_window_server,
+            'stream.pause': self._event_handler_pause,
+            'stream.next': self._event_handler_next,
+            'stream.previous': self._event_handler_previous,
+            'stream.quit': self._event_handler_quit,
+            'quit': self._event_handler_quit,
+        }
+        event_policies = {
+            'mpd.track': event_queue.KEEP_LATEST,
+            'mpd.playlist_delta': track.merge_playlist_deltas,
+            'mpd.playlist_chunk': track.merge_playlist_chunks,
+            # never dropped on overflow
+            'window.quit': event_queue.KEEP_LATEST,
+            'stream.quit': event_queue.KEEP_LATEST,
+            'quit': event_queue.KEEP_LATEST,
         }
-        super(Pmpc, self).__init__(name, event_handlers)
+        super(Pmpc, self).__init__(
+            name,
+            event_handlers,
+            event_policies=event_policies,
+            max_queue_size=self._MAX_QUEUE_SIZE,
+            overflow_policy=event_queue.COALESCE,
+            event_superseding={
+                'mpd.playlist_chunk': _superseded_by_playlist_chunk,
+            },
+        )
         return None
 
     def run_ui_task(self):
-        """ Start the UI task.
+        """ Start the UI task, if there is a window.
             Tkinter does not want to run in a thread.
         """
-        self._window.start()
+        if self._window is not None:
+            self._window.start()
         return None
 
     def _run_pre(self):
         """ Override 'task.Task'
         """
-        self._mpc.start()
-        self._systray.start()
+        for mpc in _unique(self._mpcs.values()):
+            mpc.start()
+        if self._systray is not None:
+            self._systray.start()
+        if self._stream is not None:
+            self._stream.start()
         return None
 
     def _run_post(self):
         """ Override 'task.Task'
         """
-        self._mpc.join()
-        self._systray.join()
+        for mpc in _unique(self._mpcs.values()):
+            mpc.join()
+        if self._systray is not None:
+            self._systray.join()
+        if self._stream is not None:
+            self._stream.join()
+        self._save_snapshots()
+        return None
+
+    def _create_mpd_clients(self, servers, engine, playlist_versions):
+        """ Create the MPD client tasks, see 'create_mpd_clients'.
+        """
+        return create_mpd_clients(servers, engine, playlist_versions)
+
+    def _create_frontends(
+            self,
+            frontends,
+            virtual_playlist,
+            slice_budget,
+            stream_path,
+    ):
+        """ Create the frontend tasks, see 'FRONTENDS'.
+        """
+        # pylint: disable=import-outside-toplevel
+        if 'systray' in frontends:
+            from . import systray
+            self._systray = systray.Systray('systray', self._MENU)
+        if 'stream' in frontends:
+            from . import stream
+            self._stream = stream.Stream(
+                'stream',
+                self._server_names,
+                stream_path,
+            )
+        if 'window' in frontends:
+            from . import window
+            self._window = window.Window(
+                'window',
+                self._server_names,
+                virtual_playlist,
+                slice_budget,
+            )
+        return None
+
+    def _load_snapshots(self, servers):
+        playlists = collections.OrderedDict()
+        for host, port in servers:
+            server = '{}:{}'.format(host, port)
+            playlists[server] = [None, []]
+            if self._snapshot_directory is not None:
+                loaded = snapshot.load(self._snapshot_directory, server)
+                if loaded is not None:
+                    playlists[server] = list(loaded)
+        return playlists
+
+    def _save_snapshots(self):
+        if self._snapshot_directory is not None:
+            for server, (version, tracks) in self._playlists.items():
+                if version is not None:
+                    snapshot.save(
+                        self._snapshot_directory,
+                        server,
+                        version,
+                        tracks,
+                    )
+        return None
+
+    def _update_playlist(self, server, changes, length, version):
+        """ Keep the playlist of the server up to date for its snapshot.
+        """
+        playlist = self._playlists[server]
+        playlist[0] = version
+        playlist[1] = track.apply_playlist_delta(playlist[1], changes, length)
+        return None
+
+    def _post_views(self, event):
+        """ Post to the frontends showing the tracks and the playlists.
+        """
+        if self._window is not None:
+            self._window.post(event)
+        if self._stream is not None:
+            self._stream.post(event)
+        return None
+
+    def _post_systray(self, event):
+        if self._systray is not None:
+            self._systray.post(event)
         return None
 
     def _event_handler_mpd_track(self, event):
-        track = _read_track(event['value'])
-        self._systray.post({
-            'type': 'balloon',
+        current_track = event['value']
+        if event['server'] == self._selected_server:
+            self._post_systray({
+                'type': 'balloon',
+                'value': {
+                    'title': current_track.title,
+                    'info': current_track.artist,
+                },
+            })
+        self._post_views({
+            'type': 'track',
+            'server': event['server'],
+            'value': current_track,
+        })
+        return None
+
+    def _event_handler_mpd_playlist_chunk(self, event):
+        """ Show the playlist progressively, chunk after chunk.
+            A chunk is applied like a delta replacing its range of tracks.
+        """
+        value = event['value']
+        complete = value['start'] + len(value['tracks']) >= value['length']
+        self._update_playlist(
+            event['server'],
+            value['tracks'],
+            value['length'],
+            value['version'] if complete else None,
+        )
+        self._post_views({
+            'type': 'playlist_delta',
+            'server': event['server'],
             'value': {
-                'title': track['title'],
-                'info': track['artist'],
+                'changes': event['value']['tracks'],
+                'length': event['value']['length'],
             },
         })
-        self._window.post({
-            'type': 'track',
-            'value': track,
-        })
         return None
 
-    def _event_handler_mpd_playlist(self, event):
-        raw_playlist = event['value']
-        playlist = []
-        for raw_track in raw_playlist:
-            track = _read_track(raw_track)
-            playlist.append(track)
-        self._window.post({
-            'type': 'playlist',
-            'value': playlist,
+    def _event_handler_mpd_playlist_delta(self, event):
+        self._update_playlist(
+            event['server'],
+            event['value']['changes'],
+            event['value']['length'],
+            event['value']['version'],
+        )
+        self._post_views({
+            'type': 'playlist_delta',
+            'server': event['server'],
+            'value': event['value'],
         })
         return None
 
+    def _event_handler_window_server(self, event):
+        self._selected_server = event['value']
+        return None
+
     def _event_handler_icon_menu(self, dummy_event):
-        self._systray.post({
+        self._post_systray({
             'type': 'menu',
             'value': self._MENU,
         })
@@ -114,25 +332,30 @@ class Pmpc(task.Task):
             self._event_handler_previous(event)
         return None
 
-    def _event_handler_pause(self, dummy_event):
-        self._mpc.post({
-            'type': 'pause',
+    def _post_command(self, event, command):
+        """ Post a playback command to the task of the targeted server.
+            Commands from the window, and from the stream when they name a
+            server, go to that server. The others go to the server selected
+            in the window.
+        """
+        server = event.get('server', self._selected_server)
+        self._mpcs[server].post({
+            'type': command,
+            'server': server,
             'value': None,
         })
         return None
 
-    def _event_handler_next(self, dummy_event):
-        self._mpc.post({
-            'type': 'next',
-            'value': None,
-        })
+    def _event_handler_pause(self, event):
+        self._post_command(event, 'pause')
         return None
 
-    def _event_handler_previous(self, dummy_event):
-        self._mpc.post({
-            'type': 'previous',
-            'value': None,
-        })
+    def _event_handler_next(self, event):
+        self._post_command(event, 'next')
+        return None
+
+    def _event_handler_previous(self, event):
+        self._post_command(event, 'previous')
         return None
 
     def _event_handler_quit(self, dummy_event):
@@ -145,13 +368,48 @@ class Pmpc(task.Task):
         return None
 
 
-def _read_track(raw_track):
-    track = {
-        'artist': raw_track.get('artist', ""),
-        'title': raw_track.get('title', ""),
-        'pos': raw_track.get('pos', ""),
-    }
-    return track
+def create_mpd_clients(servers, engine, playlist_versions):
+    """ Create the MPD client tasks for the servers, host and port pairs.
+        Return them by server name, in order.
+    """
+    # pylint: disable=import-outside-toplevel
+    mpcs = collections.OrderedDict()
+    if engine == 'asyncio':
+        from . import mpd_async
+        mpc = mpd_async.AsyncMpdClient('mpc', servers, playlist_versions)
+        for host, port in servers:
+            mpcs['{}:{}'.format(host, port)] = mpc
+    else:
+        from . import mpd_client  # needs 'python-mpd2'
+        for host, port in servers:
+            server = '{}:{}'.format(host, port)
+            mpcs[server] = mpd_client.MpdClient(
+                'mpc {}'.format(server),
+                host,
+                port,
+                playlist_versions[server],
+            )
+    return mpcs
+
+
+def _superseded_by_playlist_chunk(event):
+    """ Return the event types superseded by a playlist chunk.
+        A first chunk starts a full reload: the pending deltas and chunks of
+        its server describe an older playlist, applying them after it would
+        bring stale tracks back.
+    """
+    superseded = ()
+    if event['value']['start'] == 0:
+        superseded = ('mpd.playlist_delta', 'mpd.playlist_chunk')
+    return superseded
+
+
+def _unique(tasks):
+    result = []
+    for each_task in tasks:
+        if each_task not in result:
+            result.append(each_task)
+    return result
 
 
 # EOF
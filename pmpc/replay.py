@@ -0,0 +1,196 @@
+""" Replay
+    Feed a trace of events to the application without any MPD server, see
+    'trace', and report the runtime metrics of its tasks.
+"""
+
+
+import argparse
+import collections
+import logging
+import sys
+import time
+
+from . import i18n
+from . import metrics
+from . import pmpc
+from . import script
+from . import task
+from . import trace
+
+
+_ = i18n.translate
+
+DEFAULT_SPEED = 1.0
+DEFAULT_SERVER = ('127.0.0.1', 6600)  # for traces without any server
+
+
+class Player(task.Task):
+    """ Stand-in for the MPD clients, replaying the records of a trace
+        Their events are posted to the target task with their original
+        spacing divided by the speed, without any delay for a speed of 0.
+        The target is told to quit at the end of the trace. The commands it
+        sends are ignored.
+    """
+
+    def __init__(self, name, records, speed, target):
+        self._records = records
+        self._index = 0  # of the next record to post
+        self._speed = speed
+        self._target = target
+        self._started = None
+        event_handlers = {
+            'next': self._event_handler_command,
+            'pause': self._event_handler_command,
+            'previous': self._event_handler_command,
+            'quit': self._event_handler_quit,
+        }
+        super(Player, self).__init__(name, event_handlers)
+        return None
+
+    def _run_pre(self):
+        """ Override 'task.Task'
+        """
+        self._started = time.perf_counter()
+        return None
+
+    def _routine(self):
+        """ Override 'task.Task'
+            Post the records that are due, then wait for the next one.
+        """
+        now = time.perf_counter() - self._started
+        while self._index < len(self._records) and self._due() <= now:
+            self._target.post(self._records[self._index]['event'])
+            self._index += 1
+        timeout = None
+        if self._index < len(self._records):
+            timeout = max(self._due() - now, 0.0)
+        elif self._index == len(self._records):
+            self._target.post({
+                'type': 'quit',
+                'value': None,
+            })
+            self._index += 1
+        self._wait_event_queue(timeout)
+        return None
+
+    def _due(self):
+        """ Return the time the next record is due, since the start.
+        """
+        due = 0.0
+        if self._speed:
+            first = self._records[0]['time']
+            due = (self._records[self._index]['time'] - first) / self._speed
+        return due
+
+    def _event_handler_command(self, dummy_event):
+        return None
+
+    def _event_handler_quit(self, dummy_event):
+        self.stop()
+        return None
+
+
+class ReplayPmpc(pmpc.Pmpc):
+    """ Application fed by a player instead of MPD clients
+        The servers are the ones found in the records.
+    """
+
+    def __init__(self, name, records, speed, **options):
+        self._records = records
+        self._speed = speed
+        self._player = None
+        super(ReplayPmpc, self).__init__(name, _servers(records), **options)
+        return None
+
+    def tasks(self):
+        """ Return the tasks of the application.
+        """
+        return [
+            each_task for each_task in (
+                self,
+                self._player,
+                self._stream,
+                self._systray,
+                self._window,
+            )
+            if each_task is not None
+        ]
+
+    def _create_mpd_clients(self, servers, dummy_engine, dummy_versions):
+        """ Override 'pmpc.Pmpc'
+        """
+        self._player = Player('player', self._records, self._speed, self)
+        return collections.OrderedDict(
+            ('{}:{}'.format(host, port), self._player)
+            for host, port in servers
+        )
+
+
+def run(
+        path,
+        speed=DEFAULT_SPEED,
+        frontends=pmpc.DEFAULT_FRONTENDS,
+        virtual_playlist=False,
+):
+    """ Replay the events received by the application in a trace.
+        Report the duration and the runtime metrics on the standard error.
+    """
+    logging.basicConfig(level=logging.WARNING)
+    records = [
+        record for record in trace.read(path) if record['target'] == 'pmpc'
+    ]
+    the_pmpc = ReplayPmpc(
+        'pmpc',
+        records,
+        speed,
+        virtual_playlist=virtual_playlist,
+        frontends=frontends,
+    )
+    start = time.perf_counter()
+    the_pmpc.start()
+    the_pmpc.run_ui_task()
+    the_pmpc.join()
+    sys.stderr.write(_("{} events replayed in {:.3f} s\n").format(
+        len(records),
+        time.perf_counter() - start,
+    ))
+    sys.stderr.write(metrics.format_report(the_pmpc.tasks()))
+    return None
+
+
+def main():
+    """ Parse arguments and replay.
+    """
+    parser = argparse.ArgumentParser(description=_("Replay a trace of Pmpc"))
+    parser.add_argument('trace', metavar='TRACE')
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=DEFAULT_SPEED,
+        help=_("how much faster than recorded, 0 for no delay"),
+    )
+    script.add_window_arguments(parser)
+    args = parser.parse_args()
+    frontends = ('window',) if args.window else ()
+    run(args.trace, args.speed, frontends, args.virtual_playlist)
+    return None
+
+
+def _servers(records):
+    """ Return the servers of the events, host and port pairs, in order.
+    """
+    servers = []
+    for record in records:
+        server = record['event'].get('server', None)
+        if server is not None:
+            host, dummy_separator, port = server.rpartition(':')
+            if (host, int(port)) not in servers:
+                servers.append((host, int(port)))
+    return servers or [DEFAULT_SERVER]
+
+
+if __name__ == '__main__':
+    main()
+
+
+# EOF
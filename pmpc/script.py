@@ -4,25 +4,67 @@
 
 import argparse
 import logging
+import signal
+import socket
+import sys
+import threading
 
 from . import i18n
+from . import metrics
 from . import pmpc
+from . import snapshot
+from . import task
+from . import trace
 
 
 _ = i18n.translate
 
 DEFAULT_HOST = '127.0.0.1'
 DEFAULT_PORT = 6600
+DEFAULT_SLICE_BUDGET = 8  # milliseconds
 
 
-def run(host, port):
+def run(
+        servers,
+        *,
+        virtual_playlist=False,
+        slice_budget=DEFAULT_SLICE_BUDGET,
+        engine=pmpc.DEFAULT_ENGINE,
+        snapshot_directory=None,
+        frontends=pmpc.DEFAULT_FRONTENDS,
+        stream_path=None,
+        trace_path=None,
+):
     """ Initialize and start the application.
+        Servers are pairs of host and port.
+        Quit on interrupt or termination, this is the way out when running
+        headless. Dump the runtime metrics of the tasks on 'SIGUSR1'.
+        Record a trace of the events if a path is given, see 'replay'.
     """
     logging.basicConfig(level=logging.WARNING)
-    the_pmpc = pmpc.Pmpc('pmpc', host, port)
+    recorder = None
+    if trace_path is not None:
+        recorder = trace.Recorder(trace_path)
+        task.set_recorder(recorder)
+    the_pmpc = pmpc.Pmpc(
+        'pmpc',
+        servers,
+        virtual_playlist=virtual_playlist,
+        slice_budget=slice_budget / 1000.0,
+        engine=engine,
+        snapshot_directory=snapshot_directory,
+        frontends=frontends,
+        stream_path=stream_path,
+    )
     the_pmpc.start()
+    signal_watcher = _SignalWatcher(the_pmpc)
+    signal_watcher.start()
     the_pmpc.run_ui_task()
     the_pmpc.join()
+    signal_watcher.stop()
+    if recorder is not None:
+        task.set_recorder(None)
+        recorder.close()
     return None
 
 
@@ -32,11 +74,198 @@ def main():
     parser = argparse.ArgumentParser(description=_("Pmpc"))
     parser.add_argument('host', type=str, nargs='?', default=DEFAULT_HOST)
     parser.add_argument('port', type=int, nargs='?', default=DEFAULT_PORT)
+    parser.add_argument(
+        '--server',
+        type=_parse_server,
+        action='append',
+        dest='servers',
+        metavar='HOST[:PORT]',
+        help=_("server to watch, repeat to watch several servers"),
+    )
+    add_window_arguments(parser)
+    parser.add_argument(
+        '--slice-budget',
+        type=float,
+        default=DEFAULT_SLICE_BUDGET,
+        metavar='MS',
+        help=_("time spent rendering the playlist between redraws"),
+    )
+    parser.add_argument(
+        '--engine',
+        choices=sorted(pmpc.ENGINES),
+        default=pmpc.DEFAULT_ENGINE,
+        help=_("implementation of the connections to the servers"),
+    )
+    parser.add_argument(
+        '--snapshot-directory',
+        default=snapshot.default_directory(),
+        metavar='DIRECTORY',
+        help=_("where the playlists are kept between runs"),
+    )
+    parser.add_argument(
+        '--no-snapshot',
+        action='store_const',
+        const=None,
+        dest='snapshot_directory',
+        help=_("do not keep the playlists between runs"),
+    )
+    parser.add_argument(
+        '--systray',
+        action='store_true',
+        dest='systray',
+        help=_("show the system tray icon (Windows only)"),
+    )
+    parser.add_argument(
+        '--no-systray',
+        action='store_false',
+        dest='systray',
+        help=_("do not show the system tray icon"),
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help=_("stream the events and read the commands as JSON lines"),
+    )
+    parser.add_argument(
+        '--stream-socket',
+        metavar='PATH',
+        help=_("stream on this UNIX socket instead of the standard streams"),
+    )
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help=_("only stream, without the window and the system tray icon"),
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='PATH',
+        help=_("record the events in this file, to be replayed later"),
+    )
+    parser.set_defaults(systray='systray' in pmpc.DEFAULT_FRONTENDS)
     args = parser.parse_args()
-    run(args.host, args.port)
+    servers = args.servers or [(args.host, args.port)]
+    args.stream = args.stream or args.stream_socket is not None
+    if args.headless:
+        args.window = args.systray = False
+        args.stream = True
+    frontends = tuple(
+        frontend for frontend in pmpc.FRONTENDS if getattr(args, frontend)
+    )
+    run(
+        servers,
+        virtual_playlist=args.virtual_playlist,
+        slice_budget=args.slice_budget,
+        engine=args.engine,
+        snapshot_directory=args.snapshot_directory,
+        frontends=frontends,
+        stream_path=args.stream_socket,
+        trace_path=args.trace,
+    )
     return None
 
 
+class _SignalWatcher(object):
+    """ Act on the signals in a thread of its own
+        The handlers run in the main thread, between any two instructions,
+        maybe while it holds the lock of a queue, of the metrics or of the
+        trace: they do nothing, and the signal number written to the wake-up
+        socket wakes up the watching thread instead.
+    """
+
+    def __init__(self, the_pmpc):
+        self._pmpc = the_pmpc
+        self._signal_numbers = [signal.SIGINT, signal.SIGTERM]
+        if hasattr(signal, 'SIGUSR1'):  # not on Windows
+            self._signal_numbers.append(signal.SIGUSR1)
+        self._handlers = {}  # signal number -> previous handler
+        self._reader, self._writer = socket.socketpair()
+        self._writer.setblocking(False)
+        self._thread = threading.Thread(name='signals', target=self._run)
+        self._thread.daemon = True
+        return None
+
+    def start(self):
+        """ Start watching the signals.
+            Call from the main thread.
+        """
+        self._thread.start()
+        signal.set_wakeup_fd(self._writer.fileno())
+        for signal_number in self._signal_numbers:
+            self._handlers[signal_number] = signal.signal(
+                signal_number,
+                _ignore_signal,
+            )
+        return None
+
+    def stop(self):
+        """ Stop watching the signals, and wait for the thread.
+            Call from the main thread.
+        """
+        for signal_number, handler in self._handlers.items():
+            signal.signal(signal_number, handler)
+        signal.set_wakeup_fd(-1)
+        self._writer.close()  # the thread reads the end of the stream
+        self._thread.join()
+        self._reader.close()
+        return None
+
+    def _run(self):
+        while True:
+            signal_numbers = self._reader.recv(64)
+            if not signal_numbers:
+                break
+            for signal_number in signal_numbers:
+                if signal_number in (signal.SIGINT, signal.SIGTERM):
+                    self._pmpc.post({
+                        'type': 'quit',
+                        'value': None,
+                    })
+                elif signal_number in self._signal_numbers:
+                    sys.stderr.write(
+                        metrics.format_report(task.running_tasks()),
+                    )
+                    sys.stderr.flush()
+        return None
+
+
+def _ignore_signal(dummy_signal_number, dummy_frame):
+    """ Handle a signal by doing nothing, see '_SignalWatcher'.
+    """
+    return None
+
+
+def add_window_arguments(parser):
+    """ Add the options of the window to an argument parser.
+    """
+    parser.add_argument(
+        '--no-window',
+        action='store_false',
+        dest='window',
+        help=_("do not show the window"),
+    )
+    parser.add_argument(
+        '--virtual-playlist',
+        action='store_true',
+        help=_("only create the visible rows of the playlist"),
+    )
+    return None
+
+
+def _parse_server(string):
+    """ Parse a 'HOST[:PORT]' argument into a pair of host and port.
+    """
+    host, separator, port = string.rpartition(':')
+    if not separator:
+        host, port = string, DEFAULT_PORT
+    try:
+        port = int(port)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(
+            _("invalid port: {}").format(port),
+        ) from error
+    return host, port
+
+
 if __name__ == '__main__':
     main()
 
@@ -0,0 +1,91 @@
+""" Snapshots of the playlists
+    The last known playlist of each server is kept on disk, so that it can
+    be shown at startup before the server is even reached.
+"""
+
+
+import json
+import logging
+import os
+import re
+import sys
+
+from . import i18n
+from . import track
+
+
+LOG = logging.getLogger(__name__)
+
+_ = i18n.translate
+
+_FORMAT = 1  # version of the file format
+
+
+def default_directory():
+    """ Return the directory of the snapshots for the current user.
+    """
+    base = os.environ.get('LOCALAPPDATA', None)  # Windows
+    if base is None:
+        base = os.environ.get('XDG_CACHE_HOME', None)
+    if base is None:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pmpc')
+
+
+def load(directory, server):
+    """ Load the snapshot of a server's playlist.
+        Return the playlist version and the track records, None if there is
+        no usable snapshot.
+    """
+    result = None
+    try:
+        with open(_path(directory, server), encoding='utf-8') as snapshot:
+            data = json.load(snapshot)
+        if data['format'] == _FORMAT and data['server'] == server:
+            result = (
+                int(data['version']),
+                [
+                    track.Track(song_id, pos, sys.intern(artist), title)
+                    for pos, (song_id, artist, title) in enumerate(
+                        data['tracks'],
+                    )
+                ],
+            )
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        LOG.warning(_("Ignoring the snapshot of %s, %s"), server, error)
+    return result
+
+
+def save(directory, server, version, tracks):
+    """ Save the snapshot of a server's playlist.
+        The file is replaced atomically, a crash leaves the previous one.
+    """
+    data = {
+        'format': _FORMAT,
+        'server': server,
+        'version': version,
+        'tracks': [
+            (each_track.id, each_track.artist, each_track.title)
+            for each_track in tracks
+        ],
+    }
+    path = _path(directory, server)
+    temporary_path = path + '.tmp'
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temporary_path, 'w', encoding='utf-8') as snapshot:
+            json.dump(data, snapshot, separators=(',', ':'))
+        os.replace(temporary_path, path)
+    except OSError as error:
+        LOG.error(_("Could not save the snapshot of %s, %s"), server, error)
+    return None
+
+
+def _path(directory, server):
+    file_name = re.sub(r'[^A-Za-z0-9.-]', '_', server) + '.json'
+    return os.path.join(directory, file_name)
+
+
+# EOF
@@ -0,0 +1,305 @@
+""" Stream
+    Headless frontend, the events are written and the commands are read as
+    JSON lines, on the standard streams or on a UNIX socket.
+"""
+
+
+import functools
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import threading
+
+from . import event_queue
+from . import i18n
+from . import task
+from . import track as track_record
+
+
+LOG = logging.getLogger(__name__)
+
+_ = i18n.translate
+
+
+class Stream(task.Task):  # pylint: disable=too-many-instance-attributes
+    """ Line-oriented stream of the state of the servers
+        Events are written as compact JSON objects, one per line:
+            {"type":"track","server":"host:port","value":TRACK}
+            {"type":"playlist","server":"host:port","value":[TRACK,...]}
+            {"type":"playlist_delta","server":"host:port",
+                "value":{"changes":[TRACK,...],"length":LENGTH}}
+        A track is an array of the fields of 'track.Track', in order.
+        Commands are read the same way, the server is optional and defaults
+        to the server selected in the application:
+            {"type":"next","server":"host:port"}
+        Clients of the UNIX socket get the current state on connection.
+    """
+
+    _COMMANDS = (
+        'next',
+        'pause',
+        'previous',
+        'quit',
+    )
+
+    _MAX_QUEUE_SIZE = 256
+
+    _READ_SIZE = 4096  # bytes
+
+    def __init__(self, name, servers, path=None):
+        self._servers = list(servers)
+        self._path = path  # UNIX socket, None for the standard streams
+        self._tracks = dict.fromkeys(self._servers)  # server -> track
+        self._playlists = dict.fromkeys(self._servers)  # server -> tracks
+        self._listener = None
+        self._outputs = []  # binary files, written by the task only
+        self._connections = {}  # output -> socket of the client
+        self._pending = []  # lines written at the end of the batch
+        event_handlers = {
+            'track': self._event_handler_track,
+            'playlist': self._event_handler_playlist,
+            'playlist_delta': self._event_handler_playlist_delta,
+            'client_connected': self._event_handler_client_connected,
+            'client_disconnected': self._event_handler_client_disconnected,
+            'quit': self._event_handler_quit,
+        }
+        super(Stream, self).__init__(
+            name,
+            event_handlers,
+            event_policies=track_record.frontend_event_policies(),
+            max_queue_size=self._MAX_QUEUE_SIZE,
+            overflow_policy=event_queue.COALESCE,
+        )
+        return None
+
+    def _run_pre(self):
+        """ Override 'task.Task'
+        """
+        if self._path is None:
+            self._outputs.append(sys.stdout.buffer)
+            _start_thread(
+                '{} reader'.format(self._name),
+                self._read_commands,
+                functools.partial(os.read, sys.stdin.fileno()),
+                None,
+            )
+        else:
+            _remove_socket(self._path)
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._listener.bind(self._path)
+            self._listener.listen()
+            _start_thread('{} listener'.format(self._name), self._accept)
+        return None
+
+    def _run_post(self):
+        """ Override 'task.Task'
+        """
+        if self._listener is not None:
+            self._listener.close()
+            _remove_socket(self._path)
+        for output in list(self._connections):
+            self._drop(output)
+        return None
+
+    def _routine(self):
+        """ Override 'task.Task'
+            Write the lines of a whole batch of events at once.
+        """
+        self._wait_event_queue()
+        self._flush()
+        return None
+
+    def _accept(self):
+        """ Accept the clients of the UNIX socket, until it is shut down.
+        """
+        while True:
+            try:
+                connection, dummy_address = self._listener.accept()
+            except OSError:
+                break
+            self.post({
+                'type': 'client_connected',
+                'value': connection,
+            })
+        return None
+
+    def _read_commands(self, read, output):
+        """ Read the commands of a client, until it disconnects.
+            Read by chunks, a thread blocked in a buffered file would crash
+            the interpreter at exit.
+        """
+        remainder = b''
+        while True:
+            try:
+                chunk = read(self._READ_SIZE)
+            except OSError:  # reset, or closed on quit
+                break
+            if not chunk:
+                break
+            lines = (remainder + chunk).split(b'\n')
+            remainder = lines.pop()
+            for line in lines:
+                self._read_command(line)
+        if output is not None:
+            self.post({
+                'type': 'client_disconnected',
+                'value': output,
+            })
+        return None
+
+    def _read_command(self, line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            command = json.loads(line.decode('utf-8'))
+            command_type = command['type']
+            server = command.get('server', None)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            LOG.warning(_("Ignoring the malformed command %r"), line)
+            return None
+        if command_type not in self._COMMANDS or (
+                server is not None and server not in self._servers
+        ):
+            LOG.warning(_("Ignoring the unknown command %r"), line)
+            return None
+        event = {
+            'type': 'stream.{}'.format(command_type),
+            'value': None,
+        }
+        if server is not None:
+            event['server'] = server
+        self._emit(event)
+        return None
+
+    def _write(self, event):
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+        self._pending.append((line + '\n').encode('utf-8'))
+        return None
+
+    def _flush(self, outputs=None):
+        if self._pending:
+            data = b''.join(self._pending)
+            self._pending = []
+            for output in list(self._outputs if outputs is None else outputs):
+                try:
+                    output.write(data)
+                    output.flush()
+                except OSError as error:
+                    LOG.info(_("Dropping a stream client, %s"), error)
+                    self._drop(output)
+        return None
+
+    def _drop(self, output):
+        if output in self._outputs:
+            self._outputs.remove(output)
+        connection = self._connections.pop(output, None)
+        if connection is not None:
+            try:
+                output.close()
+                # wake up the reader, closing alone would not while it reads
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:  # unflushed data to a gone client
+                pass
+            connection.close()
+        return None
+
+    def _event_handler_track(self, event):
+        self._tracks[event['server']] = event['value']
+        self._write(event)
+        return None
+
+    def _event_handler_playlist(self, event):
+        self._playlists[event['server']] = list(event['value'])
+        self._write(event)
+        return None
+
+    def _event_handler_playlist_delta(self, event):
+        self._playlists[event['server']] = track_record.apply_playlist_delta(
+            self._playlists[event['server']] or [],
+            event['value']['changes'],
+            event['value']['length'],
+        )
+        self._write({
+            'type': 'playlist_delta',
+            'server': event['server'],
+            'value': {
+                'changes': event['value']['changes'],
+                'length': event['value']['length'],
+            },
+        })
+        return None
+
+    def _event_handler_client_connected(self, event):
+        """ Send the current state to the new client only.
+        """
+        connection = event['value']
+        output = connection.makefile('wb')
+        self._flush()  # the pending lines are not for the new client
+        self._outputs.append(output)
+        self._connections[output] = connection
+        for server in self._servers:
+            if self._playlists[server] is not None:
+                self._write({
+                    'type': 'playlist',
+                    'server': server,
+                    'value': self._playlists[server],
+                })
+            if self._tracks[server] is not None:
+                self._write({
+                    'type': 'track',
+                    'server': server,
+                    'value': self._tracks[server],
+                })
+        self._flush([output])
+        _start_thread(
+            '{} reader'.format(self._name),
+            self._read_commands,
+            connection.recv,
+            output,
+        )
+        return None
+
+    def _event_handler_client_disconnected(self, event):
+        self._drop(event['value'])
+        return None
+
+    def _event_handler_quit(self, dummy_event):
+        self.stop()
+        if self._listener is not None:
+            try:
+                self._listener.shutdown(socket.SHUT_RDWR)  # wake up accept
+            except OSError:
+                pass
+        return None
+
+
+def _start_thread(name, target, *args):
+    """ Start a helper thread, blocking reads must not hold the exit.
+        Named after the task, it is the source of the events it emits.
+    """
+    thread = threading.Thread(
+        name=name,
+        target=target,
+        args=args,
+        daemon=True,
+    )
+    thread.start()
+    return None
+
+
+def _remove_socket(path):
+    """ Remove a UNIX socket left over by a previous run.
+    """
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    return None
+
+
+# EOF
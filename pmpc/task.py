@@ -5,10 +5,64 @@
 import logging
 import queue
 import threading
+import time
+
+from . import event_queue
+from . import metrics
 
 
 LOG = logging.getLogger(__name__)
 
+_STOP = object()  # sentinel waking up a task blocked on its queue
+
+
+class _Bus(object):
+    """ Registry of the running tasks
+        Indexed by the types of the events they handle.
+        Copy on write: the receivers are read without locking.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._receivers = {}  # event type -> tuple of tasks
+        return None
+
+    def register(self, task):
+        """ Register a task for the event types it handles.
+        """
+        with self._lock:
+            receivers = dict(self._receivers)
+            for event_type in task.event_types():
+                tasks = receivers.get(event_type, ())
+                receivers[event_type] = tasks + (task,)
+            self._receivers = receivers
+        return None
+
+    def unregister(self, task):
+        """ Unregister a task from all event types.
+        """
+        with self._lock:
+            receivers = {}
+            for event_type, tasks in self._receivers.items():
+                tasks = tuple(other for other in tasks if other is not task)
+                if tasks:
+                    receivers[event_type] = tasks
+            self._receivers = receivers
+        return None
+
+    def receivers(self, event_type):
+        """ Return the tasks handling this event type.
+        """
+        return self._receivers.get(event_type, ())
+
+    def tasks(self):
+        """ Return the registered tasks, each once.
+        """
+        tasks = []
+        for receivers in self._receivers.values():
+            tasks.extend(task for task in receivers if task not in tasks)
+        return tasks
+
 
 class Task(object):
     """ Task
@@ -16,12 +70,32 @@ class Task(object):
         Can be threaded.
     """
 
-    _tasks = []
+    _bus = _Bus()
 
-    def __init__(self, name, event_handlers, threaded=True):
+    _recorder = None  # records the posted events, see 'set_recorder'
+
+    _WAIT_TIMEOUT = 1.0  # seconds, upper bound on a blocking wait
+
+    def __init__(
+            self,
+            name,
+            event_handlers,
+            threaded=True,
+            *,
+            event_policies=None,
+            max_queue_size=0,
+            overflow_policy=event_queue.BLOCK,
+            event_superseding=None,
+    ):
         self._name = name
         self._event_handlers = event_handlers
-        self._event_queue = queue.Queue()
+        self._event_queue = event_queue.EventQueue(
+            event_policies,
+            max_queue_size,
+            overflow_policy,
+            event_superseding,
+        )
+        self._metrics = metrics.TaskMetrics()
         self._keep_running = False
         self._thread = None
         if threaded:
@@ -41,8 +115,10 @@ class Task(object):
 
     def stop(self):
         """ Instruct the task to exit as soon as possible.
+            Wake up the task if it is blocked waiting for events.
         """
         self._keep_running = False
+        self._event_queue.put(_STOP, force=True)
         return None
 
     def join(self, *args):
@@ -53,21 +129,54 @@ class Task(object):
             self._thread.join(*args)
         return None
 
+    def event_types(self):
+        """ Return the types of the events this task handles.
+        """
+        return list(self._event_handlers)
+
+    def queue_statistics(self):
+        """ Return the metrics of this task's event queue.
+        """
+        return self._event_queue.statistics()
+
+    def runtime_metrics(self):
+        """ Return the metrics of this task.
+            Its event queue, and the dispatched events by type, see
+            'metrics.TaskMetrics'.
+        """
+        return {
+            'name': self._name,
+            'queue': self._event_queue.statistics(),
+            'events': self._metrics.snapshot(),
+        }
+
     def post(self, event):
         """ Post an event to this task's queue and notify the task.
         """
-        self._event_queue.put(event)
-        self._notify()
+        if self._recorder is not None:
+            self._recorder.record(
+                threading.current_thread().name,
+                self._name,
+                event,
+            )
+        if self._event_queue.put(event):
+            self._notify()
+        else:
+            LOG.debug(
+                "Task.post event %s rejected by full queue of task %s",
+                event.get('type', None),
+                self._name,
+            )
         return None
 
     def _run(self):
         """ This is the target function for the thread.
         """
-        self._tasks.append(self)
+        self._bus.register(self)
         self._run_pre()
         self._task()
         self._run_post()
-        self._tasks.remove(self)
+        self._bus.unregister(self)
         return None
 
     def _run_pre(self):  # pylint: disable=no-self-use
@@ -95,17 +204,50 @@ class Task(object):
         return None
 
     def _routine(self):
-        """ Process the event queue.
+        """ Wait for events and process them.
+        """
+        self._wait_event_queue()
+        return None
+
+    def _wait_event_queue(self, timeout=None):
+        """ Block until at least one event is queued, then process the batch.
+            Return without processing anything on timeout.
         """
-        self._process_event_queue()
+        if timeout is None:
+            timeout = self._WAIT_TIMEOUT
+        try:
+            event, queued = self._event_queue.get_timed(timeout=timeout)
+        except queue.Empty:
+            pass
+        else:
+            if event is not _STOP:
+                self._dispatch_event(event, queued)
+            self._process_event_queue()
         return None
 
     def _process_event_queue(self):
         """ Process the events in the queue.
+            Do not block, only drain what is queued already.
+        """
+        while True:
+            try:
+                event, queued = self._event_queue.get_timed_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                self._dispatch_event(event, queued)
+        return None
+
+    def _dispatch_event(self, event, queued):
+        """ Process one event from the queue, and record its metrics.
         """
-        while not self._event_queue.empty():
-            event = self._event_queue.get()
-            self._process_event(event)
+        dispatched = time.perf_counter()
+        self._process_event(event)
+        self._metrics.record(
+            event.get('type', None),
+            dispatched - queued,
+            time.perf_counter() - dispatched,
+        )
         return None
 
     def _process_event(self, event):
@@ -129,12 +271,26 @@ class Task(object):
         return None
 
     def _emit(self, event):
-        """ Broadcast an event to all other tasks.
+        """ Post an event to all other tasks handling its type.
         """
-        receivers = [task for task in self._tasks if task is not self]
-        for task in receivers:
-            task.post(event)
+        for task in self._bus.receivers(event.get('type', None)):
+            if task is not self:
+                task.post(event)
         return None
 
 
+def set_recorder(recorder):
+    """ Record the events posted to all tasks, see 'trace.Recorder'.
+        None to stop recording.
+    """
+    Task._recorder = recorder  # pylint: disable=protected-access
+    return None
+
+
+def running_tasks():
+    """ Return the running tasks.
+    """
+    return Task._bus.tasks()  # pylint: disable=protected-access
+
+
 # EOF
@@ -0,0 +1,104 @@
+""" Traces of the events
+    The events posted to the tasks are recorded as JSON lines, to be
+    replayed later, see 'replay'.
+"""
+
+
+import json
+import threading
+import time
+
+from . import track
+
+
+class Recorder(object):
+    """ Recorder of the events posted to the tasks
+        Each line holds the time of the post in seconds since the recorder
+        was created, the names of the posting thread (the task's, for the
+        threaded tasks) and of the target task, the type of the event, the
+        size of its encoded value and the event itself. Values that cannot
+        be encoded are recorded as null.
+        Called from any thread.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        # pylint: disable=consider-using-with
+        self._file = open(path, 'w', encoding='utf-8')  # closed by 'close'
+        self._started = time.perf_counter()
+        return None
+
+    def record(self, source, target, event):
+        """ Record an event posted by the source to the target.
+        """
+        if isinstance(event, dict):
+            # the value is encoded once, for its size and for the event
+            value = _encode(event.get('value', None))
+            others = {key: event[key] for key in event if key != 'value'}
+            encoded_event = '{}{}"value":{}}}'.format(
+                _encode(others)[:-1],
+                ',' if others else '',
+                value,
+            )
+            with self._lock:  # the lines are in the order of their time
+                self._file.write(
+                    '{{"time":{:.6f},"source":{},"target":{},"type":{},'
+                    '"size":{},"event":{}}}\n'.format(
+                        time.perf_counter() - self._started,
+                        _encode(source),
+                        _encode(target),
+                        _encode(event.get('type', None)),
+                        len(value),
+                        encoded_event,
+                    )
+                )
+        return None
+
+    def close(self):
+        """ Flush and close the trace.
+        """
+        with self._lock:
+            self._file.close()
+        return None
+
+
+def read(path):
+    """ Yield the records of a trace, as dicts, with the track records of
+        the events rebuilt.
+    """
+    with open(path, encoding='utf-8') as trace:
+        for line in trace:
+            record = json.loads(line)
+            record['event'] = _decode_event(record['event'])
+            yield record
+    return None
+
+
+def _encode(value):
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        separators=(',', ':'),
+        default=_unknown,
+    )
+
+
+def _unknown(dummy_value):
+    return None
+
+
+def _decode_event(event):
+    """ Rebuild the track records of an event, encoded as arrays.
+    """
+    event_type = event.get('type', None)
+    value = event.get('value', None)
+    if event_type == 'mpd.track' and value is not None:
+        event['value'] = track.Track(*value)
+    elif event_type == 'mpd.playlist_chunk':
+        value['tracks'] = [track.Track(*each) for each in value['tracks']]
+    elif event_type == 'mpd.playlist_delta':
+        value['changes'] = [track.Track(*each) for each in value['changes']]
+    return event
+
+
+# EOF
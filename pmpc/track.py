@@ -0,0 +1,274 @@
+""" Track records
+"""
+
+
+import collections
+import functools
+import re
+import sys
+
+from . import event_queue
+
+
+Track = collections.namedtuple('Track', ('id', 'pos', 'artist', 'title'))
+Track.__doc__ = """ Compact track record
+    Song id and position in the playlist as integers, None if unknown.
+"""
+
+# build a track record from a tuple of its fields, without the checks of
+# 'Track._make', on the hot path of large playlists
+_new_track = functools.partial(tuple.__new__, Track)
+
+# lines of the fields of a track record in a raw list response, the other
+# lines are skipped
+_TRACK_FIELD_LINES = re.compile(
+    r'^(file|Last-Modified|Artist|Title|Pos|Id): (.*)$',
+    re.MULTILINE,
+)
+
+
+def read_track(raw_track, pos=None):
+    """ Build a track record from a track as returned by 'python-mpd2'.
+        The position is parsed only if the caller does not know it, as for
+        the pages of a playlist. Artist names are interned, they repeat
+        across a playlist. Tags with multiple values are joined.
+    """
+    get = raw_track.get
+    song_id = get('id', None)
+    artist = get('artist', "")
+    title = get('title', "")
+    if artist.__class__ is not str:  # tag with multiple values
+        artist = ", ".join(artist)
+    if title.__class__ is not str:
+        title = ", ".join(title)
+    if pos is None:
+        pos = get('pos', None)
+        if pos is not None:
+            pos = int(pos)
+    return _new_track((
+        None if song_id is None else int(song_id),
+        pos,
+        sys.intern(artist),
+        title,
+    ))
+
+
+def _moved(track, pos):
+    """ Return the track record at another position.
+    """
+    return _new_track((track[0], pos, track[2], track[3]))
+
+
+class TrackCache(object):
+    """ Least recently used cache of track records, by song id
+        An entry is reused while the song has the same file and the same
+        modification time, and only its position is updated. The cache has
+        to be cleared when the database changes, as the songs reported by
+        position and id only cannot be checked.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._entries = collections.OrderedDict()  # id -> (file, mtime, track)
+        self._statistics = {
+            'hits': 0,
+            'misses': 0,
+        }
+        return None
+
+    def read_track(self, raw_track, pos=None):
+        """ Return the track record for a track as returned by 'python-mpd2'.
+            See 'read_track', and '_read' for the caching.
+        """
+        return self._read(
+            read_track(raw_track, pos),
+            raw_track.get('file', None),
+            raw_track.get('last-modified', None),
+        )
+
+    def read_fields(  # pylint: disable=too-many-arguments
+            self,
+            song_id,
+            pos,
+            file_name,
+            last_modified,
+            artist,
+            title,
+    ):
+        """ Return the track record for the decoded fields of a track.
+            See '_read' for the caching.
+        """
+        return self._read(
+            _new_track((song_id, pos, sys.intern(artist), title)),
+            file_name,
+            last_modified,
+        )
+
+    def _read(self, track, file_name, last_modified):
+        """ Return the cached record of the track at its new position, if
+            the song has the same file and modification time. Cache the
+            track otherwise: the records of a playlist share their strings
+            with the cached ones.
+        """
+        song_id = track[0]
+        entry = None
+        if song_id is not None:
+            entry = self._entries.get(song_id, None)
+        if entry is not None and entry[:2] == (file_name, last_modified):
+            self._entries.move_to_end(song_id)
+            self._statistics['hits'] += 1
+            result = _moved(entry[2], track[1])
+        else:
+            result = track
+            if song_id is not None:
+                self._statistics['misses'] += 1
+                self._put(song_id, (file_name, last_modified, result))
+        return result
+
+    def get(self, song_id, pos):
+        """ Return the cached track record of the song at this position.
+            Return None if it is not cached.
+        """
+        entry = self._entries.get(song_id, None)
+        result = None
+        if entry is None:
+            self._statistics['misses'] += 1
+        else:
+            self._entries.move_to_end(song_id)
+            self._statistics['hits'] += 1
+            result = _moved(entry[2], pos)
+        return result
+
+    def clear(self):
+        """ Forget all the track records.
+        """
+        self._entries.clear()
+        return None
+
+    def statistics(self):
+        """ Return the number of hits and misses, and the current size.
+        """
+        statistics = dict(self._statistics)
+        statistics['size'] = len(self._entries)
+        return statistics
+
+    def _put(self, song_id, entry):
+        self._entries[song_id] = entry
+        self._entries.move_to_end(song_id)
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+        return None
+
+
+def read_track_list(data, track_cache):
+    """ Return the track records of a raw list response, 'playlistinfo'
+        for example, as bytes without the final 'OK'.
+        The response is decoded at once and only the lines of the fields of
+        the track records are matched, no dict is built per song. A song
+        starts with its 'file' line.
+    """
+    tracks = []
+    read_fields = track_cache.read_fields
+    file_name = song_id = pos = last_modified = artist = title = None
+    for key, value in _TRACK_FIELD_LINES.findall(data.decode('utf-8')):
+        if key == 'file':
+            if file_name is not None:
+                tracks.append(read_fields(
+                    song_id,
+                    pos,
+                    file_name,
+                    last_modified,
+                    artist or "",
+                    title or "",
+                ))
+            file_name = value
+            song_id = pos = last_modified = artist = title = None
+        elif file_name is None:
+            pass  # not a song
+        elif key == 'Artist':  # tags may have multiple values
+            artist = value if artist is None else artist + ", " + value
+        elif key == 'Title':
+            title = value if title is None else title + ", " + value
+        elif key == 'Pos':
+            pos = int(value)
+        elif key == 'Id':
+            song_id = int(value)
+        else:
+            last_modified = value
+    if file_name is not None:
+        tracks.append(read_fields(
+            song_id,
+            pos,
+            file_name,
+            last_modified,
+            artist or "",
+            title or "",
+        ))
+    return tracks
+
+
+def merge_playlist_deltas(queued_event, new_event):
+    """ Merge two playlist delta events into one.
+        Coalescing policy for event queues, see 'event_queue'.
+    """
+    length = new_event['value']['length']
+    changes = {
+        track.pos: track for track in queued_event['value']['changes']
+        if track.pos < length
+    }
+    for track in new_event['value']['changes']:
+        changes[track.pos] = track
+    return dict(new_event, value=dict(
+        new_event['value'],
+        changes=[changes[pos] for pos in sorted(changes)],
+    ))
+
+
+def merge_playlist_chunks(queued_event, new_event):
+    """ Merge two playlist chunk events into one.
+        Coalescing policy for event queues, see 'event_queue'.
+        Chunks are applied as deltas, so their tracks are concatenated.
+        A chunk that does not continue the queued one belongs to a load that
+        started over, it replaces the queued one.
+    """
+    queued = queued_event['value']
+    new = new_event['value']
+    merged = new_event
+    if new['start'] == queued['start'] + len(queued['tracks']):
+        merged = dict(new_event, value=dict(
+            new,
+            start=queued['start'],
+            tracks=queued['tracks'] + new['tracks'],
+        ))
+    return merged
+
+
+def frontend_event_policies():
+    """ Return the coalescing policies of a frontend showing the tracks.
+        The current track and the playlist are kept latest, the playlist
+        deltas merged.
+    """
+    return {
+        'track': event_queue.KEEP_LATEST,
+        'playlist': event_queue.KEEP_LATEST,
+        'playlist_delta': merge_playlist_deltas,
+        'quit': event_queue.KEEP_LATEST,  # never dropped on overflow
+    }
+
+
+def apply_playlist_delta(playlist, changes, length):
+    """ Return the playlist with the changed tracks, truncated to its length.
+        The changes past the length are stale, and ignored.
+    """
+    playlist = playlist[:length]
+    for track in changes:
+        if track.pos >= length:
+            continue
+        if track.pos < len(playlist):
+            playlist[track.pos] = track
+        else:
+            playlist.append(track)
+    return playlist
+
+
+# EOF
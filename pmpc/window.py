@@ -2,15 +2,21 @@
 """
 
 
+import bisect
+import time
 import tkinter
 import tkinter.ttk
 
+from . import event_queue
 from . import i18n
 from . import task
+from . import track as track_record
 
 
 _ = i18n.translate
 
+_CHUNK_SIZE = 1000  # items handled per step while preparing a difference
+
 
 class Track(tkinter.Frame):  # pylint: disable=too-many-ancestors
     """ Current track
@@ -32,6 +38,33 @@ class Track(tkinter.Frame):  # pylint: disable=too-many-ancestors
         return None
 
 
+class Servers(tkinter.Frame):  # pylint: disable=too-many-ancestors
+    """ Server selector
+    """
+
+    def __init__(self, master=None, servers=()):
+        self._servers = list(servers)
+        super(Servers, self).__init__(master)
+        self._create_widgets()
+        self._layout_widgets()
+        return None
+
+    def _create_widgets(self):
+        self.selector = tkinter.ttk.Combobox(
+            self,
+            state='readonly',
+            values=self._servers,
+        )
+        if self._servers:
+            self.selector.current(0)
+        return None
+
+    def _layout_widgets(self):
+        self.selector.grid(sticky=tkinter.EW)
+        self.grid_columnconfigure(0, weight=1)
+        return None
+
+
 class Playback(tkinter.Frame):  # pylint: disable=too-many-ancestors
     """ Playback buttons
     """
@@ -58,17 +91,117 @@ class Playback(tkinter.Frame):  # pylint: disable=too-many-ancestors
         return None
 
 
-class Playlist(tkinter.Frame):  # pylint: disable=too-many-ancestors
+class Playlist(  # pylint: disable=too-many-ancestors
+        tkinter.Frame,
+):  # pylint: disable=too-many-instance-attributes
     """ Playlist
+        One tree item per track, identified by the MPD song id.
+        Large updates are rendered in time slices on the Tk event loop, so
+        that the window stays responsive.
     """
 
-    def __init__(self, master=None):
+    SLICE_BUDGET = 0.008  # seconds of rendering per slice
+
+    def __init__(self, master=None, slice_budget=SLICE_BUDGET):
+        self._slice_budget = slice_budget  # None to render synchronously
+        self._playlist = []  # latest playlist
+        self._rendered = []  # playlist shown by the tree
+        self._render_target = None
+        self._render_steps = None
+        self._render_requested = False
+        self._current_track = None
         super(Playlist, self).__init__(master)
         self._create_widgets()
         self._config_widgets()
         self._layout_widgets()
         return None
 
+    def set_playlist(self, playlist):
+        """ Replace the playlist.
+            The tree is updated by a rendering job.
+        """
+        self._playlist = list(playlist)
+        self._request_rendering()
+        return None
+
+    def highlight(self, track):
+        """ Select and show this track.
+        """
+        self._current_track = track
+        if track is not None and track.id is not None and (
+                self.tree.exists(track.id)):
+            self.tree.selection_set(track.id)
+            self.tree.see(track.id)
+        else:
+            self.tree.selection_set('')
+        return None
+
+    def _request_rendering(self):
+        """ Start a rendering job, unless one is running already: it then
+            renders again with the latest state when it is done.
+        """
+        self._render_requested = True
+        if self._render_steps is None:
+            self._start_rendering()
+        return None
+
+    def _start_rendering(self):
+        self._render_requested = False
+        self._render_target = self._playlist
+        self._render_steps = self._update_tree(
+            self._rendered,
+            self._render_target,
+        )
+        if self._slice_budget is None:
+            self._render_slice()
+        else:
+            self.after_idle(self._render_slice)
+        return None
+
+    def _render_slice(self):
+        """ Run the rendering job until the slice budget is spent.
+            Reschedule the rest, letting Tk process input and redraw.
+        """
+        done = True
+        if self._slice_budget is None:
+            for dummy_step in self._render_steps:
+                pass
+        else:
+            deadline = time.perf_counter() + self._slice_budget
+            for dummy_step in self._render_steps:
+                if time.perf_counter() >= deadline:
+                    done = False
+                    break
+        if done:
+            self._rendered = self._render_target
+            self._render_target = None
+            self._render_steps = None
+            self._render_done()
+            if self._render_requested:
+                self._start_rendering()
+        else:
+            self.after_idle(self._render_slice)
+        return None
+
+    def _render_done(self):
+        """ Finish a rendering job, the tree shows the rendered playlist.
+        """
+        self.highlight(self._current_track)
+        return None
+
+    def _update_tree(self, old_playlist, new_playlist):
+        """ Update the tree from the old playlist to the new one.
+            Only the rows that differ are touched: removed tracks are deleted,
+            new tracks inserted, and the tracks out of order are moved,
+            keeping the longest run of tracks already in order in place.
+            Generator, yield after each step: each chunk of tracks while
+            preparing the difference, then each row.
+        """
+        difference = {}
+        yield from _difference_steps(old_playlist, new_playlist, difference)
+        yield from _apply_difference_steps(self.tree, new_playlist, difference)
+        return None
+
     def _create_widgets(self):
         self.scrollbar = tkinter.Scrollbar(self)
         self.tree = tkinter.ttk.Treeview(self, selectmode=tkinter.NONE)
@@ -91,51 +224,207 @@ class Playlist(tkinter.Frame):  # pylint: disable=too-many-ancestors
         return None
 
 
+class VirtualPlaylist(Playlist):  # pylint: disable=too-many-ancestors
+    """ Virtualized playlist
+        Only the tracks in the viewport have a tree item, the scrollbar is
+        driven from the number of tracks in the playlist. The rows are
+        rendered in time slices too, the changes of playlist, viewport and
+        current track made meanwhile are rendered together afterwards.
+    """
+
+    _DEFAULT_ROW_HEIGHT = 20  # pixels, if the theme does not tell
+
+    def __init__(self, master=None, slice_budget=Playlist.SLICE_BUDGET):
+        self._first = 0  # index of the first visible track
+        self._rows = 1  # number of visible rows
+        self._current_pos = None
+        super(VirtualPlaylist, self).__init__(master, slice_budget)
+        return None
+
+    def highlight(self, track):
+        """ Override 'Playlist'
+        """
+        self._current_pos = None
+        if track is not None and track.pos is not None and (
+                track.pos < len(self._playlist)):
+            self._current_pos = track.pos
+            self._first = _first_showing(self._first, self._rows, track.pos)
+        self._request_rendering()
+        return None
+
+    def _config_widgets(self):
+        """ Override 'Playlist'
+        """
+        super(VirtualPlaylist, self)._config_widgets()
+        self.tree.configure(yscrollcommand='')
+        self.scrollbar.config(command=self._callback_scroll)
+        self.tree.bind('<Configure>', self._callback_configure)
+        self.tree.bind('<MouseWheel>', self._callback_wheel)
+        self.tree.bind('<Button-4>', self._callback_wheel)
+        self.tree.bind('<Button-5>', self._callback_wheel)
+        return None
+
+    def _callback_configure(self, event):
+        row_height = tkinter.ttk.Style().lookup('Treeview', 'rowheight')
+        row_height = int(row_height or self._DEFAULT_ROW_HEIGHT)
+        self._rows = _visible_rows(event.height, row_height)
+        self._request_rendering()
+        return None
+
+    def _callback_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self._first - 3)
+        else:
+            self._scroll_to(self._first + 3)
+        return 'break'
+
+    def _callback_scroll(self, *args):
+        self._scroll_to(_scroll_command(
+            self._first,
+            self._rows,
+            len(self._playlist),
+            *args
+        ))
+        return None
+
+    def _scroll_to(self, first):
+        self._first = first
+        self._request_rendering()
+        return None
+
+    def _render_done(self):
+        """ Override 'Playlist'
+            The selection is rendered with the rows.
+        """
+        return None
+
+    def _update_tree(self, dummy_old_playlist, new_playlist):
+        """ Override 'Playlist'
+            Materialize the tree items of the visible tracks only.
+            Generator, yield after each row.
+        """
+        total = len(new_playlist)
+        self._first = _clamp_first(self._first, self._rows, total)
+        visible = new_playlist[self._first:self._first + self._rows]
+        items = self.tree.get_children()
+        if len(items) > len(visible):
+            self.tree.delete(*items[len(visible):])
+        for row in range(len(items), len(visible)):
+            self.tree.insert('', row, 'row{}'.format(row))
+        selection = ''
+        for row, track in enumerate(visible):
+            track_index = self._first + row
+            self.tree.item(
+                'row{}'.format(row),
+                text='{}'.format(track_index + 1),
+                values=(
+                    track.artist,
+                    track.title,
+                ),
+            )
+            if track_index == self._current_pos:
+                selection = 'row{}'.format(row)
+            yield
+        self.tree.selection_set(selection)
+        if total:
+            self.scrollbar.set(
+                self._first / total,
+                (self._first + len(visible)) / total,
+            )
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        return None
+
+
 class Frame(tkinter.Frame):  # pylint: disable=too-many-ancestors
     """ Main frame
     """
 
-    def __init__(self, master=None):
+    def __init__(
+            self,
+            master=None,
+            servers=(),
+            virtual_playlist=False,
+            slice_budget=Playlist.SLICE_BUDGET,
+    ):
+        self._servers = servers
+        self._virtual_playlist = virtual_playlist
+        self._slice_budget = slice_budget
         super(Frame, self).__init__(master)
         self._create_widgets()
         self._layout_widgets()
         return None
 
     def _create_widgets(self):
+        self.servers = Servers(self, self._servers)
         self.track = Track(self)
         self.playback = Playback(self)
-        self.playlist = Playlist(self)
+        if self._virtual_playlist:
+            self.playlist = VirtualPlaylist(self, self._slice_budget)
+        else:
+            self.playlist = Playlist(self, self._slice_budget)
         return None
 
     def _layout_widgets(self):
-        self.track.grid(row=0, sticky=tkinter.EW)
-        self.playback.grid(row=1, sticky=tkinter.EW)
-        self.playlist.grid(row=2, sticky=tkinter.NSEW)
+        if len(self._servers) > 1:
+            self.servers.grid(row=0, sticky=tkinter.EW)
+        self.track.grid(row=1, sticky=tkinter.EW)
+        self.playback.grid(row=2, sticky=tkinter.EW)
+        self.playlist.grid(row=3, sticky=tkinter.NSEW)
         self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(2, weight=1)
+        self.grid_rowconfigure(3, weight=1)
         return None
 
 
-class Window(task.Task):
+class Window(task.Task):  # pylint: disable=too-many-instance-attributes
     """ Tkinter UI task
+        Keeps the track and playlist of every server, shows those of the
+        selected server.
     """
 
-    def __init__(self, name):
-        self._current_track = {}
+    # never block the Pmpc task posting to a busy UI: coalesce on overflow
+    _MAX_QUEUE_SIZE = 256
+
+    def __init__(
+            self,
+            name,
+            servers,
+            virtual_playlist=False,
+            slice_budget=Playlist.SLICE_BUDGET,
+    ):
+        self._servers = list(servers)
+        self._server = self._servers[0]  # selected server
+        self._tracks = dict.fromkeys(self._servers)  # server -> track
+        self._playlists = {server: [] for server in self._servers}
+        self._virtual_playlist = virtual_playlist
+        self._slice_budget = slice_budget
         self._create_widgets()
         self._config_widgets()
         self._layout_widgets()
         event_handlers = {
             'track': self._event_handler_track,
             'playlist': self._event_handler_playlist,
+            'playlist_delta': self._event_handler_playlist_delta,
             'quit': self._event_handler_quit,
         }
-        super(Window, self).__init__(name, event_handlers, threaded=False)
+        super(Window, self).__init__(
+            name,
+            event_handlers,
+            threaded=False,
+            event_policies=track_record.frontend_event_policies(),
+            max_queue_size=self._MAX_QUEUE_SIZE,
+            overflow_policy=event_queue.COALESCE,
+        )
         return None
 
     def _create_widgets(self):
         self._root = tkinter.Tk()
-        self._frame = Frame(master=self._root)
+        self._frame = Frame(
+            master=self._root,
+            servers=self._servers,
+            virtual_playlist=self._virtual_playlist,
+            slice_budget=self._slice_budget,
+        )
         return None
 
     def _config_widgets(self):
@@ -146,6 +435,10 @@ class Window(task.Task):
         self._frame.playback.pause['command'] = self._callback_pause
         self._frame.playback.next['command'] = self._callback_next
         self._frame.playback.previous['command'] = self._callback_previous
+        self._frame.servers.selector.bind(
+            '<<ComboboxSelected>>',
+            self._callback_server,
+        )
         return None
 
     def _layout_widgets(self):
@@ -177,6 +470,7 @@ class Window(task.Task):
     def _callback_pause(self):
         self._emit({
             'type': 'window.pause',
+            'server': self._server,
             'value': None,
         })
         return None
@@ -184,6 +478,7 @@ class Window(task.Task):
     def _callback_next(self):
         self._emit({
             'type': 'window.next',
+            'server': self._server,
             'value': None,
         })
         return None
@@ -191,10 +486,22 @@ class Window(task.Task):
     def _callback_previous(self):
         self._emit({
             'type': 'window.previous',
+            'server': self._server,
             'value': None,
         })
         return None
 
+    def _callback_server(self, dummy_tkinter_event):
+        self._server = self._frame.servers.selector.get()
+        self._show_current_track()
+        self._frame.playlist.set_playlist(self._playlists[self._server])
+        self._highlight_current_track()
+        self._emit({
+            'type': 'window.server',
+            'value': self._server,
+        })
+        return None
+
     def _callback_quit(self):
         self._emit({
             'type': 'window.quit',
@@ -203,11 +510,24 @@ class Window(task.Task):
         return None
 
     def _event_handler_track(self, event):
-        self._set_current_track(event['value'])
+        self._tracks[event['server']] = event['value']
+        if event['server'] == self._server:
+            self._show_current_track()
+            self._highlight_current_track()
         return None
 
     def _event_handler_playlist(self, event):
-        self._set_current_playlist(event['value'])
+        self._playlists[event['server']] = list(event['value'])
+        self._show_current_playlist(event['server'])
+        return None
+
+    def _event_handler_playlist_delta(self, event):
+        self._playlists[event['server']] = track_record.apply_playlist_delta(
+            self._playlists[event['server']],
+            event['value']['changes'],
+            event['value']['length'],
+        )
+        self._show_current_playlist(event['server'])
         return None
 
     def _event_handler_quit(self, dummy_event):
@@ -215,41 +535,203 @@ class Window(task.Task):
         self._root.destroy()
         return None
 
-    def _set_current_track(self, track):
-        self._frame.track.label['text'] = '{} - {}'.format(
-            track['artist'],
-            track['title'],
-        )
-        self._current_track = track
-        self._highlight_current_track()
+    def _show_current_track(self):
+        track = self._tracks[self._server]
+        text = _("Pmpc")
+        if track is not None:
+            text = '{} - {}'.format(track.artist, track.title)
+        self._frame.track.label['text'] = text
         return None
 
-    def _set_current_playlist(self, playlist):
-        self._frame.playlist.tree.delete(
-            *self._frame.playlist.tree.get_children()
-        )
-        for track_index, track in enumerate(playlist):
-            self._frame.playlist.tree.insert(
-                '',  # insert as top level item
-                track_index,  # item index
-                track['pos'],  # item identifier
-                text='{}'.format(track_index + 1),
-                values=(
-                    track['artist'],
-                    track['title'],
-                ),
-            )
-        self._highlight_current_track()
+    def _show_current_playlist(self, server):
+        if server == self._server:
+            self._frame.playlist.set_playlist(self._playlists[server])
+            self._highlight_current_track()
         return None
 
     def _highlight_current_track(self):
-        pos = self._current_track.get('pos', '')
-        if self._frame.playlist.tree.exists(pos):
-            self._frame.playlist.tree.selection_set(pos)
-            self._frame.playlist.tree.see(pos)
-        else:
-            self._frame.playlist.tree.selection_set('')
+        self._frame.playlist.highlight(self._tracks[self._server])
         return None
 
 
+def _visible_rows(height, row_height):
+    """ Return the number of rows fitting in the height of the tree.
+        One row is taken by the headings, at least one row is shown.
+    """
+    return max(1, height // row_height - 1)
+
+
+def _clamp_first(first, rows, total):
+    """ Return the index of the first visible track, keeping the viewport
+        within the playlist.
+    """
+    return max(0, min(first, total - rows))
+
+
+def _first_showing(first, rows, pos):
+    """ Return the index of the first visible track, showing the track at
+        this position. The viewport is centered on it if it has to move.
+    """
+    if not first <= pos < first + rows:
+        first = pos - rows // 2
+    return first
+
+
+def _scroll_command(first, rows, total, *args):
+    """ Return the index of the first visible track after a command of the
+        scrollbar: move to a fraction of the playlist, or scroll by units or
+        pages.
+    """
+    if args[0] == tkinter.MOVETO:
+        first = int(float(args[1]) * total)
+    elif args[0] == tkinter.SCROLL:
+        step = 1
+        if args[2] == tkinter.PAGES:
+            step = rows
+        first += int(args[1]) * step
+    return first
+
+
+def _chunks(sequence):
+    """ Yield the consecutive slices of the sequence handled per step.
+    """
+    for start in range(0, len(sequence), _CHUNK_SIZE):
+        yield sequence[start:start + _CHUNK_SIZE]
+    return None
+
+
+def _insert_row(tree, track_index, track):
+    """ Insert the row of a track in the tree of the playlist.
+    """
+    tree.insert(
+        '',  # insert as top level item
+        track_index,  # item index
+        track.id,  # item identifier
+        text='{}'.format(track_index + 1),
+        values=(
+            track.artist,
+            track.title,
+        ),
+    )
+    return None
+
+
+def _difference_steps(old_playlist, new_playlist, difference):
+    """ Fill the difference from the old playlist to the new one, see
+        '_apply_difference_steps'.
+        The old tracks by id, the ids of the removed tracks, the ids of the
+        kept tracks in the old order, and the set of those already in order.
+        Generator, yield after each chunk of tracks.
+    """
+    new_ids = set()
+    for chunk in _chunks(new_playlist):
+        new_ids.update(track.id for track in chunk)
+        yield
+    old_tracks = {}
+    removed_ids = []
+    kept_ids = []
+    kept_indexes = {}
+    for chunk in _chunks(old_playlist):
+        for track in chunk:
+            old_tracks[track.id] = track
+            if track.id in new_ids:
+                kept_indexes[track.id] = len(kept_ids)
+                kept_ids.append(track.id)
+            else:
+                removed_ids.append(track.id)
+        yield
+    kept_order = []  # indexes in the old playlist, in the new order
+    for chunk in _chunks(new_playlist):
+        kept_order.extend(
+            kept_indexes[track.id] for track in chunk
+            if track.id in kept_indexes
+        )
+        yield
+    in_order_indexes = []
+    yield from _increasing_subsequence_steps(kept_order, in_order_indexes)
+    in_order = set()
+    for chunk in _chunks(in_order_indexes):
+        in_order.update(kept_ids[index] for index in chunk)
+        yield
+    difference.update(
+        old_tracks=old_tracks,
+        removed_ids=removed_ids,
+        kept_ids=kept_ids,
+        in_order=in_order,
+    )
+    return None
+
+
+def _apply_difference_steps(tree, new_playlist, difference):
+    """ Update the tree to the new playlist, see '_difference_steps'.
+        Delete the removed tracks, detach the kept tracks out of order, then
+        insert, move and update the rows in the new order.
+        Generator, yield after each chunk of tracks, then each row.
+    """
+    old_tracks = difference['old_tracks']
+    in_order = difference['in_order']
+    for chunk in _chunks(difference['removed_ids']):
+        tree.delete(*chunk)
+        yield
+    for chunk in _chunks(difference['kept_ids']):
+        out_of_order = [item for item in chunk if item not in in_order]
+        if out_of_order:
+            tree.detach(*out_of_order)
+        yield
+    for track_index, track in enumerate(new_playlist):
+        old_track = old_tracks.get(track.id, None)
+        if old_track is None:
+            _insert_row(tree, track_index, track)
+        else:
+            if track.id not in in_order:
+                tree.move(track.id, '', track_index)
+            if old_track.pos != track.pos:
+                tree.item(track.id, text='{}'.format(track_index + 1))
+            if (old_track.artist, old_track.title) != (
+                    track.artist, track.title):
+                tree.item(track.id, values=(track.artist, track.title))
+        yield
+    return None
+
+
+def _longest_increasing_subsequence(sequence):
+    """ Return the values of a longest strictly increasing subsequence.
+    """
+    subsequence = []
+    for dummy_step in _increasing_subsequence_steps(sequence, subsequence):
+        pass
+    return subsequence
+
+
+def _increasing_subsequence_steps(sequence, subsequence):
+    """ Fill the subsequence with the values of a longest strictly
+        increasing subsequence of the sequence.
+        Generator, yield after each chunk of values.
+    """
+    tails = []  # index in sequence of the smallest tail of each length
+    tail_values = []
+    previous = [None] * len(sequence)
+    for start in range(0, len(sequence), _CHUNK_SIZE):
+        for index in range(start, min(start + _CHUNK_SIZE, len(sequence))):
+            value = sequence[index]
+            length = bisect.bisect_left(tail_values, value)
+            if length > 0:
+                previous[index] = tails[length - 1]
+            if length == len(tails):
+                tails.append(index)
+                tail_values.append(value)
+            else:
+                tails[length] = index
+                tail_values[length] = value
+        yield
+    index = tails[-1] if tails else None
+    while index is not None:
+        subsequence.append(sequence[index])
+        index = previous[index]
+        if len(subsequence) % _CHUNK_SIZE == 0:
+            yield
+    subsequence.reverse()
+    return None
+
+
 # EOF
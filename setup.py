@@ -33,6 +33,7 @@ TEST_REQUIREMENTS = [
 ]
 
 PACKAGES_EXCLUDE = [
+    'benchmarks',
     'tests',
 ]
 PACKAGES = setuptools.find_packages(exclude=PACKAGES_EXCLUDE)
@@ -0,0 +1,5 @@
+""" Tests
+"""
+
+
+# EOF
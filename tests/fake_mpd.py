@@ -0,0 +1,592 @@
+""" Fake 'music player daemon' server
+    Speak enough of the MPD protocol to exercise the clients locally.
+"""
+
+
+import select
+import socket
+import socketserver
+import threading
+import time
+
+
+PROTOCOL_VERSION = '0.19.0'
+
+SUBSYSTEMS = (
+    'database',
+    'message',
+    'mixer',
+    'options',
+    'output',
+    'player',
+    'playlist',
+    'sticker',
+    'subscription',
+    'update',
+)
+
+
+def make_songs(count, artists=100):
+    """ Return 'count' synthetic songs, with a limited number of artists.
+    """
+    return [
+        {
+            'file': 'artist_{}/song_{}.ogg'.format(index % artists, index),
+            'Last-Modified': '2016-01-01T00:00:00Z',
+            'Artist': 'Artist {}'.format(index % artists),
+            'Title': 'Title {}'.format(index),
+        }
+        for index in range(count)
+    ]
+
+
+class CommandFailed(Exception):
+    """ Command failed, answer with an 'ACK' line.
+    """
+
+    def __init__(self, code, message):
+        super(CommandFailed, self).__init__(message)
+        self.code = code
+        self.message = message
+        return None
+
+
+class FakeMpdServer(object):  # pylint: disable=too-many-instance-attributes
+    """ Fake 'music player daemon' server
+        Serve a scriptable player state on localhost in a background thread.
+        Every response is delayed by 'latency' seconds to emulate a remote
+        server.
+    """
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        # called with the name and the arguments after each command, with
+        # the lock held, to script changes at a precise point
+        self.command_hook = None
+        self._lock = threading.RLock()
+        self._sessions = []
+        self._playlist = []  # songs, dicts of tags
+        self._versions = []  # playlist version of the last change per pos
+        self._playlist_version = 1
+        self._next_id = 0
+        self._current = None  # position of the current song
+        self._state = 'stop'
+        self._channels = {}  # channel name -> subscribed sessions
+        self.statistics = {
+            'connections': 0,
+            'round_trips': 0,
+            'commands': 0,
+            'bytes_received': 0,
+            'bytes_sent': 0,
+        }
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(
+            name='fake_mpd',
+            target=self._server.serve_forever,
+        )
+        self._thread.daemon = True
+        return None
+
+    @property
+    def address(self):
+        """ Host and port the server listens on.
+        """
+        return self._server.server_address
+
+    def start(self):
+        """ Start serving in a background thread.
+        """
+        self._thread.start()
+        return None
+
+    def stop(self):
+        """ Stop serving and close all connections.
+        """
+        self._server.shutdown()
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+        self._server.server_close()
+        self._thread.join()
+        return None
+
+    def reset_statistics(self):
+        """ Reset the traffic counters.
+        """
+        with self._lock:
+            for key in self.statistics:
+                self.statistics[key] = 0
+        return None
+
+    # scripting API
+
+    def set_playlist(self, songs):
+        """ Replace the playlist with the given songs (dicts of tags).
+        """
+        with self._lock:
+            self._playlist = []
+            self._versions = []
+            self._bump_version()
+            for song in songs:
+                self._append(song)
+            self._current = 0 if self._playlist else None
+            self._changed('playlist', 'player')
+        return None
+
+    def add(self, song):
+        """ Append a song to the playlist.
+        """
+        with self._lock:
+            self._bump_version()
+            self._append(song)
+            self._changed('playlist')
+        return None
+
+    def delete(self, pos):
+        """ Delete the song at the given position.
+        """
+        with self._lock:
+            self._bump_version()
+            del self._playlist[pos]
+            del self._versions[pos]
+            for index in range(pos, len(self._playlist)):
+                self._versions[index] = self._playlist_version
+            if not self._playlist:
+                self._current = None
+            elif self._current is not None and self._current > pos:
+                self._current -= 1
+            elif self._current == pos:
+                self._current = min(pos, len(self._playlist) - 1)
+            self._changed('playlist', 'player')
+        return None
+
+    def play(self, pos):
+        """ Play the song at the given position.
+        """
+        with self._lock:
+            self._current = pos
+            self._state = 'play'
+            self._changed('player')
+        return None
+
+    def skip(self, offset):
+        """ Move the current song by the given offset.
+        """
+        with self._lock:
+            if self._current is not None:
+                pos = self._current + offset
+                self._current = max(0, min(len(self._playlist) - 1, pos))
+            self._changed('player')
+        return None
+
+    def changed(self, *subsystems):
+        """ Report changes of arbitrary subsystems to idling clients.
+        """
+        with self._lock:
+            self._changed(*subsystems)
+        return None
+
+    # internals, called with the lock held
+
+    def _bump_version(self):
+        self._playlist_version += 1
+        return None
+
+    def _append(self, song):
+        song = dict(song)
+        song['Id'] = str(self._next_id)
+        self._next_id += 1
+        self._playlist.append(song)
+        self._versions.append(self._playlist_version)
+        return None
+
+    def _changed(self, *subsystems):
+        for session in self._sessions:
+            session.changed(subsystems)
+        return None
+
+    def _song_lines(self, pos):
+        song = self._playlist[pos]
+        lines = []
+        for key, values in song.items():
+            if key != 'Id':
+                if not isinstance(values, list):  # tag with a single value
+                    values = [values]
+                lines.extend('{}: {}'.format(key, value) for value in values)
+        lines.append('Pos: {}'.format(pos))
+        lines.append('Id: {}'.format(song['Id']))
+        return lines
+
+    def _register(self, session):
+        with self._lock:
+            self._sessions.append(session)
+            self.statistics['connections'] += 1
+        return None
+
+    def _unregister(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+            for subscribers in self._channels.values():
+                if session in subscribers:
+                    subscribers.remove(session)
+        return None
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.statistics[key] += amount
+        return None
+
+    def _execute(self, session, name, args):
+        """ Execute one command, return the response lines.
+        """
+        with self._lock:
+            self.statistics['commands'] += 1
+            handler = getattr(self, '_command_' + name, None)
+            if handler is None:
+                raise CommandFailed(5, 'unknown command "{}"'.format(name))
+            lines = handler(session, *args)
+            if self.command_hook is not None:
+                self.command_hook(name, args)
+            return lines
+
+    def _command_ping(self, dummy_session):
+        return []
+
+    def _command_status(self, dummy_session):
+        lines = [
+            'volume: 100',
+            'repeat: 0',
+            'random: 0',
+            'single: 0',
+            'consume: 0',
+            'playlist: {}'.format(self._playlist_version),
+            'playlistlength: {}'.format(len(self._playlist)),
+            'state: {}'.format(self._state),
+        ]
+        if self._current is not None:
+            lines.append('song: {}'.format(self._current))
+            lines.append('songid: {}'.format(
+                self._playlist[self._current]['Id']
+            ))
+        return lines
+
+    def _command_currentsong(self, dummy_session):
+        lines = []
+        if self._current is not None:
+            lines = self._song_lines(self._current)
+        return lines
+
+    def _command_playlistinfo(self, dummy_session, positions=None):
+        lines = []
+        for pos in self._positions(positions):
+            lines.extend(self._song_lines(pos))
+        return lines
+
+    def _command_playlistid(self, dummy_session, songid=None):
+        lines = []
+        for pos, song in enumerate(self._playlist):
+            if songid is None or song['Id'] == songid:
+                lines.extend(self._song_lines(pos))
+        if songid is not None and not lines:
+            raise CommandFailed(50, 'No such song')
+        return lines
+
+    def _command_plchanges(self, dummy_session, version, positions=None):
+        lines = []
+        for pos in self._positions(positions):
+            if self._versions[pos] > int(version):
+                lines.extend(self._song_lines(pos))
+        return lines
+
+    def _command_plchangesposid(self, dummy_session, version, positions=None):
+        lines = []
+        for pos in self._positions(positions):
+            if self._versions[pos] > int(version):
+                lines.append('cpos: {}'.format(pos))
+                lines.append('Id: {}'.format(self._playlist[pos]['Id']))
+        return lines
+
+    def _command_next(self, dummy_session):
+        self.skip(1)
+        return []
+
+    def _command_previous(self, dummy_session):
+        self.skip(-1)
+        return []
+
+    def _command_pause(self, dummy_session, value=None):
+        if value is None:
+            self._state = 'pause' if self._state == 'play' else 'play'
+        else:
+            self._state = 'pause' if value == '1' else 'play'
+        self._changed('player')
+        return []
+
+    def _command_subscribe(self, session, channel):
+        self._channels.setdefault(channel, []).append(session)
+        self._changed('subscription')
+        return []
+
+    def _command_unsubscribe(self, session, channel):
+        subscribers = self._channels.get(channel, [])
+        if session not in subscribers:
+            raise CommandFailed(50, 'not subscribed')
+        subscribers.remove(session)
+        return []
+
+    def _command_sendmessage(self, dummy_session, channel, message):
+        subscribers = self._channels.get(channel, [])
+        if not subscribers:
+            raise CommandFailed(50, 'nobody is subscribed to this channel')
+        for subscriber in subscribers:
+            subscriber.receive_message(channel, message)
+        return []
+
+    def _command_readmessages(self, session):
+        lines = []
+        for channel, message in session.take_messages():
+            lines.append('channel: {}'.format(channel))
+            lines.append('message: {}'.format(message))
+        return lines
+
+    def _positions(self, positions):
+        """ Return the positions of a 'START:END' range, the end is optional,
+            or of a single position. Starting past the end is an error.
+        """
+        start = 0
+        end = len(self._playlist)
+        if positions is not None:
+            if ':' in positions:
+                start, end = positions.split(':')
+                start = int(start)
+                end = min(int(end), len(self._playlist)) if end else (
+                    len(self._playlist)
+                )
+                if start > len(self._playlist):
+                    raise CommandFailed(2, 'Bad song index')
+            else:
+                start = int(positions)
+                end = start + 1
+                if start >= len(self._playlist):
+                    raise CommandFailed(2, 'Bad song index')
+        return range(start, end)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(  # pylint: disable=too-many-instance-attributes
+        socketserver.BaseRequestHandler,
+):
+    """ One client connection
+    """
+
+    def __init__(self, request, client_address, server):
+        # set before the base class handles the whole connection
+        self.fake = server.fake
+        self._buffer = b''
+        self._closed = False
+        self._lock = threading.Lock()
+        self._pending = set()  # changed subsystems not reported yet
+        self._wakeup_pending = False  # a burst of changes wakes up once
+        self._messages = []
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        super(_Handler, self).__init__(request, client_address, server)
+        return None
+
+    def setup(self):
+        self.fake._register(self)  # pylint: disable=protected-access
+        return None
+
+    def finish(self):
+        self.fake._unregister(self)  # pylint: disable=protected-access
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+        return None
+
+    def close(self):
+        """ Close the connection from the server side.
+        """
+        self._closed = True
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        return None
+
+    def changed(self, subsystems):
+        """ Record changed subsystems and wake up an idling connection.
+        """
+        with self._lock:
+            self._pending.update(subsystems)
+            wake_up = not self._wakeup_pending
+            self._wakeup_pending = True
+        if wake_up:
+            self._wakeup_writer.send(b'\0')
+        return None
+
+    def receive_message(self, channel, message):
+        """ Queue a client-to-client message.
+        """
+        with self._lock:
+            self._messages.append((channel, message))
+        self.changed(('message',))
+        return None
+
+    def take_messages(self):
+        """ Return and forget the queued messages.
+        """
+        with self._lock:
+            messages = self._messages
+            self._messages = []
+        return messages
+
+    def handle(self):
+        self._send(['OK MPD {}'.format(PROTOCOL_VERSION)], delay=False)
+        while not self._closed:
+            line = self._read_line()
+            if line is None:
+                break
+            name, args = _parse_command(line)
+            if name in ('command_list_begin', 'command_list_ok_begin'):
+                self._handle_command_list(name == 'command_list_ok_begin')
+            elif name == 'idle':
+                self._handle_idle(args)
+            elif name == 'noidle':
+                pass  # not idling, nothing to answer
+            elif name == 'close':
+                break
+            else:
+                self._handle_commands([(name, args)], False)
+        return None
+
+    def _handle_command_list(self, list_ok):
+        commands = []
+        while True:
+            line = self._read_line()
+            if line is None:
+                return None
+            name, args = _parse_command(line)
+            if name == 'command_list_end':
+                break
+            commands.append((name, args))
+        self._handle_commands(commands, list_ok)
+        return None
+
+    def _handle_commands(self, commands, list_ok):
+        lines = []
+        for index, (name, args) in enumerate(commands):
+            try:
+                # pylint: disable=protected-access
+                lines.extend(self.fake._execute(self, name, args))
+            except (CommandFailed, TypeError, ValueError) as error:
+                code = getattr(error, 'code', 2)
+                message = getattr(error, 'message', str(error))
+                lines.append('ACK [{}@{}] {{{}}} {}'.format(
+                    code,
+                    index,
+                    name,
+                    message,
+                ))
+                break
+            if list_ok:
+                lines.append('list_OK')
+        else:
+            lines.append('OK')
+        self._send(lines)
+        return None
+
+    def _handle_idle(self, args):
+        interests = set(args) or set(SUBSYSTEMS)
+        interrupted = False
+        while not self._closed:
+            with self._lock:
+                changes = self._pending & interests
+                if changes or interrupted:
+                    self._pending -= changes
+                    break
+            readable = [self.request]  # a line may be buffered already
+            if b'\n' not in self._buffer:
+                readable, dummy_w, dummy_x = select.select(
+                    [self.request, self._wakeup_reader], [], [],
+                )
+            if self._wakeup_reader in readable:
+                with self._lock:
+                    self._wakeup_reader.recv(4096)
+                    self._wakeup_pending = False
+            if self.request in readable:
+                line = self._read_line()
+                if line is None:
+                    self._closed = True
+                    return None
+                interrupted = True  # only 'noidle' is allowed here
+        lines = ['changed: {}'.format(name) for name in sorted(changes)]
+        lines.append('OK')
+        self._send(lines)
+        return None
+
+    def _read_line(self):
+        while b'\n' not in self._buffer:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                data = b''
+            if not data:
+                return None
+            # pylint: disable=protected-access
+            self.fake._count('bytes_received', len(data))
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line.decode('utf-8')
+
+    def _send(self, lines, delay=True):
+        if delay:
+            self.fake._count('round_trips')  # pylint: disable=protected-access
+            if self.fake.latency:
+                time.sleep(self.fake.latency)
+        data = ''.join(line + '\n' for line in lines).encode('utf-8')
+        # pylint: disable=protected-access
+        self.fake._count('bytes_sent', len(data))
+        try:
+            self.request.sendall(data)
+        except OSError:
+            self._closed = True
+        return None
+
+
+def _parse_command(line):
+    """ Split a command line into its name and unquoted arguments.
+    """
+    words = []
+    index = 0
+    while index < len(line):
+        if line[index] == ' ':
+            index += 1
+        elif line[index] == '"':
+            index += 1
+            word = []
+            while index < len(line) and line[index] != '"':
+                if line[index] == '\\':
+                    index += 1
+                word.append(line[index])
+                index += 1
+            words.append(''.join(word))
+            index += 1
+        else:
+            end = line.find(' ', index)
+            if end < 0:
+                end = len(line)
+            words.append(line[index:end])
+            index = end
+    if not words:
+        words = ['']
+    return words[0], words[1:]
+
+
+# EOF
@@ -0,0 +1,246 @@
+""" Test cases shared by the MPD client engines
+    Each engine subclasses them, and creates its client for the fake server
+    in 'create_client'.
+"""
+
+
+import queue
+import unittest
+
+import pmpc.task
+import pmpc.track
+
+from tests import fake_mpd
+
+
+SONGS = [
+    {
+        'file': 'song{}.ogg'.format(index),
+        'Artist': 'Artist {}'.format(index % 3),
+        'Title': 'Title {}'.format(index),
+    }
+    for index in range(5)
+]
+
+
+class Observer(pmpc.task.Task):
+    """ Task collecting the events of the MPD client, by type and server
+    """
+
+    def __init__(self):
+        self._events = {}  # (type, server) -> queue of events
+        event_handlers = {
+            'mpd.track': self._handle_event,
+            'mpd.playlist_chunk': self._handle_event,
+            'mpd.playlist_delta': self._handle_event,
+        }
+        super(Observer, self).__init__('observer', event_handlers)
+        return None
+
+    def wait_event(self, event_type, server, timeout):
+        """ Return the next event of the given type from the given server.
+        """
+        name = '{}:{}'.format(*server.address)
+        return self._queue(event_type, name).get(timeout=timeout)
+
+    def _handle_event(self, event):
+        self._queue(event['type'], event['server']).put(event)
+        return None
+
+    def _queue(self, event_type, server):
+        return self._events.setdefault((event_type, server), queue.Queue())
+
+
+class _Cases(unittest.TestCase):
+    """ Client following a fake server, observed until the end of the test
+    """
+
+    TIMEOUT = 5.0
+
+    def setUp(self):
+        """ Start the server, the observer and the client.
+        """
+        self.server = fake_mpd.FakeMpdServer()
+        self.server.start()
+        self.prepare_server()
+        self.observer = Observer()
+        self.observer.start()
+        self.client = self.create_client()
+        self.client.start()
+        return None
+
+    def tearDown(self):
+        """ Stop the client, the observer and the server.
+        """
+        self.client.post({
+            'type': 'quit',
+            'value': None,
+        })
+        self.client.join(self.TIMEOUT)
+        self.observer.stop()
+        self.observer.join(self.TIMEOUT)
+        self.server.stop()
+        return None
+
+    def prepare_server(self):
+        """ Set the playlist of the server before the client starts.
+        """
+        self.server.set_playlist(SONGS)
+        return None
+
+    def create_client(self):
+        """ Return the client task following the server.
+        """
+        raise NotImplementedError
+
+    def wait_event(self, event_type):
+        """ Return the next event of the given type from the server.
+        """
+        return self.observer.wait_event(event_type, self.server, self.TIMEOUT)
+
+
+class ClientCases(_Cases):  # pylint: disable=abstract-method
+    """ Test cases for an MPD client
+    """
+
+    def wait_loaded(self):
+        """ Wait until the initial state is emitted.
+        """
+        for event_type in ('mpd.track', 'mpd.playlist_chunk'):
+            self.wait_event(event_type)
+        return None
+
+    def test_00_initial_state(self):
+        """ Test that the current track and the playlist are emitted
+        """
+        event = self.wait_event('mpd.track')
+        self.assertEqual(event['value'].title, 'Title 0')
+        event = self.wait_event('mpd.playlist_chunk')
+        self.assertEqual(event['value']['length'], len(SONGS))
+        self.assertEqual(
+            [current.artist for current in event['value']['tracks']],
+            [song['Artist'] for song in SONGS],
+        )
+        return None
+
+    def test_01_command_interrupts_idle(self):
+        """ Test that a command is sent on the idling connection
+        """
+        self.wait_loaded()
+        self.client.post({
+            'type': 'next',
+            'server': '{}:{}'.format(*self.server.address),
+            'value': None,
+        })
+        event = self.wait_event('mpd.track')
+        self.assertEqual(event['value'].pos, 1)
+        self.assertEqual(self.server.statistics['connections'], 1)
+        return None
+
+    def test_02_playlist_delta(self):
+        """ Test that playlist changes are emitted as deltas
+        """
+        self.wait_loaded()
+        self.server.add({
+            'file': 'new.ogg',
+            'Artist': ['One', 'Two'],
+            'Title': 'New',
+        })
+        event = self.wait_event('mpd.playlist_delta')
+        self.assertEqual(event['value']['length'], len(SONGS) + 1)
+        self.assertEqual(
+            event['value']['changes'],
+            [pmpc.track.Track(len(SONGS), len(SONGS), 'One, Two', 'New')],
+        )
+        return None
+
+    def test_03_cached_tracks(self):
+        """ Test that moved songs are not fetched again
+        """
+        self.wait_loaded()
+        self.server.reset_statistics()
+        self.server.delete(0)
+        event = self.wait_event('mpd.playlist_delta')
+        self.assertEqual(
+            [(each.pos, each.title) for each in event['value']['changes']],
+            [(pos, 'Title {}'.format(pos + 1)) for pos in range(4)],
+        )
+        # status, current song and changed positions only
+        self.assertEqual(self.server.statistics['commands'], 3)
+        return None
+
+    def test_04_quit(self):
+        """ Test that quitting ends the client promptly
+        """
+        self.wait_loaded()
+        self.client.post({
+            'type': 'quit',
+            'value': None,
+        })
+        self.client.join(self.TIMEOUT)
+        # pylint: disable=protected-access
+        self.assertFalse(self.client._thread.is_alive())
+        return None
+
+
+class KnownPlaylistCases(_Cases):  # pylint: disable=abstract-method
+    """ Test cases for an MPD client starting from a snapshot
+        The client is created with the version of the playlist of the
+        server, see 'known_version'.
+    """
+
+    def known_version(self):
+        """ Return the version of the playlist of the server.
+        """
+        # pylint: disable=protected-access
+        return self.server._playlist_version
+
+    def test_00_only_changes(self):
+        """ Test that the known playlist is not downloaded again
+        """
+        self.wait_event('mpd.track')
+        self.server.delete(4)
+        event = self.wait_event('mpd.playlist_delta')
+        self.assertEqual(event['value']['changes'], [])
+        self.assertEqual(event['value']['length'], 4)
+        with self.assertRaises(queue.Empty):
+            self.observer.wait_event('mpd.playlist_chunk', self.server, 0.1)
+        return None
+
+
+class ShrinkingPlaylistCases(_Cases):  # pylint: disable=abstract-method
+    """ Test cases for an MPD client loading a playlist that shrinks
+        meanwhile
+    """
+
+    def prepare_server(self):
+        """ Override '_Cases'
+        """
+        self.server.set_playlist(fake_mpd.make_songs(2500))
+        self.server.command_hook = self.shrink
+        return None
+
+    def shrink(self, name, dummy_args):
+        """ Shrink the playlist once the first page is sent.
+        """
+        if name == 'playlistinfo':
+            self.server.command_hook = None
+            self.server.set_playlist(fake_mpd.make_songs(500))
+        return None
+
+    def test_00_load_starts_over(self):
+        """ Test that the load starts over when the next page is gone
+        """
+        event = self.wait_event('mpd.playlist_chunk')
+        self.assertEqual(event['value']['length'], 2500)
+        event = self.wait_event('mpd.playlist_chunk')
+        self.assertEqual(event['value']['start'], 0)
+        self.assertEqual(event['value']['length'], 500)
+        self.assertEqual(len(event['value']['tracks']), 500)
+        self.server.delete(0)  # the client is still observing
+        event = self.wait_event('mpd.playlist_delta')
+        self.assertEqual(event['value']['length'], 499)
+        return None
+
+
+# EOF
@@ -0,0 +1,248 @@
+""" Tests for event queue
+"""
+
+
+import queue
+import unittest
+
+import pmpc.event_queue
+import pmpc.track
+
+
+def _event(event_type, value):
+    return {
+        'type': event_type,
+        'value': value,
+    }
+
+
+def _merge(queued_event, new_event):
+    return _event(
+        new_event['type'],
+        queued_event['value'] + new_event['value'],
+    )
+
+
+class TestEventQueue(unittest.TestCase):
+    """ Test cases for event queue
+    """
+
+    def setUp(self):
+        self.queue = pmpc.event_queue.EventQueue({
+            'latest': pmpc.event_queue.KEEP_LATEST,
+            'merge': _merge,
+        })
+        return None
+
+    def _drain(self):
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    def test_00_keep_all(self):
+        """ Test that events without policy are all kept in order
+        """
+        for value in range(3):
+            self.queue.put(_event('all', value))
+        self.assertEqual(
+            [event['value'] for event in self._drain()],
+            [0, 1, 2],
+        )
+        return None
+
+    def test_01_keep_latest(self):
+        """ Test that a queued event is superseded by the latest one
+        """
+        self.queue.put(_event('latest', 1))
+        self.queue.put(_event('all', 2))
+        self.queue.put(_event('latest', 3))
+        self.assertEqual(self.queue.qsize(), 2)
+        self.assertEqual(
+            [event['value'] for event in self._drain()],
+            [2, 3],
+        )
+        self.assertEqual(self.queue.statistics()['coalesced'], 1)
+        return None
+
+    def test_02_merge(self):
+        """ Test that a queued event is merged with the new one
+        """
+        self.queue.put(_event('merge', [1]))
+        self.queue.put(_event('merge', [2]))
+        self.assertEqual(
+            [event['value'] for event in self._drain()],
+            [[1, 2]],
+        )
+        return None
+
+    def test_03_no_coalescing_once_dequeued(self):
+        """ Test that an event already taken is not coalesced any more
+        """
+        self.queue.put(_event('latest', 1))
+        self.assertEqual(self.queue.get_nowait()['value'], 1)
+        self.queue.put(_event('latest', 2))
+        self.assertEqual(
+            [event['value'] for event in self._drain()],
+            [2],
+        )
+        return None
+
+    def test_04_empty(self):
+        """ Test that getting from an empty queue raises 'queue.Empty'
+        """
+        with self.assertRaises(queue.Empty):
+            self.queue.get_nowait()
+        with self.assertRaises(queue.Empty):
+            self.queue.get(timeout=0.01)
+        return None
+
+    def test_05_drop_oldest(self):
+        """ Test that a full queue drops its oldest event
+        """
+        bounded = pmpc.event_queue.EventQueue(
+            maxsize=2,
+            overflow=pmpc.event_queue.DROP_OLDEST,
+        )
+        for value in range(3):
+            bounded.put(_event('all', value))
+        self.assertEqual(bounded.get_nowait()['value'], 1)
+        self.assertEqual(bounded.statistics()['dropped'], 1)
+        self.assertEqual(bounded.statistics()['high_water'], 2)
+        return None
+
+    def test_06_reject(self):
+        """ Test that a full queue rejects new events, but forced ones
+        """
+        bounded = pmpc.event_queue.EventQueue(
+            maxsize=1,
+            overflow=pmpc.event_queue.REJECT,
+        )
+        self.assertTrue(bounded.put(_event('all', 0)))
+        self.assertFalse(bounded.put(_event('all', 1)))
+        self.assertTrue(bounded.put(_event('all', 2), force=True))
+        self.assertEqual(bounded.statistics()['rejected'], 1)
+        self.assertEqual(bounded.qsize(), 2)
+        return None
+
+    def test_07_coalesce_on_overflow(self):
+        """ Test that a full queue coalesces events of the same type
+        """
+        bounded = pmpc.event_queue.EventQueue(
+            maxsize=2,
+            overflow=pmpc.event_queue.COALESCE,
+        )
+        bounded.put(_event('one', 0))
+        bounded.put(_event('two', 1))
+        bounded.put(_event('one', 2))
+        self.assertEqual(
+            [bounded.get_nowait()['value'] for dummy in range(2)],
+            [1, 2],
+        )
+        return None
+
+    def test_08_no_coalescing_across_servers(self):
+        """ Test that events from different servers are not coalesced
+        """
+        for server in ('a', 'b', 'a'):
+            event = _event('latest', server)
+            event['server'] = server
+            self.queue.put(event)
+        self.assertEqual(
+            [self.queue.get_nowait()['value'] for dummy in range(2)],
+            ['b', 'a'],
+        )
+        self.assertTrue(self.queue.empty())
+        return None
+
+    def test_09_merge_playlist_deltas(self):
+        """ Test merging of playlist deltas
+        """
+        track = pmpc.track.Track
+        queued_event = _event('playlist_delta', {
+            'changes': [track(1, 0, 'a', 'x'), track(2, 3, 'a', 'y')],
+            'length': 4,
+        })
+        new_event = _event('playlist_delta', {
+            'changes': [track(3, 0, 'b', 'z')],
+            'length': 2,
+        })
+        new_event['server'] = 'mpd:6600'
+        merged = pmpc.track.merge_playlist_deltas(queued_event, new_event)
+        self.assertEqual(merged['server'], 'mpd:6600')
+        self.assertEqual(merged['value'], {
+            'changes': [track(3, 0, 'b', 'z')],
+            'length': 2,
+        })
+        return None
+
+    def test_10_queued_time(self):
+        """ Test that a coalesced event keeps the time of the oldest one
+        """
+        self.queue.put(_event('merge', [1]))
+        dummy_event, first_time = self.queue.get_timed_nowait()
+        self.queue.put(_event('merge', [2]))
+        self.queue.put(_event('all', 3))
+        self.queue.put(_event('merge', [4]))
+        event, queued = self.queue.get_timed_nowait()
+        self.assertEqual(event['value'], 3)
+        later = queued
+        event, queued = self.queue.get_timed_nowait()
+        self.assertEqual(event['value'], [2, 4])
+        self.assertLess(first_time, queued)
+        self.assertLess(queued, later)
+        return None
+
+    def test_11_superseding(self):
+        """ Test that a superseding event removes the pending events it
+            supersedes, so that later events queue after it
+        """
+        event_queue = pmpc.event_queue.EventQueue(
+            {
+                'merge': _merge,
+                'reload': pmpc.event_queue.KEEP_LATEST,
+            },
+            superseding={
+                'reload': lambda event: ('merge',) if event['value'] else (),
+            },
+        )
+        event_queue.put(_event('merge', [1]))
+        event_queue.put(_event('reload', False))
+        event_queue.put(_event('merge', [2]))
+        event_queue.put(_event('reload', True))
+        event_queue.put(_event('merge', [3]))
+        self.assertEqual(
+            [event_queue.get_nowait()['value'] for dummy in range(2)],
+            [True, [3]],
+        )
+        self.assertTrue(event_queue.empty())
+        self.assertEqual(event_queue.statistics()['coalesced'], 3)
+        return None
+
+    def test_12_overflow_keeps_state(self):
+        """ Test that a full queue drops only the events kept all
+        """
+        bounded = pmpc.event_queue.EventQueue(
+            {
+                'latest': pmpc.event_queue.KEEP_LATEST,
+                'merge': _merge,
+            },
+            maxsize=2,
+            overflow=pmpc.event_queue.COALESCE,
+        )
+        bounded.put(_event('merge', [0]))
+        bounded.put(_event('all', 1))
+        self.assertTrue(bounded.put(_event('latest', 2)))
+        self.assertFalse(bounded.put(_event('other', 3)))
+        self.assertTrue(bounded.put(_event('merge', [4])))
+        self.assertEqual(
+            [bounded.get_nowait()['value'] for dummy in range(2)],
+            [2, [0, 4]],
+        )
+        self.assertTrue(bounded.empty())
+        self.assertEqual(bounded.statistics()['dropped'], 1)
+        self.assertEqual(bounded.statistics()['rejected'], 1)
+        return None
+
+
+# EOF
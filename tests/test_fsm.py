@@ -133,5 +133,40 @@ class TestFsm(unittest.TestCase):
         self.assertEqual(self.machine.entered_two_register, self.VALUE)
         return None
 
+    def test_06_unknown_event(self):
+        """ Test that an event without transition nor handler is ignored
+        """
+        event = {
+            'type': 'unknown',
+            'value': self.VALUE,
+        }
+        self.fsm.handle_event(event)
+        now = self.fsm._current_state_name  # pylint: disable=protected-access
+        self.assertEqual(now, 'one')
+        self.assertNotEqual(self.machine.register, self.VALUE)
+        return None
+
+    def test_07_unknown_state(self):
+        """ Test that a transition to an unknown state is ignored
+        """
+        states = {
+            'one': {
+                'transitions': {
+                    'switch': {
+                        'next_state': 'nowhere',
+                    },
+                },
+            },
+        }
+        fsm = pmpc.fsm.Fsm(states, 'one')
+        fsm.handle_event({
+            'type': 'switch',
+            'value': None,
+        })
+        now = fsm._current_state_name  # pylint: disable=protected-access
+        self.assertEqual(now, 'one')
+        self.assertNotIn('name', states['one'])
+        return None
+
 
 # EOF
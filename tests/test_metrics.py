@@ -0,0 +1,112 @@
+""" Tests for the runtime metrics
+"""
+
+
+import threading
+import unittest
+
+import pmpc.metrics
+import pmpc.task
+
+
+class Sleeper(pmpc.task.Task):
+    """ Task with a handler taking some time
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        event_handlers = {
+            'sleep': self._handle_sleep,
+            'done': self._handle_done,
+        }
+        super(Sleeper, self).__init__('sleeper', event_handlers)
+        return None
+
+    def _handle_sleep(self, event):
+        self.done.wait(event['value'])
+        return None
+
+    def _handle_done(self, dummy_event):
+        self.done.set()
+        return None
+
+
+class TestHistogram(unittest.TestCase):
+    """ Test cases for the histogram of durations
+    """
+
+    def test_00_empty(self):
+        """ Test the summary of an empty histogram
+        """
+        summary = pmpc.metrics.Histogram().summary()
+        self.assertEqual(summary['count'], 0)
+        self.assertEqual(summary['p99'], 0.0)
+        return None
+
+    def test_01_percentiles(self):
+        """ Test that percentiles fall in the bucket of their value
+        """
+        histogram = pmpc.metrics.Histogram()
+        for dummy_index in range(90):
+            histogram.add(0.001)
+        for dummy_index in range(10):
+            histogram.add(0.5)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['mean'], 0.0509)
+        self.assertGreaterEqual(summary['p50'], 0.001)
+        self.assertLess(summary['p50'], 0.001 * 2 ** 0.5)
+        self.assertEqual(summary['p90'], summary['p50'])
+        self.assertEqual(summary['p99'], 0.5)
+        self.assertEqual(summary['max'], 0.5)
+        return None
+
+    def test_02_overflow(self):
+        """ Test that values beyond the last bucket are accounted for
+        """
+        histogram = pmpc.metrics.Histogram()
+        histogram.add(100.0)
+        self.assertEqual(histogram.percentile(0.5), 100.0)
+        return None
+
+
+class TestTaskMetrics(unittest.TestCase):
+    """ Test cases for the metrics of a task
+    """
+
+    TIMEOUT = 5.0
+
+    def test_00_dispatched_events(self):
+        """ Test that the events are counted and timed, by type
+        """
+        sleeper = Sleeper()
+        sleeper.post({
+            'type': 'sleep',
+            'value': 0.01,
+        })
+        sleeper.post({
+            'type': 'sleep',
+            'value': 0.01,
+        })
+        sleeper.post({
+            'type': 'done',
+            'value': None,
+        })
+        sleeper.start()
+        self.assertTrue(sleeper.done.wait(self.TIMEOUT))
+        sleeper.stop()
+        sleeper.join(self.TIMEOUT)
+        runtime_metrics = sleeper.runtime_metrics()
+        self.assertEqual(runtime_metrics['name'], 'sleeper')
+        self.assertEqual(runtime_metrics['queue']['high_water'], 3)
+        events = runtime_metrics['events']
+        self.assertEqual(events['sleep']['count'], 2)
+        self.assertEqual(events['done']['count'], 1)
+        self.assertGreaterEqual(events['sleep']['duration']['max'], 0.01)
+        # the second sleep waited for the first one
+        self.assertGreaterEqual(events['sleep']['latency']['max'], 0.01)
+        self.assertIn('sleeper queue:', pmpc.metrics.format_report([sleeper]))
+        return None
+
+
+# EOF
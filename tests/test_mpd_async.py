@@ -0,0 +1,88 @@
+""" Tests for the asyncio MPD client
+"""
+
+
+import pmpc.mpd_async
+
+from tests import fake_mpd
+from tests import mpd_client_cases
+
+
+class TestMpdAsync(mpd_client_cases.ClientCases):
+    """ Test cases for the asyncio MPD client
+    """
+
+    def setUp(self):
+        self.other_server = fake_mpd.FakeMpdServer()
+        self.other_server.start()
+        self.other_server.set_playlist(mpd_client_cases.SONGS[::-1])
+        super(TestMpdAsync, self).setUp()
+        return None
+
+    def tearDown(self):
+        super(TestMpdAsync, self).tearDown()
+        self.other_server.stop()
+        return None
+
+    def create_client(self):
+        """ Override 'mpd_client_cases._Cases'
+            One client for both servers.
+        """
+        return pmpc.mpd_async.AsyncMpdClient(
+            'mpc',
+            [self.server.address, self.other_server.address],
+        )
+
+    def test_05_servers(self):
+        """ Test that the servers are watched and commanded separately
+        """
+        event = self.observer.wait_event(
+            'mpd.track',
+            self.other_server,
+            self.TIMEOUT,
+        )
+        self.assertEqual(event['value'].title, 'Title 4')
+        self.wait_event('mpd.playlist_chunk')
+        self.server.reset_statistics()
+        self.client.post({
+            'type': 'next',
+            'server': '{}:{}'.format(*self.other_server.address),
+            'value': None,
+        })
+        event = self.observer.wait_event(
+            'mpd.track',
+            self.other_server,
+            self.TIMEOUT,
+        )
+        self.assertEqual(event['value'].title, 'Title 3')
+        self.assertEqual(self.server.statistics['commands'], 0)
+        return None
+
+
+class TestMpdAsyncKnownPlaylist(mpd_client_cases.KnownPlaylistCases):
+    """ Test cases for the asyncio MPD client starting from a snapshot
+    """
+
+    def create_client(self):
+        """ Override 'mpd_client_cases._Cases'
+        """
+        name = '{}:{}'.format(*self.server.address)
+        return pmpc.mpd_async.AsyncMpdClient(
+            'mpc',
+            [self.server.address],
+            {name: self.known_version()},
+        )
+
+
+class TestMpdAsyncShrinkingPlaylist(mpd_client_cases.ShrinkingPlaylistCases):
+    """ Test cases for the asyncio MPD client loading a playlist that
+        shrinks meanwhile
+    """
+
+    def create_client(self):
+        """ Override 'mpd_client_cases._Cases'
+        """
+        return pmpc.mpd_async.AsyncMpdClient('mpc', [self.server.address])
+
+
+# EOF
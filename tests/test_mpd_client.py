@@ -0,0 +1,100 @@
+""" Tests for the threaded MPD client
+"""
+
+
+import unittest
+
+from tests import mpd_client_cases
+
+try:
+    import pmpc.mpd_client  # needs 'python-mpd2'
+except ImportError:
+    MPD2_AVAILABLE = False
+else:
+    MPD2_AVAILABLE = True
+
+
+@unittest.skipUnless(MPD2_AVAILABLE, "needs 'python-mpd2'")
+class TestMpdClient(mpd_client_cases.ClientCases):
+    """ Test cases for the threaded MPD client
+    """
+
+    # pylint: disable=protected-access
+
+    def create_client(self):
+        """ Override 'mpd_client_cases._Cases'
+        """
+        return pmpc.mpd_client.MpdClient('mpc', *self.server.address)
+
+    def test_05_command_list(self):
+        """ Test that the commands posted during a wake-up are coalesced and
+            sent in a single command list
+        """
+        self.wait_loaded()
+        self.client.post({
+            'type': 'next',
+            'value': None,
+        })
+        self.wait_event('mpd.track')
+        statistics = self.client.notify_statistics()
+        self.server.reset_statistics()
+        with self.server._lock:  # the client waits for the 'noidle' answer
+            for dummy_index in range(2):
+                self.client.post({
+                    'type': 'next',
+                    'value': None,
+                })
+        event = self.wait_event('mpd.track')
+        self.assertEqual(event['value'].pos, 3)
+        self.assertEqual(self.client.notify_statistics(), {
+            'wakeups': statistics['wakeups'] + 1,
+            'coalesced': statistics['coalesced'] + 1,
+        })
+        # 'noidle', the command list, 'idle', status and current song
+        self.assertEqual(self.server.statistics['round_trips'], 4)
+        return None
+
+    def test_06_subsystems(self):
+        """ Test that a database change empties the track cache
+        """
+        self.wait_loaded()
+        self.server.changed('mixer')  # not consumed, does not wake up
+        self.server.changed('database')
+        self.server.reset_statistics()
+        self.server.delete(0)
+        event = self.wait_event('mpd.playlist_delta')
+        self.assertEqual(len(event['value']['changes']), 4)
+        # status, current song, changed positions and the songs again, but
+        # the current song
+        self.assertEqual(self.server.statistics['commands'], 3 + 3)
+        return None
+
+
+@unittest.skipUnless(MPD2_AVAILABLE, "needs 'python-mpd2'")
+class TestMpdClientKnownPlaylist(mpd_client_cases.KnownPlaylistCases):
+    """ Test cases for the threaded MPD client starting from a snapshot
+    """
+
+    def create_client(self):
+        """ Override 'mpd_client_cases._Cases'
+        """
+        return pmpc.mpd_client.MpdClient(
+            'mpc',
+            *self.server.address,
+            playlist_version=self.known_version(),
+        )
+
+
+@unittest.skipUnless(MPD2_AVAILABLE, "needs 'python-mpd2'")
+class TestMpdClientShrinkingPlaylist(mpd_client_cases.ShrinkingPlaylistCases):
+    """ Test cases for the threaded MPD client loading a playlist that
+        shrinks meanwhile
+    """
+
+    def create_client(self):
+        """ Override 'mpd_client_cases._Cases'
+        """
+        return pmpc.mpd_client.MpdClient('mpc', *self.server.address)
+
+
+# EOF
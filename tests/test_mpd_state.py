@@ -0,0 +1,146 @@
+""" Tests for the state of an MPD server
+"""
+
+
+import unittest
+
+import pmpc.mpd_state
+
+
+def _song(song_id, title):
+    return {
+        'file': '{}.ogg'.format(title),
+        'id': str(song_id),
+        'artist': 'Artist',
+        'title': title,
+    }
+
+
+class FakeCommands(object):
+    """ Commands of a server whose playlist is set by the tests
+    """
+
+    def __init__(self):
+        self.playlist = []
+        self.version = 1
+        self.fetched = []  # ids of the songs fetched one by one
+        return None
+
+    async def fetch_status(self, fetch_track, changes_version):
+        """ Return the status, the current song and the changed songs.
+            Every song counts as changed.
+        """
+        status = {
+            'playlist': str(self.version),
+            'playlistlength': str(len(self.playlist)),
+        }
+        raw_track = {} if fetch_track else None
+        changes = None
+        if changes_version is not None:
+            changes = [
+                {'cpos': str(pos), 'id': song['id']}
+                for pos, song in enumerate(self.playlist)
+            ]
+        return (status, raw_track, changes)
+
+    async def fetch_songs(self, song_ids):
+        """ Return the songs.
+        """
+        self.fetched.extend(song_ids)
+        songs = {
+            song['id']: dict(song, pos=str(pos))
+            for pos, song in enumerate(self.playlist)
+        }
+        return [songs[song_id] for song_id in song_ids]
+
+    async def fetch_page(self, start, end, track_cache):
+        """ Return the track records of a range of the playlist.
+        """
+        return [
+            track_cache.read_track(song, pos)
+            for pos, song in enumerate(self.playlist[start:end], start)
+        ]
+
+
+class TestServerState(unittest.TestCase):
+    """ Test cases for the state of an MPD server
+    """
+
+    def setUp(self):
+        self.events = []
+        self.commands = FakeCommands()
+        self.state = pmpc.mpd_state.ServerState(
+            'mpd:6600',
+            self.events.append,
+            self.commands,
+        )
+        self.commands.playlist = [_song(0, 'A'), _song(1, 'B')]
+        self.commands.version = 5
+        pmpc.mpd_state.run_sync(self.state.check_status())
+        return None
+
+    def _restart_server(self):
+        """ Restart the server with another playlist, reusing the song ids.
+            Then add a song with the id of a song of the previous playlist.
+        """
+        self.commands.playlist = [_song(0, 'C')]
+        self.commands.version = 1
+        pmpc.mpd_state.run_sync(self.state.check_status(('playlist',)))
+        self.commands.playlist.append(_song(1, 'D'))
+        self.commands.version = 2
+        pmpc.mpd_state.run_sync(self.state.refresh(['playlist']))
+        return self.events[-1]
+
+    def test_00_load(self):
+        """ Test that the current track and the playlist are emitted
+        """
+        self.assertEqual(
+            [event['type'] for event in self.events],
+            ['mpd.track', 'mpd.playlist_chunk'],
+        )
+        self.assertEqual(
+            [each.title for each in self.events[1]['value']['tracks']],
+            ['A', 'B'],
+        )
+        return None
+
+    def test_01_cached_changes(self):
+        """ Test that the songs only moved are not fetched again
+        """
+        self.commands.playlist.reverse()
+        self.commands.version = 6
+        pmpc.mpd_state.run_sync(self.state.refresh(['playlist']))
+        event = self.events[-1]
+        self.assertEqual(event['type'], 'mpd.playlist_delta')
+        self.assertEqual(
+            [(each.pos, each.title) for each in event['value']['changes']],
+            [(0, 'B'), (1, 'A')],
+        )
+        self.assertEqual(self.commands.fetched, [])
+        return None
+
+    def test_02_reconnected(self):
+        """ Test that the song ids cached before a reconnection are not
+            trusted
+        """
+        self.state.reset()
+        event = self._restart_server()
+        self.assertEqual(
+            [(each.pos, each.title) for each in event['value']['changes']],
+            [(0, 'C'), (1, 'D')],
+        )
+        self.assertEqual(self.commands.fetched, ['1'])
+        return None
+
+    def test_03_version_gap(self):
+        """ Test that the song ids cached before a full load are not trusted
+        """
+        event = self._restart_server()
+        self.assertEqual(
+            [(each.pos, each.title) for each in event['value']['changes']],
+            [(0, 'C'), (1, 'D')],
+        )
+        return None
+
+
+# EOF
@@ -0,0 +1,109 @@
+""" Tests for the application task
+"""
+
+
+import unittest
+
+import pmpc.pmpc
+import pmpc.track
+
+
+SERVER = 'localhost:6600'
+
+
+def _chunk(start, count, length, version):
+    return {
+        'type': 'mpd.playlist_chunk',
+        'server': SERVER,
+        'value': {
+            'start': start,
+            'tracks': [
+                pmpc.track.Track(pos, pos, 'a', 'v{}'.format(version))
+                for pos in range(start, start + count)
+            ],
+            'length': length,
+            'version': version,
+        },
+    }
+
+
+def _delta(changes, length, version):
+    return {
+        'type': 'mpd.playlist_delta',
+        'server': SERVER,
+        'value': {
+            'changes': [
+                pmpc.track.Track(pos, pos, 'a', 'v{}'.format(version))
+                for pos in changes
+            ],
+            'length': length,
+            'version': version,
+        },
+    }
+
+
+class TestPmpc(unittest.TestCase):
+    """ Test cases for the playlists kept by the application task
+    """
+
+    # pylint: disable=protected-access
+
+    def setUp(self):
+        self.pmpc = pmpc.pmpc.Pmpc(
+            'pmpc',
+            [('localhost', 6600)],
+            engine='asyncio',
+            frontends=(),
+        )
+        return None
+
+    def _process_queued(self):
+        while not self.pmpc._event_queue.empty():
+            self.pmpc._process_event(self.pmpc._event_queue.get_nowait())
+        return None
+
+    def _playlist(self):
+        version, tracks = self.pmpc._playlists[SERVER]
+        return (version, [(each.pos, each.title) for each in tracks])
+
+    def test_00_playlist_chunks(self):
+        """ Test that the playlist is complete with its last chunk only
+        """
+        self.pmpc._event_handler_mpd_playlist_chunk(_chunk(0, 2, 3, 1))
+        self.assertEqual(self._playlist(), (None, [(0, 'v1'), (1, 'v1')]))
+        self.pmpc._event_handler_mpd_playlist_chunk(_chunk(2, 1, 3, 1))
+        self.assertEqual(
+            self._playlist(),
+            (1, [(0, 'v1'), (1, 'v1'), (2, 'v1')]),
+        )
+        return None
+
+    def test_01_restarted_load(self):
+        """ Test that a load that started over replaces the queued chunk
+        """
+        self.pmpc.post(_chunk(0, 1000, 2000, 1))
+        self.pmpc.post(_chunk(0, 500, 500, 2))
+        self._process_queued()
+        self.assertEqual(
+            self._playlist(),
+            (2, [(pos, 'v2') for pos in range(500)]),
+        )
+        return None
+
+    def test_02_reload_after_delta(self):
+        """ Test that a reload supersedes the queued delta, and that the
+            later delta is applied after it
+        """
+        self.pmpc._event_handler_mpd_playlist_chunk(_chunk(0, 3, 3, 1))
+        self.pmpc.post(_delta([0], 3, 2))
+        self.pmpc.post(_chunk(0, 3, 3, 3))
+        self.pmpc.post(_delta([1], 3, 4))
+        self._process_queued()
+        self.assertEqual(
+            self._playlist(),
+            (4, [(0, 'v3'), (1, 'v4'), (2, 'v3')]),
+        )
+        return None
+
+
+# EOF
@@ -0,0 +1,40 @@
+""" Tests for the script
+"""
+
+
+import queue
+import signal
+import types
+import unittest
+
+import pmpc.script
+
+
+class TestSignalWatcher(unittest.TestCase):
+    """ Test cases for the signal watcher
+    """
+
+    # pylint: disable=protected-access
+
+    TIMEOUT = 5.0
+
+    def test_00_quit(self):
+        """ Test that a termination posts a quit from the watching thread,
+            and that the previous handlers are restored
+        """
+        handler = signal.getsignal(signal.SIGTERM)
+        events = queue.Queue()
+        the_pmpc = types.SimpleNamespace(post=events.put)
+        signal_watcher = pmpc.script._SignalWatcher(the_pmpc)
+        signal_watcher.start()
+        try:
+            signal.raise_signal(signal.SIGTERM)
+            event = events.get(timeout=self.TIMEOUT)
+        finally:
+            signal_watcher.stop()
+        self.assertEqual(event['type'], 'quit')
+        self.assertIs(signal.getsignal(signal.SIGTERM), handler)
+        return None
+
+
+# EOF
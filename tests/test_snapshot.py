@@ -0,0 +1,62 @@
+""" Tests for the snapshots of the playlists
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pmpc.snapshot
+import pmpc.track
+
+
+SERVER = 'localhost:6600'
+
+
+class TestSnapshot(unittest.TestCase):
+    """ Test cases for the snapshots of the playlists
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        return None
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        return None
+
+    def test_00_round_trip(self):
+        """ Test that a saved snapshot is loaded back
+        """
+        tracks = [
+            pmpc.track.Track(song_id, pos, 'Artist', 'Title {}'.format(pos))
+            for pos, song_id in enumerate((5, 3, 8))
+        ]
+        pmpc.snapshot.save(self.directory, SERVER, 42, tracks)
+        self.assertEqual(
+            pmpc.snapshot.load(self.directory, SERVER),
+            (42, tracks),
+        )
+        return None
+
+    def test_01_missing(self):
+        """ Test that there is no snapshot for an unknown server
+        """
+        self.assertIsNone(pmpc.snapshot.load(self.directory, SERVER))
+        return None
+
+    def test_02_corrupt(self):
+        """ Test that a corrupt snapshot is ignored
+        """
+        pmpc.snapshot.save(self.directory, SERVER, 42, [])
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            with open(path, 'w', encoding='utf-8') as corrupt:
+                corrupt.write('{"format": 1, "trac')
+        with self.assertLogs('pmpc.snapshot'):
+            self.assertIsNone(pmpc.snapshot.load(self.directory, SERVER))
+        return None
+
+
+# EOF
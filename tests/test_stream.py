@@ -0,0 +1,168 @@
+""" Tests for the headless stream
+"""
+
+
+import json
+import os
+import queue
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+import pmpc.stream
+import pmpc.task
+import pmpc.track
+
+
+SERVER = 'localhost:6600'
+OTHER_SERVER = 'localhost:6601'
+
+TRACKS = [
+    pmpc.track.Track(song_id, pos, 'Artist', 'Title {}'.format(pos))
+    for pos, song_id in enumerate((5, 3, 8))
+]
+
+
+class Receiver(pmpc.task.Task):
+    """ Task collecting the commands read by the stream
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        event_handlers = {
+            'stream.next': self.events.put,
+            'stream.pause': self.events.put,
+        }
+        super(Receiver, self).__init__('receiver', event_handlers)
+        return None
+
+
+class TestStream(unittest.TestCase):
+    """ Test cases for the headless stream
+    """
+
+    TIMEOUT = 5.0
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pmpc.socket')
+        self.receiver = Receiver()
+        self.receiver.start()
+        self.stream = pmpc.stream.Stream(
+            'stream',
+            [SERVER, OTHER_SERVER],
+            self.path,
+        )
+        self.stream.post({
+            'type': 'playlist',
+            'server': SERVER,
+            'value': TRACKS,
+        })
+        self.stream.post({
+            'type': 'track',
+            'server': SERVER,
+            'value': TRACKS[1],
+        })
+        self.stream.start()
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.settimeout(self.TIMEOUT)
+        for dummy_attempt in range(100):
+            try:
+                self.connection.connect(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                time.sleep(0.01)  # the stream is starting
+            else:
+                break
+        self.lines = self.connection.makefile('rb')
+        return None
+
+    def tearDown(self):
+        self.lines.close()
+        self.connection.close()
+        self.stream.post({
+            'type': 'quit',
+            'value': None,
+        })
+        self.stream.join(self.TIMEOUT)
+        self.receiver.stop()
+        self.receiver.join(self.TIMEOUT)
+        shutil.rmtree(self.directory)
+        return None
+
+    def read_event(self):
+        """ Return the next event written to the socket.
+        """
+        return json.loads(self.lines.readline().decode('utf-8'))
+
+    def send(self, command):
+        """ Send a line to the stream.
+        """
+        self.connection.sendall(command + b'\n')
+        return None
+
+    def test_00_state_on_connection(self):
+        """ Test that a new client gets the current state
+        """
+        self.assertEqual(self.read_event(), {
+            'type': 'playlist',
+            'server': SERVER,
+            'value': [list(each_track) for each_track in TRACKS],
+        })
+        self.assertEqual(self.read_event(), {
+            'type': 'track',
+            'server': SERVER,
+            'value': [3, 1, 'Artist', 'Title 1'],
+        })
+        return None
+
+    def test_01_delta(self):
+        """ Test that the changes are streamed as they come
+        """
+        self.read_event()
+        self.read_event()
+        self.stream.post({
+            'type': 'playlist_delta',
+            'server': OTHER_SERVER,
+            'value': {
+                'changes': TRACKS[:1],
+                'length': 1,
+                'version': 7,
+            },
+        })
+        self.assertEqual(self.read_event(), {
+            'type': 'playlist_delta',
+            'server': OTHER_SERVER,
+            'value': {
+                'changes': [[5, 0, 'Artist', 'Title 0']],
+                'length': 1,
+            },
+        })
+        return None
+
+    def test_02_commands(self):
+        """ Test that the commands are emitted, the invalid ones ignored
+        """
+        self.send(b'not json')
+        self.send(b'{"type": "eject"}')
+        self.send(b'{"type": "next", "server": "nowhere:6600"}')
+        self.send(b'{"type": "pause"}')
+        self.send('{{"type": "next", "server": "{}"}}'.format(
+            OTHER_SERVER,
+        ).encode('utf-8'))
+        event = self.receiver.events.get(timeout=self.TIMEOUT)
+        self.assertEqual(event, {
+            'type': 'stream.pause',
+            'value': None,
+        })
+        event = self.receiver.events.get(timeout=self.TIMEOUT)
+        self.assertEqual(event, {
+            'type': 'stream.next',
+            'server': OTHER_SERVER,
+            'value': None,
+        })
+        return None
+
+
+# EOF
@@ -0,0 +1,184 @@
+""" Tests for task
+"""
+
+
+import threading
+import time
+import unittest
+
+import pmpc.event_queue
+import pmpc.task
+
+
+class Recorder(pmpc.task.Task):
+    """ Task test subject
+    """
+
+    def __init__(self):
+        self.values = []
+        self.received = threading.Event()
+        event_handlers = {
+            'record': self._handle_record,
+        }
+        super(Recorder, self).__init__('recorder', event_handlers)
+        return None
+
+    def _handle_record(self, event):
+        self.values.append(event['value'])
+        self.received.set()
+        return None
+
+
+class Tracker(pmpc.task.Task):
+    """ Slow task keeping only the latest track
+    """
+
+    def __init__(self, last_value):
+        self.invocations = 0
+        self.last_value = last_value
+        self.done = threading.Event()
+        event_handlers = {
+            'track': self._handle_track,
+        }
+        event_policies = {
+            'track': pmpc.event_queue.KEEP_LATEST,
+        }
+        super(Tracker, self).__init__(
+            'tracker',
+            event_handlers,
+            event_policies=event_policies,
+        )
+        return None
+
+    def _handle_track(self, event):
+        self.invocations += 1
+        time.sleep(0.0001)
+        if event['value'] == self.last_value:
+            self.done.set()
+        return None
+
+
+class Listener(pmpc.task.Task):
+    """ Task counting the notifications it receives
+    """
+
+    def __init__(self):
+        self.notifications = 0
+        event_handlers = {
+            'other': None,
+        }
+        super(Listener, self).__init__('listener', event_handlers)
+        return None
+
+    def _notify(self):
+        """ Override 'task.Task'
+        """
+        self.notifications += 1
+        return None
+
+
+class Emitter(pmpc.task.Task):
+    """ Task emitting events
+    """
+
+    def __init__(self):
+        super(Emitter, self).__init__('emitter', {}, threaded=False)
+        return None
+
+    def emit(self, event):
+        """ Emit an event to the other tasks.
+        """
+        self._emit(event)
+        return None
+
+
+class TestTask(unittest.TestCase):
+    """ Test cases for task
+    """
+
+    TIMEOUT = 5.0
+
+    def setUp(self):
+        self.task = Recorder()
+        self.task.start()
+        return None
+
+    def tearDown(self):
+        self.task.stop()
+        self.task.join(self.TIMEOUT)
+        return None
+
+    def test_00_post_wakes_task(self):
+        """ Test that a posted event is handled by a waiting task
+        """
+        time.sleep(0.05)
+        self.task.post({
+            'type': 'record',
+            'value': 1,
+        })
+        self.assertTrue(self.task.received.wait(self.TIMEOUT))
+        self.assertEqual(self.task.values, [1])
+        return None
+
+    def test_01_batch_in_order(self):
+        """ Test that queued events are handled in order
+        """
+        for value in range(10):
+            self.task.post({
+                'type': 'record',
+                'value': value,
+            })
+        self.assertTrue(self.task.received.wait(self.TIMEOUT))
+        self.task.stop()
+        self.task.join(self.TIMEOUT)
+        self.assertEqual(self.task.values, list(range(10)))
+        return None
+
+    def test_02_stop_wakes_task(self):
+        """ Test that stopping a waiting task ends it promptly
+        """
+        time.sleep(0.05)
+        start = time.perf_counter()
+        self.task.stop()
+        self.task.join(self.TIMEOUT)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        return None
+
+    def test_03_emit_routed_by_type(self):
+        """ Test that emitted events only reach tasks handling their type
+        """
+        listener = Listener()
+        listener.start()
+        time.sleep(0.05)
+        Emitter().emit({
+            'type': 'record',
+            'value': 1,
+        })
+        self.assertTrue(self.task.received.wait(self.TIMEOUT))
+        self.assertEqual(listener.notifications, 0)
+        listener.stop()
+        listener.join(self.TIMEOUT)
+        return None
+
+    def test_04_coalesce_burst(self):
+        """ Test that a burst of track changes is coalesced
+        """
+        count = 10000
+        tracker = Tracker(count - 1)
+        tracker.start()
+        for value in range(count):
+            tracker.post({
+                'type': 'track',
+                'value': value,
+            })
+        posted = time.perf_counter()
+        self.assertTrue(tracker.done.wait(self.TIMEOUT))
+        latency = time.perf_counter() - posted
+        tracker.stop()
+        tracker.join(self.TIMEOUT)
+        self.assertLess(tracker.invocations, count)
+        self.assertLess(latency, 0.1)
+        return None
+
+
+# EOF
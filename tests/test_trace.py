@@ -0,0 +1,125 @@
+""" Tests for the traces of the events and their replay
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pmpc.replay
+import pmpc.task
+import pmpc.trace
+import pmpc.track
+
+
+SERVER = 'localhost:6600'
+
+TRACKS = [
+    pmpc.track.Track(song_id, pos, 'Artist', 'Title {}'.format(pos))
+    for pos, song_id in enumerate((5, 3, 8))
+]
+
+
+class Sink(pmpc.task.Task):
+    """ Task that is posted to, never started
+    """
+
+    def __init__(self):
+        event_handlers = {
+            'mpd.track': None,
+        }
+        super(Sink, self).__init__('sink', event_handlers)
+        return None
+
+
+class TestTrace(unittest.TestCase):
+    """ Test cases for the traces of the events and their replay
+    """
+
+    TIMEOUT = 5.0
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'trace.jsonl')
+        return None
+
+    def tearDown(self):
+        pmpc.task.set_recorder(None)
+        shutil.rmtree(self.directory)
+        return None
+
+    def test_00_record(self):
+        """ Test that the posted events are recorded and read back
+        """
+        recorder = pmpc.trace.Recorder(self.path)
+        pmpc.task.set_recorder(recorder)
+        Sink().post({
+            'type': 'mpd.track',
+            'server': SERVER,
+            'value': TRACKS[1],
+        })
+        pmpc.task.set_recorder(None)
+        recorder.close()
+        records = list(pmpc.trace.read(self.path))
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record['source'], 'MainThread')
+        self.assertEqual(record['target'], 'sink')
+        self.assertEqual(record['type'], 'mpd.track')
+        self.assertEqual(record['size'], len('[3,1,"Artist","Title 1"]'))
+        self.assertEqual(record['event'], {
+            'type': 'mpd.track',
+            'server': SERVER,
+            'value': TRACKS[1],
+        })
+        return None
+
+    def test_01_replay(self):
+        """ Test that a trace is replayed to the application, headless
+        """
+        recorder = pmpc.trace.Recorder(self.path)
+        recorder.record('mpc', 'pmpc', {
+            'type': 'mpd.playlist_chunk',
+            'server': SERVER,
+            'value': {
+                'start': 0,
+                'tracks': TRACKS,
+                'length': len(TRACKS),
+                'version': 2,
+            },
+        })
+        recorder.record('pmpc', 'window', {
+            'type': 'playlist_delta',
+            'server': SERVER,
+            'value': {
+                'changes': TRACKS,
+                'length': len(TRACKS),
+            },
+        })
+        recorder.record('mpc', 'pmpc', {
+            'type': 'mpd.track',
+            'server': SERVER,
+            'value': TRACKS[0],
+        })
+        recorder.close()
+        records = [
+            record for record in pmpc.trace.read(self.path)
+            if record['target'] == 'pmpc'
+        ]
+        the_pmpc = pmpc.replay.ReplayPmpc('pmpc', records, 0, frontends=())
+        the_pmpc.start()
+        the_pmpc.join(self.TIMEOUT)
+        # pylint: disable=protected-access
+        self.assertFalse(the_pmpc._thread.is_alive())
+        events = the_pmpc.runtime_metrics()['events']
+        self.assertEqual(events['mpd.playlist_chunk']['count'], 1)
+        self.assertEqual(events['mpd.track']['count'], 1)
+        self.assertEqual(
+            [each.runtime_metrics()['name'] for each in the_pmpc.tasks()],
+            ['pmpc', 'player'],
+        )
+        return None
+
+
+# EOF
@@ -0,0 +1,183 @@
+""" Tests for track records
+"""
+
+
+import unittest
+
+import pmpc.track
+
+
+def _raw_track(song_id, pos, last_modified='2020-01-01T00:00:00Z'):
+    return {
+        'file': 'song{}.ogg'.format(song_id),
+        'last-modified': last_modified,
+        'id': str(song_id),
+        'pos': str(pos),
+        'artist': ['Artist', 'Other'],
+        'title': 'Title {}'.format(song_id),
+    }
+
+
+class TestTrackCache(unittest.TestCase):
+    """ Test cases for the track cache
+    """
+
+    def setUp(self):
+        self.cache = pmpc.track.TrackCache(2)
+        return None
+
+    def test_00_read_track(self):
+        """ Test that a cached record is reused with its new position
+        """
+        first = self.cache.read_track(_raw_track(7, 0))
+        moved = self.cache.read_track(_raw_track(7, 3))
+        self.assertEqual(
+            first,
+            pmpc.track.Track(7, 0, 'Artist, Other', 'Title 7'),
+        )
+        self.assertEqual(moved, first._replace(pos=3))
+        self.assertIs(moved.title, first.title)
+        self.assertEqual(self.cache.statistics()['hits'], 1)
+        return None
+
+    def test_01_outdated(self):
+        """ Test that a modified song is parsed again
+        """
+        self.cache.read_track(_raw_track(7, 0))
+        self.cache.read_track(_raw_track(7, 0, '2021-01-01T00:00:00Z'))
+        self.assertEqual(self.cache.statistics()['hits'], 0)
+        return None
+
+    def test_02_get(self):
+        """ Test the lookup by song id and the eviction of the oldest
+        """
+        for song_id in range(3):
+            self.cache.read_track(_raw_track(song_id, song_id))
+        self.assertIsNone(self.cache.get(0, 0))
+        self.assertEqual(self.cache.get(1, 5).pos, 5)
+        self.assertEqual(self.cache.statistics()['size'], 2)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(1, 5))
+        return None
+
+    def test_03_read_track_list(self):
+        """ Test that a raw list response gives the same records, cached
+        """
+        data = ''.join(
+            'file: song{0}.ogg\n'
+            'Last-Modified: 2020-01-01T00:00:00Z\n'
+            'Time: 180\n'
+            'Artist: Artist\n'
+            'Artist: Other\n'
+            'Title: Title {0}: \u00e9t\u00e9\n'
+            'Pos: {1}\n'
+            'Id: {0}\n'.format(song_id, pos)
+            for pos, song_id in enumerate((7, 8))
+        ).encode('utf-8')
+        tracks = pmpc.track.read_track_list(data, self.cache)
+        self.assertEqual(tracks, [
+            pmpc.track.Track(7, 0, 'Artist, Other', 'Title 7: \u00e9t\u00e9'),
+            pmpc.track.Track(8, 1, 'Artist, Other', 'Title 8: \u00e9t\u00e9'),
+        ])
+        moved = pmpc.track.read_track_list(
+            data.replace(b'Pos: 1', b'Pos: 4'),
+            self.cache,
+        )
+        self.assertEqual(moved[1], tracks[1]._replace(pos=4))
+        self.assertEqual(self.cache.statistics()['hits'], 2)
+        self.assertEqual(pmpc.track.read_track_list(b'', self.cache), [])
+        return None
+
+    def test_04_known_position(self):
+        """ Test that a known position is used instead of the parsed one
+        """
+        self.assertEqual(
+            self.cache.read_track(_raw_track(7, 0), 9),
+            pmpc.track.Track(7, 9, 'Artist, Other', 'Title 7'),
+        )
+        self.assertEqual(pmpc.track.read_track({}), (None, None, "", ""))
+        return None
+
+
+def _tracks(start, count, title='x'):
+    return [
+        pmpc.track.Track(pos, pos, 'a', title)
+        for pos in range(start, start + count)
+    ]
+
+
+def _chunk(start, count, length, title='x'):
+    return {
+        'type': 'mpd.playlist_chunk',
+        'server': 'mpd:6600',
+        'value': {
+            'start': start,
+            'tracks': _tracks(start, count, title),
+            'length': length,
+            'version': 1,
+        },
+    }
+
+
+class TestPlaylistEvents(unittest.TestCase):
+    """ Test cases for the playlist events
+    """
+
+    def test_00_merge_playlist_chunks(self):
+        """ Test that consecutive chunks are concatenated
+        """
+        merged = pmpc.track.merge_playlist_chunks(
+            _chunk(0, 2, 5),
+            _chunk(2, 2, 5),
+        )
+        self.assertEqual(merged['server'], 'mpd:6600')
+        self.assertEqual(merged['value']['start'], 0)
+        self.assertEqual(merged['value']['tracks'], _tracks(0, 4))
+        self.assertEqual(merged['value']['length'], 5)
+        return None
+
+    def test_01_merge_restarted_chunks(self):
+        """ Test that a chunk of a load that started over replaces the
+            queued one
+        """
+        new_event = _chunk(0, 500, 500, 'y')
+        self.assertIs(
+            pmpc.track.merge_playlist_chunks(_chunk(0, 1000, 2000), new_event),
+            new_event,
+        )
+        new_event = _chunk(0, 2, 5, 'y')
+        self.assertIs(
+            pmpc.track.merge_playlist_chunks(_chunk(2, 2, 5), new_event),
+            new_event,
+        )
+        return None
+
+    def test_02_apply_playlist_delta(self):
+        """ Test that changes replace or append tracks, and that the
+            playlist is truncated to its length
+        """
+        playlist = _tracks(0, 4)
+        changes = _tracks(1, 1, 'y') + _tracks(4, 2, 'y')
+        self.assertEqual(
+            pmpc.track.apply_playlist_delta(playlist, changes, 6),
+            _tracks(0, 1) + _tracks(1, 1, 'y') + _tracks(2, 2) +
+            _tracks(4, 2, 'y'),
+        )
+        self.assertEqual(playlist, _tracks(0, 4))  # not changed in place
+        self.assertEqual(
+            pmpc.track.apply_playlist_delta(playlist, [], 2),
+            _tracks(0, 2),
+        )
+        return None
+
+    def test_03_apply_stale_changes(self):
+        """ Test that the changes past the length are ignored
+        """
+        self.assertEqual(
+            pmpc.track.apply_playlist_delta(_tracks(0, 3), _tracks(5, 1), 2),
+            _tracks(0, 2),
+        )
+        return None
+
+
+# EOF
@@ -0,0 +1,309 @@
+""" Tests for the parts of the window that do not need a display
+"""
+
+
+import tkinter
+import types
+import unittest
+
+import pmpc.track
+import pmpc.window
+
+
+def _track(song_id, pos, title=None):
+    return pmpc.track.Track(
+        song_id,
+        pos,
+        'Artist {}'.format(song_id),
+        title or 'Title {}'.format(song_id),
+    )
+
+
+def _playlist(song_ids):
+    return [_track(song_id, pos) for pos, song_id in enumerate(song_ids)]
+
+
+class FakeTree(object):
+    """ Stand-in for the tree view of the playlist, top level items only
+        Counts the calls, as each one is a round-trip to Tk.
+    """
+
+    def __init__(self):
+        self.children = []
+        self.items = {}  # identifier -> options
+        self.selection = None
+        self.calls = 0
+        return None
+
+    def get_children(self):
+        """ Return the linked items, in order.
+        """
+        return tuple(self.children)
+
+    def selection_set(self, items):
+        """ Select the items.
+        """
+        self.calls += 1
+        self.selection = items
+        return None
+
+    def insert(self, dummy_parent, index, item, **options):
+        """ Insert a new item at this index.
+        """
+        self.calls += 1
+        self.children.insert(index, item)
+        self.items[item] = options
+        return item
+
+    def delete(self, *items):
+        """ Delete the items.
+        """
+        self.calls += 1
+        self.detach(*items)
+        self.calls -= 1
+        for item in items:
+            del self.items[item]
+        return None
+
+    def detach(self, *items):
+        """ Unlink the items, they can be moved back.
+        """
+        self.calls += 1
+        items = set(items)
+        self.children = [item for item in self.children if item not in items]
+        return None
+
+    def move(self, item, dummy_parent, index):
+        """ Move an item, linked or not, to this index.
+        """
+        self.calls += 1
+        if item in self.children:
+            self.children.remove(item)
+        self.children.insert(index, item)
+        return None
+
+    def item(self, item, **options):
+        """ Change the options of an item.
+        """
+        self.calls += 1
+        self.items[item].update(options)
+        return None
+
+
+class FakeScrollbar(object):  # pylint: disable=too-few-public-methods
+    """ Stand-in for the scrollbar of the playlist
+    """
+
+    def __init__(self):
+        self.position = None
+        return None
+
+    def set(self, first, last):
+        """ Show this part of the playlist.
+        """
+        self.position = (first, last)
+        return None
+
+
+class TestViewport(unittest.TestCase):
+    """ Test cases for the viewport of the virtualized playlist
+    """
+
+    # pylint: disable=protected-access
+
+    def test_00_visible_rows(self):
+        """ Test that the headings take a row and at least one row is shown
+        """
+        self.assertEqual(pmpc.window._visible_rows(400, 20), 19)
+        self.assertEqual(pmpc.window._visible_rows(30, 20), 1)
+        self.assertEqual(pmpc.window._visible_rows(0, 20), 1)
+        return None
+
+    def test_01_clamp_first(self):
+        """ Test that the viewport stays within the playlist
+        """
+        self.assertEqual(pmpc.window._clamp_first(-5, 10, 100), 0)
+        self.assertEqual(pmpc.window._clamp_first(42, 10, 100), 42)
+        self.assertEqual(pmpc.window._clamp_first(95, 10, 100), 90)
+        self.assertEqual(pmpc.window._clamp_first(3, 10, 4), 0)
+        self.assertEqual(pmpc.window._clamp_first(3, 10, 0), 0)
+        return None
+
+    def test_02_first_showing(self):
+        """ Test that the viewport moves only to show a hidden track
+        """
+        self.assertEqual(pmpc.window._first_showing(10, 10, 10), 10)
+        self.assertEqual(pmpc.window._first_showing(10, 10, 19), 10)
+        self.assertEqual(pmpc.window._first_showing(10, 10, 20), 15)
+        self.assertEqual(pmpc.window._first_showing(10, 10, 2), -3)
+        return None
+
+    def test_03_scroll_command(self):
+        """ Test the commands of the scrollbar
+        """
+        scroll = pmpc.window._scroll_command
+        self.assertEqual(scroll(0, 10, 1000, tkinter.MOVETO, '0.25'), 250)
+        self.assertEqual(
+            scroll(50, 10, 1000, tkinter.SCROLL, '-1', tkinter.UNITS),
+            49,
+        )
+        self.assertEqual(
+            scroll(50, 10, 1000, tkinter.SCROLL, '2', tkinter.PAGES),
+            70,
+        )
+        self.assertEqual(scroll(50, 10, 1000, 'unknown'), 50)
+        return None
+
+
+class TestPlaylistDiff(unittest.TestCase):
+    """ Test cases for the difference applied to the tree of the playlist
+    """
+
+    # pylint: disable=protected-access
+
+    def update(self, old_ids, new_playlist):
+        """ Render the old playlist, then update the tree to the new one.
+            Return the number of calls of the update.
+        """
+        playlist = types.SimpleNamespace(tree=FakeTree())
+        old_playlist = _playlist(old_ids)
+        for dummy_step in pmpc.window.Playlist._update_tree(
+                playlist,
+                [],
+                old_playlist,
+        ):
+            pass
+        playlist.tree.calls = 0
+        for dummy_step in pmpc.window.Playlist._update_tree(
+                playlist,
+                old_playlist,
+                new_playlist,
+        ):
+            pass
+        self.assertEqual(
+            playlist.tree.children,
+            [each_track.id for each_track in new_playlist],
+        )
+        for index, each_track in enumerate(new_playlist):
+            self.assertEqual(playlist.tree.items[each_track.id], {
+                'text': '{}'.format(index + 1),
+                'values': (each_track.artist, each_track.title),
+            })
+        return playlist.tree.calls
+
+    def test_00_longest_increasing_subsequence(self):
+        """ Test the longest run of values in order
+        """
+        lis = pmpc.window._longest_increasing_subsequence
+        self.assertEqual(lis([]), [])
+        self.assertEqual(lis([0, 1, 2, 3]), [0, 1, 2, 3])
+        self.assertEqual(len(lis([3, 2, 1, 0])), 1)
+        self.assertEqual(lis([3, 0, 1, 4, 2]), [0, 1, 2])
+        self.assertEqual(lis([1, 1, 2, 2, 0]), [1, 2])
+        return None
+
+    def test_01_unchanged(self):
+        """ Test that an unchanged playlist touches nothing
+        """
+        calls = self.update(range(5), _playlist(range(5)))
+        self.assertEqual(calls, 0)
+        return None
+
+    def test_02_edits(self):
+        """ Test the insertions, deletions and moves
+        """
+        calls = self.update(range(5), _playlist([0, 1, 5, 3, 4]))
+        self.assertEqual(calls, 2)  # delete, insert
+        calls = self.update(range(5), _playlist([4, 0, 1, 2, 3]))
+        self.assertEqual(calls, 1 + 1 + 5)  # detach, move, renumber
+        self.update(range(5), _playlist([4, 3, 2, 1, 0]))
+        self.update(range(5), _playlist([]))
+        self.update([], _playlist(range(3)))
+        return None
+
+    def test_03_retagged(self):
+        """ Test that a retagged track is updated in place
+        """
+        new_playlist = _playlist(range(3))
+        new_playlist[1] = _track(1, 1, 'Retagged')
+        calls = self.update(range(3), new_playlist)
+        self.assertEqual(calls, 1)
+        return None
+
+    def test_04_sliced(self):
+        """ Test that preparing a large difference is done in steps
+        """
+        playlist = types.SimpleNamespace(tree=FakeTree())
+        size = 2 * pmpc.window._CHUNK_SIZE + 1
+        for dummy_step in pmpc.window.Playlist._update_tree(
+                playlist,
+                [],
+                _playlist(range(size)),
+        ):
+            pass
+        playlist.tree.calls = 0
+        steps = 0
+        for dummy_step in pmpc.window.Playlist._update_tree(
+                playlist,
+                _playlist(range(size)),
+                [],
+        ):
+            steps += 1
+        self.assertEqual(playlist.tree.calls, 3)  # one deletion per chunk
+        self.assertGreaterEqual(steps, 2 * 3)
+        self.assertEqual(playlist.tree.children, [])
+        return None
+
+
+class TestVirtualPlaylist(unittest.TestCase):
+    """ Test cases for the rendering of the virtualized playlist
+    """
+
+    # pylint: disable=protected-access
+
+    def render(self, playlist, tracks):
+        """ Render the visible tracks of the playlist, one row per step.
+            Return the number of steps.
+        """
+        steps = 0
+        for dummy_step in pmpc.window.VirtualPlaylist._update_tree(
+                playlist,
+                None,
+                tracks,
+        ):
+            steps += 1
+        return steps
+
+    def test_00_viewport(self):
+        """ Test that only the visible tracks have rows
+        """
+        playlist = types.SimpleNamespace(
+            tree=FakeTree(),
+            scrollbar=FakeScrollbar(),
+            _first=95,
+            _rows=10,
+            _current_pos=93,
+        )
+        self.assertEqual(self.render(playlist, _playlist(range(100))), 10)
+        self.assertEqual(playlist._first, 90)
+        self.assertEqual(len(playlist.tree.children), 10)
+        self.assertEqual(playlist.tree.items['row0'], {
+            'text': '91',
+            'values': ('Artist 90', 'Title 90'),
+        })
+        self.assertEqual(playlist.tree.selection, 'row3')
+        self.assertEqual(playlist.scrollbar.position, (0.9, 1.0))
+        self.render(playlist, _playlist(range(4)))
+        self.assertEqual(playlist._first, 0)
+        self.assertEqual(
+            playlist.tree.children,
+            ['row{}'.format(row) for row in range(4)],
+        )
+        self.assertEqual(playlist.tree.selection, '')
+        self.render(playlist, [])
+        self.assertEqual(playlist.tree.children, [])
+        self.assertEqual(playlist.scrollbar.position, (0.0, 1.0))
+        return None
+
+
+# EOF